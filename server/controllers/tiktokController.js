@@ -1,4 +1,5 @@
 // server/controllers/tiktokController.js
+const http = require('http');
 const tiktokExtractorService = require('../services/tiktokExtractorService');
 
 // 提取视频真实URL
@@ -41,6 +42,50 @@ exports.extractMultipleUrls = async (req, res) => {
     }
 };
 
+// 获取提取器分阶段耗时统计（Prometheus文本格式）
+exports.getMetrics = async (req, res) => {
+    try {
+        const metrics = await tiktokExtractorService.getMetrics();
+        res.type('text/plain').send(metrics);
+    } catch (error) {
+        console.error('Error getting extractor metrics:', error);
+        res.status(500).json({ message: 'Failed to get extractor metrics', error: error.message });
+    }
+};
+
+// 转发本地视频缓存的播放请求（保留Range请求头，支持拖动进度）
+exports.streamVideo = (req, res) => {
+    const { id } = req.params;
+    const streamUrl = /^\d+$/.test(id) ? tiktokExtractorService.getStreamUrl(id) : null;
+
+    if (!streamUrl) {
+        return res.status(404).json({ message: 'Video stream not available' });
+    }
+
+    const headers = req.headers.range ? { range: req.headers.range } : {};
+    const upstream = http.get(streamUrl, { headers }, (upstreamRes) => {
+        res.status(upstreamRes.statusCode);
+        ['content-type', 'content-length', 'content-range', 'accept-ranges'].forEach((name) => {
+            if (upstreamRes.headers[name]) {
+                res.setHeader(name, upstreamRes.headers[name]);
+            }
+        });
+        upstreamRes.pipe(res);
+    });
+
+    upstream.on('error', (error) => {
+        console.error('Error streaming cached video:', error);
+        if (!res.headersSent) {
+            res.status(502).json({ message: 'Failed to stream video', error: error.message });
+        } else {
+            res.end();
+        }
+    });
+
+    // 客户端断开时停止读取本地缓存
+    req.on('close', () => upstream.destroy());
+};
+
 // 获取热门抖音视频示例（用于首页展示）
 exports.getSampleVideos = async (req, res) => {
     try {
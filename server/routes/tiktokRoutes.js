@@ -9,6 +9,12 @@ router.post('/extract', tiktokController.extractVideoUrl);
 // 批量提取多个视频URL
 router.post('/extract-multiple', tiktokController.extractMultipleUrls);
 
+// 获取提取器耗时统计
+router.get('/metrics', tiktokController.getMetrics);
+
+// 从本地视频缓存播放（支持Range请求）
+router.get('/stream/:id', tiktokController.streamVideo);
+
 // 获取示例视频（用于首页展示）
 router.get('/samples', tiktokController.getSampleVideos);
 
@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+# bench_extractor.py - 离线基准测试：回放录制的性能日志、页面源码和API响应，无需访问抖音和启动Chrome
+
+import argparse
+import http.server
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from extract_tiktok import TiktokExtractor, SsrPageExtractor, EndpointHealth
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# 与页面内performance entries筛选脚本一致的特征
+PERFORMANCE_ENTRY_INDICATORS = ['douyinvod.com/', '/tos/', 'aweme.snssdk.com/', '.mp4', 'mime_type=video_mp4']
+
+VIDEO_ID = '7344275866215664911'
+VIDEO_PAGE_URL = f'https://www.douyin.com/video/{VIDEO_ID}'
+
+# 批量解析用例的视频ID
+BULK_VIDEO_IDS = [str(int(VIDEO_ID) + i) for i in range(40)]
+
+# 对冲执行用例的对冲延迟(秒)，远小于api_slow模式下API的额外延迟
+HEDGE_DELAY = 0.05
+
+
+def load_fixtures(directory: str = FIXTURES_DIR) -> Dict[str, Any]:
+    """读取录制的数据
+
+    Args:
+        directory: 数据目录
+
+    Returns:
+        各类录制数据
+    """
+    def read_json(name: str) -> Any:
+        with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    with open(os.path.join(directory, 'page_source.html'), 'r', encoding='utf-8') as f:
+        page_source = f.read()
+
+    return {
+        'performance_log': read_json('performance_log.json'),
+        'performance_entries': read_json('performance_entries.json'),
+        'video_sources': read_json('video_sources.json'),
+        'api_detail': read_json('api_detail.json'),
+        'api_iteminfo': read_json('api_iteminfo.json'),
+        'page_source': page_source
+    }
+
+
+class FakeSwitchTo:
+    """模拟driver.switch_to，只支持切换和新建标签页"""
+
+    def __init__(self, driver: 'FakeWebDriver'):
+        self.driver = driver
+
+    def window(self, handle: str) -> None:
+        if handle not in self.driver.tabs:
+            raise KeyError(f'no such window: {handle}')
+        self.driver.handle = handle
+
+    def new_window(self, type_hint: Optional[str] = None) -> None:
+        self.driver.tab_count += 1
+        handle = f'TAB{self.driver.tab_count}'
+        self.driver.tabs[handle] = 'about:blank'
+        self.driver.handle = handle
+
+
+class FakeWebDriver:
+    """模拟Selenium WebDriver：每次导航都重新回放录制的性能日志，读取后清空（与Chrome行为一致）
+
+    支持多个标签页：所有标签页共用一份性能日志，日志的webview字段是产生事件的标签页句柄；
+    只有URL中含录制视频ID的页面才有数据，其余页面模拟没有视频的页面
+    """
+
+    def __init__(self, fixtures: Dict[str, Any], page_delay: float = 0.0):
+        """初始化模拟驱动
+
+        Args:
+            fixtures: load_fixtures返回的录制数据
+            page_delay: 每次导航模拟的页面加载耗时(秒)
+        """
+        self.fixtures = fixtures
+        self.page_delay = page_delay
+        # 初始标签页沿用录制时的webview ID，回放日志无需改写
+        first = json.loads(fixtures['performance_log'][0]['message']) if fixtures['performance_log'] else {}
+        self.recorded_webview = first.get('webview', 'TAB0')
+        self.handle = self.recorded_webview
+        self.tabs: Dict[str, str] = {self.handle: 'about:blank'}
+        self.tab_count = 0
+        self.switch_to = FakeSwitchTo(self)
+        # (可读取的时间, 标签页句柄, 日志条目)
+        self._scheduled: List[Tuple[float, str, List[Dict[str, Any]]]] = []
+        self._tab_logs: Dict[str, List[Dict[str, Any]]] = {}
+        # 浏览器中的Cookie，访问站点页面时模拟站点下发ttwid
+        self.cookies: Dict[str, Dict[str, Any]] = {}
+        self.navigations = 0
+
+    @property
+    def current_url(self) -> str:
+        return self.tabs[self.handle]
+
+    @property
+    def current_window_handle(self) -> str:
+        return self.handle
+
+    @property
+    def window_handles(self) -> List[str]:
+        return list(self.tabs)
+
+    def _has_video(self) -> bool:
+        return VIDEO_ID in self.tabs.get(self.handle, '')
+
+    def _logs_for(self, handle: str, url: str) -> List[Dict[str, Any]]:
+        if VIDEO_ID not in url:
+            return []
+        if handle == self.recorded_webview:
+            return list(self.fixtures['performance_log'])
+        if handle not in self._tab_logs:
+            old = f'"webview": "{self.recorded_webview}"'
+            new = f'"webview": "{handle}"'
+            self._tab_logs[handle] = [dict(log, message=log['message'].replace(old, new))
+                                      for log in self.fixtures['performance_log']]
+        return list(self._tab_logs[handle])
+
+    def _navigate(self, url: str, ready_at: float) -> None:
+        self.navigations += 1
+        self.tabs[self.handle] = url
+        if 'douyin.com' in url and 'ttwid' not in self.cookies:
+            self.cookies['ttwid'] = {'name': 'ttwid', 'value': f'1%7Cissued%7C{int(time.time())}',
+                                     'domain': '.douyin.com', 'path': '/'}
+        # 与Chrome一致，重新导航不会丢弃该标签页尚未读取的旧事件，只能由get_log取走
+        self._scheduled.append((ready_at, self.handle, self._logs_for(self.handle, url)))
+
+    def get(self, url: str) -> None:
+        if self.page_delay:
+            time.sleep(self.page_delay)
+        self._navigate(url, 0.0)
+
+    def refresh(self) -> None:
+        self.get(self.current_url)
+
+    def close(self) -> None:
+        del self.tabs[self.handle]
+        self._scheduled = [item for item in self._scheduled if item[1] != self.handle]
+        self.handle = None
+
+    def get_log(self, log_type: str) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        logs = []
+        remaining = []
+        for item in self._scheduled:
+            if item[0] <= now:
+                logs.extend(item[2])
+            else:
+                remaining.append(item)
+        self._scheduled = remaining
+        return logs
+
+    @property
+    def page_source(self) -> str:
+        return self.fixtures['page_source'] if self._has_video() else '<html></html>'
+
+    def execute_script(self, script: str, *args) -> Any:
+        if 'document.readyState' in script:
+            return 'complete'
+        if not self._has_video():
+            return [] if ('performance.getEntries' in script or 'collectPageVideoUrls' in script
+                          or "querySelectorAll('video')" in script) else None
+        if 'performance.getEntries' in script:
+            return [name for name in self.fixtures['performance_entries']
+                    if any(indicator in name for indicator in PERFORMANCE_ENTRY_INDICATORS)]
+        if 'collectPageVideoUrls' in script:
+            # 按页面内脚本的逻辑在Python中模拟：页面状态对象中的播放地址 + 媒体元素地址
+            indicators, limit = args
+            candidates = SsrPageExtractor(None).extract_urls(self.fixtures['page_source'])
+            candidates += self.fixtures['video_sources']
+            urls = [url for url in dict.fromkeys(candidates) if any(i in url for i in indicators)]
+            return urls[:limit]
+        if "querySelectorAll('video')" in script:
+            return list(self.fixtures['video_sources'])
+        return None
+
+    def execute_cdp_cmd(self, cmd: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if cmd == 'Page.navigate':
+            # 不等待加载完成，页面事件在page_delay之后才出现在日志中
+            self._navigate(params['url'], time.monotonic() + self.page_delay)
+            return {'frameId': self.handle}
+        if cmd == 'Network.setCookies':
+            for cookie in params['cookies']:
+                self.cookies[cookie['name']] = dict(cookie)
+            return {}
+        if cmd == 'Target.getTargetInfo':
+            return {'targetInfo': {'targetId': self.handle, 'type': 'page', 'url': self.current_url}}
+        return {}
+
+    def add_cookie(self, cookie: Dict[str, Any]) -> None:
+        self.cookies[cookie['name']] = dict(cookie)
+
+    def get_cookies(self) -> List[Dict[str, Any]]:
+        return [dict(cookie) for cookie in self.cookies.values()]
+
+    def set_page_load_timeout(self, timeout: float) -> None:
+        pass
+
+    def quit(self) -> None:
+        pass
+
+
+class FakeApiServer:
+    """本地HTTP服务，代替抖音的两个API端点返回录制的JSON，代替视频页面返回录制的页面源码"""
+
+    def __init__(self, fixtures: Dict[str, Any]):
+        self.fixtures = fixtures
+        # ok: 正常返回；api_fail: API端点返回500、页面正常；fail: 全部返回500；
+        # api_slow: API端点额外延迟slow_latency秒后正常返回；detail_fail: 只有aweme/detail端点返回500
+        self.mode = 'ok'
+        self.latency = 0.0
+        self.slow_latency = 0.5
+        # iteminfo批量查询时不返回的视频ID，模拟批量结果中缺失的条目
+        self.missing_items = set()
+        # 设置后模拟上游限流：超过每秒该请求数（令牌桶，容量同速率）的请求返回429
+        self.rate_limit: Optional[float] = None
+        self._tokens = 0.0
+        self._refilled = time.monotonic()
+        self._rate_lock = threading.Lock()
+        # 设置后把播放地址中录制的过期时间改为当前时间之后若干秒，模拟新签发的地址
+        self.expires_in: Optional[float] = None
+        self.requests = 0
+        self.throttled = 0
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和响应体分两次写出，不关闭Nagle会叠加约40ms的延迟确认
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if not server.take_token():
+                    server.throttled += 1
+                    self.send_response(429)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                is_page = self.path.startswith('/video/') or self.path.startswith('/share/video/')
+                if server.mode == 'api_slow' and not is_page:
+                    time.sleep(server.slow_latency)
+                is_detail = self.path.startswith('/aweme/v1/web/aweme/detail/')
+                if server.mode == 'fail' or (server.mode == 'api_fail' and not is_page) or \
+                        (server.mode == 'detail_fail' and is_detail):
+                    body, status = b'{}', 500
+                elif is_page:
+                    body, status = server.fixtures['page_source'].encode('utf-8'), 200
+                elif is_detail:
+                    body, status = server.sign(json.dumps(server.fixtures['api_detail'])), 200
+                elif self.path.startswith('/web/api/v2/aweme/iteminfo/'):
+                    body, status = server.sign(json.dumps(server.iteminfo(self.path))), 200
+                else:
+                    body, status = b'{}', 404
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def sign(self, body: str) -> bytes:
+        """按expires_in改写douyinvod地址路径中的十六进制过期时间"""
+        if self.expires_in is not None:
+            expiry = format(int(time.time() + self.expires_in), '08x')
+            body = re.sub(r'(douyinvod\.com/[0-9a-f]+/)[0-9a-f]{8}/', rf'\g<1>{expiry}/', body)
+        return body.encode('utf-8')
+
+    def take_token(self) -> bool:
+        """rate_limit限流：有令牌时消耗一个并返回True"""
+        if self.rate_limit is None:
+            return True
+        with self._rate_lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def reset_rate_limit(self, rate_limit: Optional[float]) -> None:
+        """设置限流速率并装满令牌桶"""
+        with self._rate_lock:
+            self.rate_limit = rate_limit
+            self._tokens = rate_limit or 0.0
+            self._refilled = time.monotonic()
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    def iteminfo(self, path: str) -> Dict[str, Any]:
+        """按item_ids中的每个视频ID返回一个条目（以录制的条目为模板），missing_items中的ID不返回"""
+        video_ids = parse_qs(urlparse(path).query).get('item_ids', [''])[0].split(',')
+        template = self.fixtures['api_iteminfo']
+        items = [dict(template['item_list'][0], aweme_id=video_id)
+                 for video_id in video_ids if video_id and video_id not in self.missing_items]
+        return dict(template, item_list=items)
+
+    def api_endpoints(self) -> List[str]:
+        """与DouyinApiClient.API_ENDPOINTS结构相同、指向本地服务的端点模板"""
+        return [
+            self.base_url + '/aweme/v1/web/aweme/detail/?aweme_id={video_id}',
+            self.base_url + '/web/api/v2/aweme/iteminfo/?item_ids={video_id}'
+        ]
+
+    def bulk_endpoint(self) -> str:
+        """与DouyinApiClient.BULK_ENDPOINT结构相同、指向本地服务的批量查询模板"""
+        return self.base_url + '/web/api/v2/aweme/iteminfo/?item_ids={video_ids}'
+
+    def page_urls(self) -> List[str]:
+        """与SsrPageExtractor.PAGE_URLS结构相同、指向本地服务的页面模板"""
+        return [
+            self.base_url + '/video/{video_id}',
+            self.base_url + '/share/video/{video_id}/'
+        ]
+
+    def __enter__(self) -> 'FakeApiServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_extractor(fixtures: Dict[str, Any], server: FakeApiServer, page_delay: float = 0.0,
+                   hedge_delay: Optional[float] = None, request_rate: Optional[float] = None) -> TiktokExtractor:
+    """创建指向本地API服务和模拟驱动的提取器，默认不限速，使计时只反映提取器本身"""
+    extractor = TiktokExtractor(keep_alive=True, use_cache=False, hedge_delay=hedge_delay,
+                                request_rate=request_rate, session_path=None, profile_dir=None)
+    extractor.api_client.API_ENDPOINTS = server.api_endpoints()
+    extractor.api_client.BULK_ENDPOINT = server.bulk_endpoint()
+    extractor.ssr_extractor.PAGE_URLS = server.page_urls()
+    extractor.driver = FakeWebDriver(fixtures, page_delay=page_delay)
+    return extractor
+
+
+@contextmanager
+def quiet(enabled: bool):
+    """屏蔽提取器输出到stderr的日志"""
+    if not enabled:
+        yield
+        return
+    saved = sys.stderr
+    with open(os.devnull, 'w') as devnull:
+        sys.stderr = devnull
+        try:
+            yield
+        finally:
+            sys.stderr = saved
+
+
+def measure(fn: Callable[[], Any], setup: Optional[Callable[[], None]], iterations: int) -> Dict[str, Any]:
+    """测量延迟、吞吐量和内存峰值
+
+    Args:
+        fn: 被测函数
+        setup: 每次运行前调用、不计时的准备函数
+        iterations: 计时运行次数
+
+    Returns:
+        统计结果
+    """
+    # 预热一次
+    if setup:
+        setup()
+    result = fn()
+
+    latencies = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+
+    # tracemalloc会显著拖慢执行，单独运行一次测内存
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        'ok': bool(result.get('success') if isinstance(result, dict) else result),
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 3),
+        'throughput_per_s': round(iterations / total, 1) if total else None,
+        'peak_kb': round(peak / 1024, 1)
+    }
+
+
+def run_benchmarks(iterations: int, page_delay: float, api_latency: float,
+                   fixtures_dir: str = FIXTURES_DIR) -> Dict[str, Dict[str, Any]]:
+    """运行所有策略的基准测试
+
+    Args:
+        iterations: 每项的计时运行次数
+        page_delay: 模拟的页面加载耗时(秒)
+        api_latency: 模拟的API响应延迟(秒)
+        fixtures_dir: 录制数据目录
+
+    Returns:
+        策略名到统计结果的映射
+    """
+    fixtures = load_fixtures(fixtures_dir)
+    results = {}
+
+    with FakeApiServer(fixtures) as server:
+        server.latency = api_latency
+        extractor = make_extractor(fixtures, server, page_delay=page_delay)
+        hedged = make_extractor(fixtures, server, page_delay=page_delay, hedge_delay=HEDGE_DELAY)
+        driver = extractor.driver
+
+        def navigate():
+            driver.get(VIDEO_PAGE_URL)
+
+        def api_ok():
+            server.mode = 'ok'
+
+        def api_fail():
+            server.mode = 'api_fail'
+
+        def all_fail():
+            server.mode = 'fail'
+
+        def api_slow():
+            server.mode = 'api_slow'
+
+        def detail_fail():
+            server.mode = 'detail_fail'
+
+        cases = [
+            ('get_video_url_api', lambda: extractor.get_video_url_api(VIDEO_ID), api_ok),
+            ('get_video_url_api[detail_fail]', lambda: extractor.get_video_url_api(VIDEO_ID), detail_fail),
+            ('get_video_url_ssr', lambda: extractor.get_video_url_ssr(VIDEO_ID), api_fail),
+            ('_get_urls_from_performance_logs', extractor._get_urls_from_performance_logs, navigate),
+            ('_get_urls_from_performance_entries', extractor._get_urls_from_performance_entries, navigate),
+            ('_get_urls_from_page_state', extractor._get_urls_from_page_state, navigate),
+            ('extract_from_url[api]', lambda: extractor.extract_from_url(VIDEO_PAGE_URL), api_ok),
+            ('extract_from_url[ssr]', lambda: extractor.extract_from_url(VIDEO_PAGE_URL), api_fail),
+            ('extract_from_url[browser]', lambda: extractor.extract_from_url(VIDEO_PAGE_URL), all_fail),
+            ('extract_from_url[api_slow]', lambda: extractor.extract_from_url(VIDEO_PAGE_URL), api_slow),
+            ('extract_from_url[api_slow,hedged]', lambda: hedged.extract_from_url(VIDEO_PAGE_URL), api_slow),
+            ('extract_from_url[browser,hedged]', lambda: hedged.extract_from_url(VIDEO_PAGE_URL), all_fail),
+            ('get_many x40', lambda: all(extractor.api_client.get_many(BULK_VIDEO_IDS).values()), api_ok),
+            ('get_video_urls_api_many x40[bulk]',
+             lambda: all(extractor.get_video_urls_api_many(BULK_VIDEO_IDS).values()), api_ok),
+            ('extract_video_urls x4[sequential]',
+             lambda: all([extractor.extract_video_urls(url) for url in [VIDEO_PAGE_URL] * 4]), None),
+            ('extract_video_urls_many x4[tabs]',
+             lambda: all(extractor.extract_video_urls_many([VIDEO_PAGE_URL] * 4, max_tabs=4)), None),
+        ]
+
+        for name, fn, setup in cases:
+            # 每项从空白的健康统计开始，避免前一项的失败模式使端点处于熔断状态
+            for instance in (extractor, hedged):
+                instance.api_client.health = EndpointHealth()
+                instance.strategy_health = EndpointHealth()
+            results[name] = measure(fn, setup, iterations)
+
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """与基线对比p50延迟和内存峰值"""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        rows.append({
+            'name': name,
+            'p50_ms': [base['p50_ms'], current['p50_ms']],
+            'p50_ratio': round(current['p50_ms'] / base['p50_ms'], 2) if base['p50_ms'] else None,
+            'peak_kb': [base['peak_kb'], current['peak_kb']]
+        })
+    return rows
+
+
+def record_fixtures(url: str, directory: str, wait_time: float = 8) -> None:
+    """访问真实页面录制回放所需的数据（需要网络和Chrome）
+
+    Args:
+        url: 视频页面URL
+        directory: 输出目录
+        wait_time: 页面加载后等待的时间(秒)
+    """
+    extractor = TiktokExtractor(keep_alive=True, use_cache=False)
+    video_id = extractor.extract_video_id(url)
+    os.makedirs(directory, exist_ok=True)
+
+    def write_json(name: str, data: Any) -> None:
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    try:
+        for name, endpoint in zip(('api_detail.json', 'api_iteminfo.json'), extractor.api_client.API_ENDPOINTS):
+            try:
+                response = extractor.api_client.session.get(endpoint.format(video_id=video_id),
+                                                            timeout=extractor.api_client.timeout)
+                write_json(name, response.json())
+            except Exception as e:
+                print(f"录制API响应失败 {endpoint}: {e}", file=sys.stderr)
+                write_json(name, {})
+
+        extractor._ensure_selenium()
+        driver = extractor.driver
+        driver.get(f'https://www.douyin.com/video/{video_id}')
+        time.sleep(wait_time)
+
+        write_json('performance_log.json', driver.get_log('performance'))
+        write_json('performance_entries.json',
+                   driver.execute_script("return window.performance.getEntries().map(function(e) { return e.name; });"))
+        write_json('video_sources.json',
+                   driver.execute_script("return Array.from(document.querySelectorAll('video'))"
+                                         ".map(function(v) { return v.currentSrc || v.src; }).filter(Boolean);"))
+        with open(os.path.join(directory, 'page_source.html'), 'w', encoding='utf-8') as f:
+            f.write(driver.page_source)
+        print(f"已录制到 {directory}", file=sys.stderr)
+    finally:
+        extractor._close_selenium()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='提取器离线基准测试')
+    parser.add_argument('--iterations', type=int, default=50, help='每项的计时运行次数')
+    parser.add_argument('--page-delay', type=float, default=0.0, help='模拟的页面加载耗时(秒)')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='模拟的API响应延迟(秒)')
+    parser.add_argument('--save', help='将结果保存为基线JSON文件')
+    parser.add_argument('--baseline', help='与之前保存的基线JSON文件对比')
+    parser.add_argument('--record', metavar='URL', help='访问真实页面录制数据到fixtures目录后退出')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='录制数据目录（--record时为输出目录）')
+    parser.add_argument('--verbose', action='store_true', help='显示提取器日志')
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.record, args.fixtures)
+        return
+
+    with quiet(not args.verbose):
+        results = run_benchmarks(args.iterations, args.page_delay, args.api_latency, args.fixtures)
+
+    output: Dict[str, Any] = {'results': results}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            output['comparison'] = compare(results, json.load(f)['results'])
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'results': results}, f, indent=2)
+
+    print(json.dumps(output, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
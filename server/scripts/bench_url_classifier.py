@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# bench_url_classifier.py - 在合成的大体量性能日志上对比视频URL筛选的新旧实现
+
+import argparse
+import json
+import random
+import time
+from typing import List, Dict, Any, Callable
+
+from extract_tiktok import VideoUrlClassifier
+
+
+def legacy_is_video_url(url: str) -> bool:
+    """原实现：逐个子串判断"""
+    video_indicators = [
+        'douyinvod.com',
+        '/tos/',
+        'aweme.snssdk.com',
+        '.mp4',
+        'mime_type=video_mp4',
+        'play_addr',
+        'video_id='
+    ]
+    return any(indicator in url for indicator in video_indicators)
+
+
+def legacy_urls_from_performance_logs(logs: List[Dict[str, Any]]) -> List[str]:
+    """原实现：每条日志先完整json.loads再判断"""
+    video_urls = []
+    for log in logs:
+        try:
+            log_entry = json.loads(log['message'])['message']
+            if ('Network.responseReceived' in log_entry['method'] or
+                    'Network.requestWillBeSent' in log_entry['method']):
+                if 'Network.responseReceived' in log_entry['method']:
+                    url = log_entry['params']['response']['url']
+                else:
+                    url = log_entry['params']['request']['url']
+                if legacy_is_video_url(url):
+                    video_urls.append(url)
+        except:
+            continue
+    return video_urls
+
+
+def legacy_filter_video_urls(video_urls: List[str]) -> List[str]:
+    """原实现：列表查重(O(n²))后排序"""
+    filtered_urls = []
+    for url in video_urls:
+        if url not in filtered_urls:
+            filtered_urls.append(url)
+    return sorted(filtered_urls, key=VideoUrlClassifier.rank)
+
+
+def generate_logs(count: int, video_ratio: float, seed: int = 0) -> List[Dict[str, Any]]:
+    """生成与Chrome性能日志结构一致的合成日志
+
+    Args:
+        count: 日志条目数
+        video_ratio: 视频请求所占比例
+        seed: 随机种子
+
+    Returns:
+        driver.get_log('performance')格式的日志条目列表
+    """
+    rng = random.Random(seed)
+    hosts = ['www.douyin.com', 'lf-douyin-pc-web.douyinstatic.com', 'p3-pc.douyinpic.com',
+             'mcs.snssdk.com', 'mon.zijieapi.com', 'sf1-cdn-tos.douyinstatic.com']
+    headers = {name: 'x' * rng.randint(10, 60) for name in
+               ['accept', 'accept-language', 'cookie', 'referer', 'sec-ch-ua', 'user-agent']}
+    logs = []
+    for i in range(count):
+        if rng.random() < video_ratio:
+            # 有限的视频URL集合，模拟同一视频被多次请求(Range分段)
+            url = (f"https://v{rng.randint(1, 5)}-web.douyinvod.com/{rng.randint(0, 20):08x}/"
+                   f"65a0b1c2/video/tos/cn/tos-cn-ve-15/o{rng.randint(0, 20)}/?mime_type=video_mp4")
+        else:
+            url = (f"https://{rng.choice(hosts)}/obj/static/{i}/"
+                   f"{rng.choice(['app.js', 'style.css', 'img.webp', 'font.woff2', 'api'])}")
+
+        method = rng.choice(['Network.requestWillBeSent', 'Network.responseReceived',
+                             'Network.dataReceived', 'Network.loadingFinished', 'Page.frameNavigated'])
+        if method == 'Network.requestWillBeSent':
+            params = {'requestId': str(i), 'request': {'url': url, 'method': 'GET', 'headers': headers}}
+        elif method == 'Network.responseReceived':
+            params = {'requestId': str(i), 'response': {'url': url, 'status': 200, 'headers': headers}}
+        else:
+            params = {'requestId': str(i), 'dataLength': rng.randint(100, 100000)}
+        logs.append({
+            'level': 'INFO',
+            'timestamp': 1700000000000 + i,
+            'message': json.dumps({'message': {'method': method, 'params': params}, 'webview': 'ABC'})
+        })
+    return logs
+
+
+def bench(func: Callable, arg: Any, repeat: int) -> float:
+    """返回多次运行中的最短耗时(秒)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='对比视频URL筛选的新旧实现')
+    parser.add_argument('--events', type=int, default=20000, help='合成日志条目数')
+    parser.add_argument('--video-ratio', type=float, default=0.01, help='视频请求所占比例')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数（取最短耗时）')
+    args = parser.parse_args()
+
+    logs = generate_logs(args.events, args.video_ratio)
+    legacy_urls = legacy_urls_from_performance_logs(logs)
+    new_urls = VideoUrlClassifier.urls_from_performance_logs(logs)
+    assert legacy_urls == new_urls, "新旧实现提取结果不一致"
+    assert legacy_filter_video_urls(legacy_urls) == VideoUrlClassifier.filter_urls(new_urls), "新旧实现排序结果不一致"
+
+    # 去重基准使用大量候选URL，放大O(n²)差异
+    candidates = [f"https://v1-web.douyinvod.com/{i % 2000:08x}/video/tos/x.mp4" for i in range(args.events)]
+    sample_urls = [json.loads(log['message'])['message'].get('params', {}).get('request', {}).get('url', '')
+                   for log in logs[:5000]]
+
+    rows = [
+        ("performance_logs", bench(legacy_urls_from_performance_logs, logs, args.repeat),
+         bench(VideoUrlClassifier.urls_from_performance_logs, logs, args.repeat)),
+        ("is_video_url x5000",
+         bench(lambda urls: [legacy_is_video_url(u) for u in urls], sample_urls, args.repeat),
+         bench(lambda urls: [VideoUrlClassifier.is_video_url(u) for u in urls], sample_urls, args.repeat)),
+        ("filter_video_urls", bench(legacy_filter_video_urls, candidates, args.repeat),
+         bench(VideoUrlClassifier.filter_urls, candidates, args.repeat)),
+    ]
+
+    print(json.dumps({
+        "events": args.events,
+        "video_urls": len(new_urls),
+        "results": [
+            {"name": name, "legacy_ms": round(old * 1000, 2), "new_ms": round(new * 1000, 2),
+             "speedup": round(old / new, 1) if new else None}
+            for name, old, new in rows
+        ]
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
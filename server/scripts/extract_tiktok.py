@@ -8,27 +8,2067 @@ import time
 import sys
 import os
 import random
-from typing import List, Optional, Dict, Any
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
+import sqlite3
+import argparse
+import socketserver
+import threading
+import signal
+import multiprocessing
+import uuid
+import cProfile
+import tracemalloc
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from multiprocessing.connection import wait as wait_connections
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait as wait_futures, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import List, Optional, Dict, Any, Tuple, TextIO, Iterator, Callable
+from urllib.parse import urlparse, parse_qs, unquote
+from requests.adapters import HTTPAdapter
+
+from video_cache import VideoPrefetchCache, VideoCacheServer, VIDEO_CACHE_DIR
+
+# selenium和webdriver_manager导入开销较大，仅在需要浏览器时才延迟导入
+
+# chromedriver路径缓存文件，避免每次启动都调用ChromeDriverManager().install()
+DRIVER_PATH_CACHE = os.environ.get(
+    'CHROMEDRIVER_PATH_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'tiktok_extractor', 'chromedriver_path.json')
+)
+
+# 精简页面模式下屏蔽的资源（Network.setBlockedURLs通配模式）：图片、字体、样式表和统计/监控脚本
+LEAN_BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.css',
+    '*mcs.snssdk.com*', '*mon.snssdk.com*', '*mssdk.bytedance.com*', '*log.snssdk.com*',
+    '*/slardar/*', '*/monitor_browser/*', '*google-analytics.com*', '*googletagmanager.com*',
+]
+
+# 提取结果缓存数据库
+RESULT_CACHE_PATH = os.environ.get(
+    'EXTRACTOR_CACHE_PATH',
+    os.path.join(os.path.expanduser('~'), '.cache', 'tiktok_extractor', 'results.sqlite3')
+)
+
+# 站点下发的会话Cookie，浏览器和HTTP客户端共用
+SESSION_PATH = os.environ.get(
+    'EXTRACTOR_SESSION_PATH',
+    os.path.join(os.path.expanduser('~'), '.cache', 'tiktok_extractor', 'session.json')
+)
+
+# 复用的Chrome用户数据目录
+CHROME_PROFILE_DIR = os.environ.get(
+    'EXTRACTOR_PROFILE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'tiktok_extractor', 'chrome-profile')
+)
+
+# 播放地址中可能携带过期时间(Unix时间戳)的查询参数
+URL_EXPIRY_PARAMS = ('x-expires', 'expires', 'x-oss-expires', 'Expires', 'deadline')
+
+
+def parse_url_expiry(url: str) -> Optional[float]:
+    """从签名播放地址中解析过期时间
+    
+    支持查询参数中的过期时间戳，以及douyinvod地址路径中的十六进制时间戳
+    （形如 https://v26-web.douyinvod.com/<签名>/<十六进制时间戳>/video/tos/...）
+    
+    Args:
+        url: 视频播放地址
+        
+    Returns:
+        过期时间(Unix时间戳)，无法解析时返回None
+    """
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+    
+    query = parse_qs(parsed.query)
+    for name in URL_EXPIRY_PARAMS:
+        for value in query.get(name, []):
+            if value.isdigit():
+                return float(value)
+    
+    if 'douyinvod.com' in parsed.netloc:
+        segments = [segment for segment in parsed.path.split('/') if segment]
+        if len(segments) >= 2 and re.fullmatch(r'[0-9a-fA-F]{8}', segments[1]):
+            timestamp = int(segments[1], 16)
+            # 只接受合理范围内的时间戳，避免把普通十六进制片段误判为过期时间
+            if 1_500_000_000 < timestamp < 4_000_000_000:
+                return float(timestamp)
+    
+    return None
+
+
+class ResultCache:
+    """以视频ID为键的提取结果磁盘缓存（SQLite），按播放地址的签名过期时间失效，按LRU限制条目数"""
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, max_entries: int = 5000,
+                 default_ttl: float = 600, expiry_margin: float = 60):
+        """初始化缓存
+        
+        Args:
+            path: SQLite数据库路径
+            max_entries: 最多保留的条目数，超出时淘汰最久未访问的条目
+            default_ttl: 播放地址不含过期时间时使用的保守有效期(秒)
+            expiry_margin: 在签名过期时间之前提前失效的秒数
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.expiry_margin = expiry_margin
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'video_id TEXT PRIMARY KEY, result TEXT NOT NULL, '
+            'expires_at REAL NOT NULL, last_access REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+    def ttl_for(self, url: Optional[str]) -> float:
+        """根据播放地址计算缓存有效期(秒)"""
+        expiry = parse_url_expiry(url) if url else None
+        if expiry is None:
+            return self.default_ttl
+        return max(0.0, expiry - time.time() - self.expiry_margin)
+
+    def _count(self, name: str) -> None:
+        self.conn.execute(
+            'INSERT INTO counters (name, value) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + 1',
+            (name,)
+        )
+
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """查询未过期的缓存结果
+        
+        Args:
+            video_id: 视频ID
+            
+        Returns:
+            缓存的提取结果，未命中时返回None
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT result, expires_at FROM results WHERE video_id = ?', (video_id,)
+            ).fetchone()
+            
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self.conn.execute('DELETE FROM results WHERE video_id = ?', (video_id,))
+                self.misses += 1
+                self._count('misses')
+                return None
+            
+            self.conn.execute('UPDATE results SET last_access = ? WHERE video_id = ?', (now, video_id))
+            self.hits += 1
+            self._count('hits')
+            return json.loads(row[0])
+
+    def put(self, video_id: str, result: Dict[str, Any]) -> None:
+        """写入成功的提取结果，并按LRU淘汰超出上限的条目
+        
+        Args:
+            video_id: 视频ID
+            result: extract_from_url返回的结果
+        """
+        ttl = self.ttl_for(result.get("url"))
+        if ttl <= 0:
+            return
+        
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO results (video_id, result, expires_at, last_access) VALUES (?, ?, ?, ?)',
+                (video_id, json.dumps(result), now + ttl, now)
+            )
+            self.conn.execute(
+                'DELETE FROM results WHERE video_id IN ('
+                'SELECT video_id FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计：本进程与累计的命中/未命中次数以及当前条目数"""
+        with self._lock:
+            totals = dict(self.conn.execute('SELECT name, value FROM counters').fetchall())
+            size = self.conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": totals.get('hits', 0),
+            "total_misses": totals.get('misses', 0),
+            "entries": size,
+            "max_entries": self.max_entries
+        }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self.conn.close()
+
+
+class RefreshAheadWorker:
+    """热门视频的提前刷新：记录最近请求的视频ID的请求热度和已解析的播放地址，
+    在签名地址过期前由后台线程重新解析最热门的条目，使热门视频的下一个请求不必重新完整提取
+
+    热度是按半衰期衰减的请求次数；后台刷新受每分钟次数预算限制。前台有完整提取在进行时只使用其中预留的部分，
+    持续有流量时最热门的条目仍能在过期前刷新，前台空闲时才用满预算
+    """
+
+    def __init__(self, refresh: Callable[[str], Optional[Dict[str, Any]]],
+                 busy: Optional[Callable[[], bool]] = None, budget_per_minute: int = 30,
+                 lead_time: float = 180, min_requests: float = 2, default_ttl: float = 600,
+                 half_life: float = 600, retry_delay: float = 30, max_entries: int = 2000,
+                 interval: float = 5, reserved_per_minute: Optional[int] = None):
+        """初始化
+
+        Args:
+            refresh: 重新解析一个视频ID的函数，返回新的提取结果，失败时返回None
+            busy: 前台是否繁忙的函数，返回True时只使用预留的预算
+            budget_per_minute: 任意60秒内最多的刷新次数
+            lead_time: 在播放地址过期前多少秒刷新，应大于结果缓存的提前失效时间
+            min_requests: 热度达到该值的条目才会刷新
+            default_ttl: 播放地址不含过期时间时假定的有效期(秒)
+            half_life: 热度衰减的半衰期(秒)
+            retry_delay: 刷新失败后再次尝试的间隔(秒)
+            max_entries: 最多记录的视频数，超出时丢弃热度最低的条目
+            interval: 后台检查的间隔(秒)
+            reserved_per_minute: 前台繁忙时任意60秒内仍可进行的刷新次数（不超过budget_per_minute），默认为预算的一半
+        """
+        self.refresh = refresh
+        self.busy = busy or (lambda: False)
+        self.budget_per_minute = budget_per_minute
+        if reserved_per_minute is None:
+            reserved_per_minute = (budget_per_minute + 1) // 2
+        self.reserved_per_minute = min(reserved_per_minute, budget_per_minute)
+        self.lead_time = lead_time
+        self.min_requests = min_requests
+        self.default_ttl = default_ttl
+        self.half_life = half_life
+        self.retry_delay = retry_delay
+        self.max_entries = max_entries
+        self.interval = interval
+        self.refreshed = 0
+        self.failed = 0
+        self.deferred = 0
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _heat(self, entry: Dict[str, Any], now: float) -> float:
+        return entry["heat"] * 0.5 ** ((now - entry["heat_at"]) / self.half_life)
+
+    def _expires_at(self, url: Optional[str], now: float) -> float:
+        expiry = parse_url_expiry(url) if url else None
+        return expiry if expiry is not None else now + self.default_ttl
+
+    def record(self, result: Dict[str, Any]) -> None:
+        """记录一次前台请求的成功结果（包括缓存命中）
+
+        Args:
+            result: extract_from_url返回的结果
+        """
+        video_id = result.get("id")
+        if not video_id or not result.get("url"):
+            return
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                entry = self._entries[video_id] = {"heat": 0.0, "heat_at": now, "requests": 0,
+                                                   "url": None, "expires_at": 0.0, "next_attempt": 0.0}
+            entry["heat"] = self._heat(entry, now) + 1
+            entry["heat_at"] = now
+            entry["requests"] += 1
+            if result["url"] != entry["url"]:
+                entry["url"] = result["url"]
+                entry["expires_at"] = self._expires_at(result["url"], now)
+            if len(self._entries) > self.max_entries:
+                coldest = min(self._entries, key=lambda key: self._heat(self._entries[key], now))
+                del self._entries[coldest]
+
+    def due(self) -> List[str]:
+        """即将过期且足够热门的视频ID，按热度从高到低排列"""
+        now = time.time()
+        with self._lock:
+            candidates = [(self._heat(entry, now), video_id) for video_id, entry in self._entries.items()
+                          if entry["expires_at"] - self.lead_time <= now and now >= entry["next_attempt"]]
+        return [video_id for heat, video_id in sorted(candidates, reverse=True) if heat >= self.min_requests]
+
+    def _take_budget(self, busy: bool) -> bool:
+        """占用一次刷新预算，前台繁忙时只能使用预留的部分"""
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 60:
+            self._recent.popleft()
+        limit = self.reserved_per_minute if busy else self.budget_per_minute
+        if len(self._recent) >= limit:
+            return False
+        self._recent.append(now)
+        return True
+
+    def run_once(self) -> int:
+        """刷新一轮到期的热门条目（最热门的优先），预算用完时停止，前台繁忙时只用到预留的预算
+
+        Returns:
+            本轮成功刷新的条目数
+        """
+        refreshed = 0
+        for video_id in self.due():
+            if self._stop.is_set():
+                break
+            busy = self.busy()
+            if not self._take_budget(busy):
+                if busy and len(self._recent) < self.budget_per_minute:
+                    # 预留的预算已用完，其余预算留到前台空闲时
+                    self.deferred += 1
+                break
+            try:
+                result = self.refresh(video_id)
+            except Exception as e:
+                print(f"提前刷新 {video_id} 失败: {e}", file=sys.stderr)
+                result = None
+            now = time.time()
+            with self._lock:
+                entry = self._entries.get(video_id)
+                if entry is None:
+                    continue
+                if result and result.get("url"):
+                    entry["url"] = result["url"]
+                    entry["expires_at"] = self._expires_at(result["url"], now)
+                    entry["next_attempt"] = 0.0
+                    self.refreshed += 1
+                    refreshed += 1
+                else:
+                    entry["next_attempt"] = now + self.retry_delay
+                    self.failed += 1
+        if refreshed:
+            print(f"提前刷新了 {refreshed} 个热门视频的播放地址", file=sys.stderr)
+        return refreshed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"提前刷新失败: {e}", file=sys.stderr)
+
+    def start(self) -> None:
+        """启动后台刷新线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='refresh-ahead', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台刷新线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        """记录的条目数、即将过期的条目数、刷新成功/失败/让路次数和最近60秒使用的预算"""
+        now = time.time()
+        with self._lock:
+            entries = len(self._entries)
+            expiring = sum(1 for entry in self._entries.values() if entry["expires_at"] - self.lead_time <= now)
+        return {
+            "entries": entries,
+            "expiring": expiring,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "budget_used": len(self._recent),
+            "budget_per_minute": self.budget_per_minute,
+            "reserved_per_minute": self.reserved_per_minute
+        }
+
+class SessionStore:
+    """站点会话存储：保存预热时站点实际下发的Cookie，供浏览器和HTTP客户端共用，
+    会话缺失、过旧或被拒绝时才需要重新预热"""
+
+    # 判断会话是否有效必需的Cookie
+    REQUIRED_COOKIES = ('ttwid',)
+
+    def __init__(self, path: Optional[str] = SESSION_PATH, max_age: float = 24 * 3600):
+        """初始化
+        
+        Args:
+            path: 会话文件路径，为None时只保存在内存中
+            max_age: 会话的最长使用时间(秒)，超过后重新预热
+        """
+        self.path = path
+        self.max_age = max_age
+        self.warmups = 0
+        self.rejections = 0
+        self._memory: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        if self.path is None:
+            return self._memory
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        if self.path is None:
+            self._memory = data
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # 先写临时文件再替换，多个进程同时写入时不会读到半个文件
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"保存会话失败: {e}", file=sys.stderr)
+
+    def load(self) -> Optional[List[Dict[str, Any]]]:
+        """读取仍然有效的会话Cookie
+        
+        Returns:
+            未过期的Cookie列表，会话缺失、被拒绝、过旧或缺少必需Cookie时返回None
+        """
+        with self._lock:
+            data = self._read()
+        if not data or data.get("rejected"):
+            return None
+        now = time.time()
+        if now - data.get("saved_at", 0) > self.max_age:
+            return None
+        cookies = [cookie for cookie in data.get("cookies", [])
+                   if not cookie.get("expiry") or cookie["expiry"] > now]
+        names = {cookie.get("name") for cookie in cookies}
+        if not all(name in names for name in self.REQUIRED_COOKIES):
+            return None
+        return cookies
+
+    def save(self, cookies: List[Dict[str, Any]]) -> bool:
+        """保存浏览器中的Cookie（driver.get_cookies()的格式）
+        
+        Args:
+            cookies: Cookie列表
+            
+        Returns:
+            内容是否有变化
+        """
+        with self._lock:
+            previous = self._read() or {}
+            changed = previous.get("rejected") or \
+                {c.get("name"): c.get("value") for c in previous.get("cookies", [])} != \
+                {c.get("name"): c.get("value") for c in cookies}
+            if changed:
+                self._write({"saved_at": time.time(), "cookies": cookies})
+        return bool(changed)
+
+    def reject(self) -> None:
+        """标记会话已被站点拒绝，下次使用前重新预热"""
+        with self._lock:
+            data = self._read()
+            if not data or data.get("rejected"):
+                return
+            data["rejected"] = True
+            self._write(data)
+        self.rejections += 1
+        print("会话已被拒绝，下次提取前重新预热", file=sys.stderr)
+
+    @staticmethod
+    def apply_to_session(session: requests.Session, cookies: List[Dict[str, Any]]) -> None:
+        """把Cookie写入HTTP会话"""
+        for cookie in cookies:
+            session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", '.douyin.com'),
+                                path=cookie.get("path", '/'))
+
+    @staticmethod
+    def to_cdp(cookies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """转换为Network.setCookies的参数格式，不需要先打开站点页面即可写入浏览器"""
+        converted = []
+        for cookie in cookies:
+            item = {
+                "name": cookie["name"],
+                "value": cookie["value"],
+                "domain": cookie.get("domain", '.douyin.com'),
+                "path": cookie.get("path", '/'),
+                "secure": bool(cookie.get("secure")),
+                "httpOnly": bool(cookie.get("httpOnly"))
+            }
+            if cookie.get("expiry"):
+                item["expires"] = cookie["expiry"]
+            if cookie.get("sameSite"):
+                item["sameSite"] = cookie["sameSite"]
+            converted.append(item)
+        return converted
+
+    def stats(self) -> Dict[str, Any]:
+        """当前会话是否有效、保存时间以及本进程的预热和被拒绝次数"""
+        with self._lock:
+            data = self._read() or {}
+        return {
+            "valid": self.load() is not None,
+            "saved_at": data.get("saved_at"),
+            "cookies": len(data.get("cookies", [])),
+            "warmups": self.warmups,
+            "rejections": self.rejections
+        }
+
+# 从完整视频URL中提取视频ID的模式
+VIDEO_ID_PATTERNS = [
+    re.compile(r'modal_id=(\d+)'),
+    re.compile(r'/video/(\d+)')
+]
+
+
+def parse_video_id(url: str) -> Optional[str]:
+    """按VIDEO_ID_PATTERNS从完整URL中匹配视频ID，不做任何网络请求"""
+    for pattern in VIDEO_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return None
+
+
+class RequestScheduler:
+    """出站请求调度器：每个主机一个令牌桶和并发上限，遇到限流信号（429/403/空响应）时退避并降低速率
+
+    速率按AIMD自适应：正常响应后线性提高（不超过max_rate），限流信号后减半并暂停该主机一段时间，
+    使请求速率维持在上游能容忍的最高水平，而不是触发封禁后让所有请求落到浏览器方法
+    """
+
+    # 视为限流的响应状态码
+    THROTTLE_STATUSES = (403, 429)
+
+    def __init__(self, max_rate: Optional[float] = 10, min_rate: float = 0.2, burst: float = 5,
+                 max_concurrency: int = 8, rate_step: float = 0.2, backoff: float = 1.0,
+                 max_backoff: float = 60, max_wait: float = 30, tracer: Optional['ExtractionTracer'] = None):
+        """初始化调度器
+
+        Args:
+            max_rate: 每个主机每秒请求数上限，为None时不限速（仍限制并发并在限流时退避）
+            min_rate: 限流后速率降低的下限
+            burst: 令牌桶容量，允许的瞬时突发请求数
+            max_concurrency: 每个主机同时进行的请求数上限
+            rate_step: 每次正常响应后提高的速率
+            backoff: 首次限流后暂停该主机的时间(秒)，连续限流时加倍
+            max_backoff: 暂停时间上限(秒)
+            max_wait: 单个请求排队等待的上限(秒)，超过时抛出TimeoutError
+            tracer: 记录排队等待时间的追踪器
+        """
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.rate_step = rate_step
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_wait = max_wait
+        self.tracer = tracer
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+
+    def _state(self, host: str) -> Dict[str, Any]:
+        state = self._states.get(host)
+        if state is None:
+            state = self._states[host] = {
+                "rate": self.max_rate,
+                "tokens": self.burst,
+                "updated": time.monotonic(),
+                "active": 0,
+                "waiting": 0,
+                "blocked_until": 0.0,
+                "streak": 0,
+                "requests": 0,
+                "throttled": 0,
+                "timeouts": 0
+            }
+        return state
+
+    def _refill(self, state: Dict[str, Any], now: float) -> None:
+        if state["rate"] is not None:
+            state["tokens"] = min(self.burst, state["tokens"] + (now - state["updated"]) * state["rate"])
+        state["updated"] = now
+
+    def acquire(self, url: str) -> str:
+        """排队等待目标主机的令牌和并发名额
+
+        Args:
+            url: 请求地址
+
+        Returns:
+            主机名，请求结束后传给release
+
+        Raises:
+            TimeoutError: 等待超过max_wait
+        """
+        host = urlparse(url).hostname or ''
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        with self._cond:
+            state = self._state(host)
+            state["waiting"] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(state, now)
+                    if now < state["blocked_until"]:
+                        delay = state["blocked_until"] - now
+                    elif state["active"] >= self.max_concurrency:
+                        delay = None
+                    elif state["rate"] is not None and state["tokens"] < 1:
+                        delay = (1 - state["tokens"]) / state["rate"]
+                    else:
+                        if state["rate"] is not None:
+                            state["tokens"] -= 1
+                        state["active"] += 1
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        state["timeouts"] += 1
+                        raise TimeoutError(f"等待请求配额超时: {host}")
+                    self._cond.wait(remaining if delay is None else min(delay, remaining))
+            finally:
+                state["waiting"] -= 1
+
+        if self.tracer:
+            self.tracer.observe('extractor_scheduler_wait_seconds', 'host', host, time.monotonic() - start)
+        return host
+
+    def release(self, host: str, throttled: Optional[bool] = None) -> None:
+        """归还并发名额，并根据响应调整该主机的速率
+
+        Args:
+            host: acquire返回的主机名
+            throttled: 响应是否为限流信号，为None时（请求出错或无法判断）不调整速率
+        """
+        with self._cond:
+            state = self._states[host]
+            state["active"] -= 1
+            state["requests"] += 1
+            if throttled:
+                state["throttled"] += 1
+                now = time.monotonic()
+                # 暂停期间陆续返回的限流响应是同一次限流，只在暂停结束后再次限流时才加倍暂停并降速
+                if now >= state["blocked_until"]:
+                    state["streak"] += 1
+                    pause = min(self.max_backoff, self.backoff * 2 ** (state["streak"] - 1))
+                    state["blocked_until"] = now + pause
+                    if state["rate"] is not None:
+                        state["rate"] = max(self.min_rate, state["rate"] / 2)
+                        state["tokens"] = min(state["tokens"], 0)
+                    print(f"主机 {host} 返回限流信号，暂停{pause:.1f}秒", file=sys.stderr)
+            elif throttled is not None:
+                state["streak"] = 0
+                if state["rate"] is not None:
+                    state["rate"] = min(self.max_rate, state["rate"] + self.rate_step)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[Dict[str, Any]]:
+        """在调度下执行一个请求，with块内应把响应是否为限流信号写入返回字典的throttled键
+
+        Args:
+            url: 请求地址
+        """
+        host = self.acquire(url)
+        outcome: Dict[str, Any] = {"throttled": None}
+        try:
+            yield outcome
+        finally:
+            self.release(host, outcome["throttled"])
+
+    @classmethod
+    def is_throttled(cls, response: requests.Response, check_body: bool = True) -> bool:
+        """判断响应是否为限流信号：403/429，或状态码200但响应体为空"""
+        if response.status_code in cls.THROTTLE_STATUSES:
+            return True
+        return check_body and response.status_code == 200 and not response.content
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各主机的当前速率、排队数、进行中的请求数、剩余暂停时间和累计计数"""
+        now = time.monotonic()
+        with self._cond:
+            return {
+                host: {
+                    "rate": round(state["rate"], 3) if state["rate"] is not None else None,
+                    "queue_depth": state["waiting"],
+                    "in_flight": state["active"],
+                    "blocked_for": round(max(0.0, state["blocked_until"] - now), 3),
+                    "requests": state["requests"],
+                    "throttled": state["throttled"],
+                    "timeouts": state["timeouts"]
+                }
+                for host, state in self._states.items()
+            }
+
+    def queue_depth(self) -> int:
+        """所有主机正在排队的请求数"""
+        with self._cond:
+            return sum(state["waiting"] for state in self._states.values())
+
+    def prometheus(self) -> str:
+        """以Prometheus文本格式导出各主机的排队数、进行中的请求数、速率和限流次数"""
+        stats = self.stats()
+        metrics = (
+            ('extractor_scheduler_queue_depth', 'gauge', 'queue_depth'),
+            ('extractor_scheduler_in_flight', 'gauge', 'in_flight'),
+            ('extractor_scheduler_rate', 'gauge', 'rate'),
+            ('extractor_scheduler_throttled_total', 'counter', 'throttled'),
+        )
+        lines = []
+        for metric, kind, field in metrics:
+            lines.append(f"# TYPE {metric} {kind}")
+            for host in sorted(stats):
+                value = stats[host][field]
+                if value is not None:
+                    lines.append(f'{metric}{{host="{host}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class ScheduledAdapter(HTTPAdapter):
+    """经过RequestScheduler发送请求的连接池适配器，挂载到Session后该会话的所有请求都受调度"""
+
+    def __init__(self, scheduler: RequestScheduler, tracked: Optional[Callable[[str], bool]] = None, **kwargs):
+        """初始化
+
+        Args:
+            scheduler: 出站请求调度器
+            tracked: 判断请求地址是否由端点健康统计（熔断）跟踪的函数，这类请求的空响应
+                由端点健康统计判断，不作为整个主机的限流信号
+            **kwargs: 传给HTTPAdapter的参数
+        """
+        self.scheduler = scheduler
+        self.tracked = tracked
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, **kwargs):
+        with self.scheduler.slot(request.url) as outcome:
+            response = super().send(request, stream=stream, **kwargs)
+            # 流式请求不在这里读取响应体，只按状态码判断
+            check_body = not stream and not (self.tracked and self.tracked(request.url))
+            outcome["throttled"] = RequestScheduler.is_throttled(response, check_body=check_body)
+        return response
+
+
+class ShortLinkResolver:
+    """v.douyin.com分享短链接解析器：限制并发跳转请求数，复用连接池，用LRU记忆 短链接->视频ID"""
+
+    def __init__(self, session: requests.Session, timeout: Tuple[float, float] = (3.05, 5),
+                 max_in_flight: int = 8, max_entries: int = 10000):
+        """初始化解析器
+        
+        Args:
+            session: 复用的HTTP会话（连接池）
+            timeout: 跳转请求的(连接, 读取)超时(秒)
+            max_in_flight: 同时进行的跳转请求上限
+            max_entries: 记忆的短链接数量上限
+        """
+        self.session = session
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='short-link')
+        self._memo: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(link: str) -> str:
+        """去掉分享文案中的空白和末尾斜杠，使同一短链接得到相同的键"""
+        return link.strip().rstrip('/')
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            video_id = self._memo.get(key)
+            if video_id is None:
+                self.misses += 1
+                return None
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return video_id
+
+    def _remember(self, key: str, video_id: str) -> None:
+        with self._lock:
+            self._memo[key] = video_id
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+    def _follow(self, link: str) -> Optional[str]:
+        """请求短链接并从跳转地址中解析视频ID"""
+        try:
+            response = self.session.get(link, allow_redirects=False, timeout=self.timeout)
+            location = response.headers.get('Location')
+            if not location:
+                print(f"短链接未返回跳转地址: {link}", file=sys.stderr)
+                return None
+            return parse_video_id(location)
+        except Exception as e:
+            print(f"处理短链接跳转失败: {e}", file=sys.stderr)
+            return None
+
+    def resolve(self, link: str) -> Optional[str]:
+        """解析单个短链接
+        
+        Args:
+            link: v.douyin.com短链接
+            
+        Returns:
+            视频ID，解析失败时返回None
+        """
+        return self.resolve_many([link]).get(link)
+
+    def resolve_many(self, links: List[str]) -> Dict[str, Optional[str]]:
+        """批量解析短链接，已记忆的直接返回，其余并发请求（受max_in_flight限制）
+        
+        Args:
+            links: 短链接列表
+            
+        Returns:
+            短链接到视频ID的映射，解析失败的为None
+        """
+        results: Dict[str, Optional[str]] = {}
+        pending: Dict[str, List[str]] = {}
+        
+        for link in links:
+            key = self.normalize(link)
+            video_id = self._lookup(key)
+            if video_id is not None:
+                results[link] = video_id
+            else:
+                # 同一批中重复的短链接只请求一次
+                pending.setdefault(key, []).append(link)
+        
+        futures = {self.executor.submit(self._follow, key): key for key in pending}
+        for future in as_completed(futures):
+            key = futures[future]
+            video_id = future.result()
+            if video_id is not None:
+                # 解析失败的结果不记忆，下次重新请求
+                self._remember(key, video_id)
+            for link in pending[key]:
+                results[link] = video_id
+        
+        return results
+
+    def close(self) -> None:
+        """关闭跳转请求线程池（连接池属于共用的HTTP会话）"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SingleFlight:
+    """合并同一个键上进行中的工作：同一时间每个键只执行一次，期间到达的调用等待这一次执行并共享其结果（包括失败）
+
+    失败的结果在failure_ttl秒内继续共享，紧接着到达的请求不会对同一个失败的视频立即重试
+    """
+
+    def __init__(self, failure_ttl: float = 5):
+        """初始化
+
+        Args:
+            failure_ttl: 失败结果继续共享的时间(秒)，为0时执行结束即不再共享
+        """
+        self.failure_ttl = failure_ttl
+        # 键 -> (共享的结果, 失败结果停止共享的时刻，执行中为None)
+        self._calls: Dict[str, Tuple[Future, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.failures_shared = 0
+
+    def _prune(self, now: float) -> None:
+        """丢弃已过共享时间的失败结果，调用方需持有锁"""
+        expired = [key for key, (_, until) in self._calls.items() if until is not None and until <= now]
+        for key in expired:
+            del self._calls[key]
+
+    def do(self, key: str, work: Callable[[], Any],
+           failed: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, bool]:
+        """执行或加入键上进行中的工作
+
+        Args:
+            key: 合并的键
+            work: 没有进行中的工作时执行的函数
+            failed: 判断结果是否为失败的函数，失败的结果在failure_ttl秒内继续共享；异常总是视为失败
+
+        Returns:
+            (结果, 是否共享了其他调用的执行)；共享的异常原样抛出
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                if call[1] is not None:
+                    self.failures_shared += 1
+            else:
+                self.leaders += 1
+                future: Future = Future()
+                self._calls[key] = (future, None)
+        if call is not None:
+            return call[0].result(), True
+
+        try:
+            result = work()
+        except BaseException as e:
+            self._finish(key, future, True)
+            future.set_exception(e)
+            raise
+        self._finish(key, future, bool(failed and failed(result)))
+        future.set_result(result)
+        return result, False
+
+    def _finish(self, key: str, future: Future, failed: bool) -> None:
+        """执行结束：失败的结果保留failure_ttl秒，其余立即移除"""
+        with self._lock:
+            if self._calls.get(key, (None,))[0] is not future:
+                return
+            if failed and self.failure_ttl > 0:
+                self._calls[key] = (future, time.monotonic() + self.failure_ttl)
+            else:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """执行次数、被合并的请求数和当前进行中的键数
+
+        leaders是实际执行的次数（按唯一视频计的容量需求），coalesced是等待其他请求的执行而未重复工作的请求数
+        """
+        with self._lock:
+            in_flight = sum(1 for _, until in self._calls.values() if until is None)
+            total = self.leaders + self.coalesced
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "failures_shared": self.failures_shared,
+                "in_flight": in_flight,
+                "coalesced_ratio": round(self.coalesced / total, 3) if total else None
+            }
+
+    def prometheus(self) -> str:
+        """以Prometheus文本格式导出执行次数和被合并的请求数"""
+        stats = self.stats()
+        return (
+            "# TYPE extractor_singleflight_leaders_total counter\n"
+            f"extractor_singleflight_leaders_total {stats['leaders']}\n"
+            "# TYPE extractor_singleflight_coalesced_total counter\n"
+            f"extractor_singleflight_coalesced_total {stats['coalesced']}\n"
+            "# TYPE extractor_singleflight_in_flight gauge\n"
+            f"extractor_singleflight_in_flight {stats['in_flight']}\n"
+        )
+
+
+class EndpointHealth:
+    """端点健康统计：按滑动窗口记录各端点（或提取策略）的成功率和耗时，按预期成功耗时排序，连续失败时熔断
+
+    预期成功耗时 = 平均耗时 / 成功率（拉普拉斯平滑，样本少的端点不会被过早排到最后）；
+    熔断后在冷却期内跳过该端点，冷却期过后放行一次探测，探测成功则恢复，失败则冷却期加倍
+    """
+
+    def __init__(self, window: int = 50, failure_threshold: int = 3, cooldown: float = 30,
+                 max_cooldown: float = 600, default_latency: float = 1.0,
+                 hedge_min_samples: int = 10, hedge_success_rate: float = 0.9):
+        """初始化
+
+        Args:
+            window: 每个端点保留的最近结果数
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 首次熔断的冷却期(秒)
+            max_cooldown: 探测连续失败时冷却期的上限(秒)
+            default_latency: 没有样本的端点假定的耗时(秒)
+            hedge_min_samples: 计算延迟发起时间所需的最少样本数
+            hedge_success_rate: 成功率达到该值的端点才会推迟后续端点的发起
+        """
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.default_latency = default_latency
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_success_rate = hedge_success_rate
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, key: str) -> Dict[str, Any]:
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = {
+                "samples": deque(maxlen=self.window),
+                "failures": 0,
+                "open_until": None,
+                "cooldown": self.cooldown,
+                "probing": False,
+                "trips": 0
+            }
+        return state
+
+    def _expected_time(self, state: Dict[str, Any]) -> float:
+        samples = state["samples"]
+        if not samples:
+            return self.default_latency * 2
+        successes = sum(1 for ok, _ in samples if ok)
+        mean = sum(seconds for _, seconds in samples) / len(samples)
+        return mean * (len(samples) + 2) / (successes + 1)
+
+    def _allow(self, state: Dict[str, Any], now: float) -> bool:
+        if state["open_until"] is None:
+            return True
+        if now < state["open_until"]:
+            return False
+        # 冷却期已过：放行一次探测，并重新计时，探测结果未返回前不再放行
+        state["open_until"] = now + state["cooldown"]
+        state["probing"] = True
+        return True
+
+    def rank(self, keys: List[str]) -> List[str]:
+        """按预期成功耗时排序，去掉熔断中的端点（预期耗时相同时保持原顺序）
+
+        Args:
+            keys: 端点列表，按默认优先级排列
+
+        Returns:
+            可以请求的端点，全部熔断时为空列表
+        """
+        now = time.monotonic()
+        with self._lock:
+            allowed = [(self._expected_time(state), key) for key, state in
+                       ((key, self._state(key)) for key in keys) if self._allow(state, now)]
+        return [key for _, key in sorted(allowed, key=lambda item: item[0])]
+
+    def hedge_after(self, key: str) -> Optional[float]:
+        """端点足够可靠时返回其成功请求耗时的p90，调用方可以在这之后才发起下一个端点
+
+        Args:
+            key: 端点
+
+        Returns:
+            延迟(秒)，样本不足或成功率不够时返回None
+        """
+        with self._lock:
+            samples = list(self._state(key)["samples"])
+        if len(samples) < self.hedge_min_samples:
+            return None
+        latencies = sorted(seconds for ok, seconds in samples if ok)
+        if len(latencies) < self.hedge_success_rate * len(samples):
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.9))]
+
+    def record(self, key: str, ok: bool, seconds: float) -> None:
+        """记录一次请求结果
+
+        Args:
+            key: 端点
+            ok: 是否得到了有效结果
+            seconds: 耗时(秒)
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(key)
+            state["samples"].append((ok, seconds))
+            if ok:
+                if state["open_until"] is not None:
+                    print(f"端点已恢复: {key}", file=sys.stderr)
+                state.update(failures=0, open_until=None, cooldown=self.cooldown, probing=False)
+                return
+
+            state["failures"] += 1
+            if state["probing"]:
+                state["cooldown"] = min(state["cooldown"] * 2, self.max_cooldown)
+                state["open_until"] = now + state["cooldown"]
+                state["probing"] = False
+                print(f"端点探测失败，{state['cooldown']:.0f}秒后重试: {key}", file=sys.stderr)
+            elif state["open_until"] is None and state["failures"] >= self.failure_threshold:
+                state["open_until"] = now + state["cooldown"]
+                state["trips"] += 1
+                print(f"端点连续失败{state['failures']}次，熔断{state['cooldown']:.0f}秒: {key}", file=sys.stderr)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各端点的窗口内样本数、成功率、平均耗时、预期成功耗时和熔断状态"""
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for key, state in self._states.items():
+                samples = state["samples"]
+                if state["open_until"] is None:
+                    breaker = "closed"
+                elif now < state["open_until"] and not state["probing"]:
+                    breaker = "open"
+                else:
+                    breaker = "half_open"
+                result[key] = {
+                    "samples": len(samples),
+                    "success_rate": round(sum(1 for ok, _ in samples if ok) / len(samples), 3) if samples else None,
+                    "mean_ms": round(sum(seconds for _, seconds in samples) / len(samples) * 1000, 3) if samples else None,
+                    "expected_ms": round(self._expected_time(state) * 1000, 3),
+                    "breaker": breaker,
+                    "consecutive_failures": state["failures"],
+                    "trips": state["trips"]
+                }
+        return result
+
+
+class DouyinApiClient:
+    """抖音API客户端：复用连接池，严格限制连接/读取超时，并发查询多个API端点"""
+
+    # 可能返回视频地址的API端点，按默认优先级排列
+    API_ENDPOINTS = [
+        "https://www.douyin.com/aweme/v1/web/aweme/detail/?aweme_id={video_id}",
+        "https://www.iesdouyin.com/web/api/v2/aweme/iteminfo/?item_ids={video_id}"
+    ]
+    
+    # 支持一次查询多个视频的端点，item_ids为逗号分隔的视频ID
+    BULK_ENDPOINT = "https://www.iesdouyin.com/web/api/v2/aweme/iteminfo/?item_ids={video_ids}"
+
+    def __init__(self, headers: Dict[str, str], connect_timeout: float = 3.05,
+                 read_timeout: float = 8, max_workers: int = 8, bulk_chunk_size: int = 20,
+                 scheduler: Optional[RequestScheduler] = None):
+        """初始化API客户端
+        
+        Args:
+            headers: 请求头
+            connect_timeout: 连接超时(秒)
+            read_timeout: 读取超时(秒)
+            max_workers: 并发请求的最大线程数，同时也是每个主机的连接池大小
+            bulk_chunk_size: 批量查询时每个请求携带的视频ID数
+            scheduler: 出站请求调度器，设置后该会话的所有请求（包括共用会话的短链接解析和页面数据请求）都经过它
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.bulk_chunk_size = bulk_chunk_size
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        if scheduler:
+            # aweme/detail对无效视频正常返回空响应，不能因此暂停整个主机（页面数据和浏览器也在同一主机）
+            adapter = ScheduledAdapter(scheduler, tracked=self.is_api_url, pool_connections=4,
+                                       pool_maxsize=max_workers, max_retries=0)
+        else:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='douyin-api')
+        self.health = EndpointHealth()
+
+    @staticmethod
+    def parse_play_urls(data: Dict[str, Any]) -> List[str]:
+        """从API响应中解析播放地址
+        
+        Args:
+            data: API返回的JSON数据
+            
+        Returns:
+            视频URL列表，未找到时为空列表
+        """
+        # 第一种API响应结构
+        if 'aweme_detail' in data and data['aweme_detail'] and 'video' in data['aweme_detail']:
+            video_data = data['aweme_detail']['video']
+            if 'play_addr' in video_data and 'url_list' in video_data['play_addr']:
+                return video_data['play_addr']['url_list'] or []
+        
+        # 第二种API响应结构
+        if 'item_list' in data and data['item_list']:
+            item = data['item_list'][0]
+            if 'video' in item and 'play_addr' in item['video']:
+                play_addr = item['video']['play_addr']
+                if 'url_list' in play_addr and play_addr['url_list']:
+                    return play_addr['url_list']
+        
+        return []
+
+    @staticmethod
+    def parse_items(data: Dict[str, Any], video_ids: List[str]) -> Dict[str, List[str]]:
+        """从批量查询的响应中解析每个视频的播放地址，按条目的aweme_id对应回视频ID
+        
+        Args:
+            data: API返回的JSON数据
+            video_ids: 本次请求的视频ID
+            
+        Returns:
+            视频ID到URL列表的映射，只包含有播放地址的视频
+        """
+        requested = set(video_ids)
+        found: Dict[str, List[str]] = {}
+        for item in data.get('item_list') or []:
+            if not isinstance(item, dict):
+                continue
+            video_id = str(item.get('aweme_id') or '')
+            if not video_id and len(video_ids) == 1:
+                # 只请求了一个视频时，缺少aweme_id的条目也只能属于它
+                video_id = video_ids[0]
+            if video_id not in requested:
+                continue
+            urls = ((item.get('video') or {}).get('play_addr') or {}).get('url_list') or []
+            if urls:
+                found[video_id] = urls
+        return found
+
+    def fetch_bulk(self, video_ids: List[str]) -> Dict[str, List[str]]:
+        """用一个请求查询多个视频
+        
+        Args:
+            video_ids: 视频ID列表
+            
+        Returns:
+            视频ID到URL列表的映射，只包含有播放地址的视频，请求失败时为空
+        """
+        api_url = self.BULK_ENDPOINT.format(video_ids=','.join(video_ids))
+        start = time.monotonic()
+        found: Dict[str, List[str]] = {}
+        healthy = False
+        try:
+            print(f"批量查询API: {len(video_ids)} 个视频", file=sys.stderr)
+            response = self.session.get(api_url, timeout=self.timeout)
+            data = self._parse_response(response)
+            if data is not None:
+                healthy = True
+                found = self.parse_items(data, video_ids)
+        except Exception as e:
+            print(f"批量查询API调用失败: {e}", file=sys.stderr)
+        self.health.record(self.BULK_ENDPOINT, healthy, time.monotonic() - start)
+        return found
+
+    def resolve_bulk(self, video_ids: List[str]) -> Dict[str, List[str]]:
+        """批量解析多个视频ID：按bulk_chunk_size分组并发批量查询，
+        批量结果中缺失的视频再逐个回退到get_many的单视频端点
+        
+        Args:
+            video_ids: 视频ID列表
+            
+        Returns:
+            视频ID到URL列表的映射，失败的ID对应空列表
+        """
+        unique_ids = list(dict.fromkeys(video_ids))
+        results: Dict[str, List[str]] = {video_id: [] for video_id in unique_ids}
+        chunks = [unique_ids[i:i + self.bulk_chunk_size] for i in range(0, len(unique_ids), self.bulk_chunk_size)]
+        
+        if self.health.rank([self.BULK_ENDPOINT]):
+            futures = [self.executor.submit(self.fetch_bulk, chunk) for chunk in chunks]
+            try:
+                for future in as_completed(futures, timeout=self._deadline()):
+                    results.update(future.result())
+            except FuturesTimeoutError:
+                print("批量查询API超过整体等待时间", file=sys.stderr)
+        else:
+            print("批量查询端点处于熔断状态，逐个查询", file=sys.stderr)
+        
+        missing = [video_id for video_id in unique_ids if not results[video_id]]
+        print(f"批量查询 {len(chunks)} 个请求解析 {len(unique_ids) - len(missing)}/{len(unique_ids)} 个视频",
+              file=sys.stderr)
+        if missing:
+            results.update(self.get_many(missing))
+        return results
+
+    def is_api_url(self, url: str) -> bool:
+        """是否为健康统计跟踪的API端点（单个视频查询或批量查询）的请求"""
+        parsed = urlparse(url)
+        return any((endpoint.hostname, endpoint.path) == (parsed.hostname, parsed.path)
+                   for endpoint in map(urlparse, self.API_ENDPOINTS + [self.BULK_ENDPOINT]))
+
+    def fetch_endpoint(self, api_url: str, endpoint: Optional[str] = None) -> List[str]:
+        """请求单个API端点并解析播放地址，结果计入端点健康统计
+        
+        Args:
+            api_url: 完整的API地址
+            endpoint: 健康统计使用的端点模板，默认为api_url
+            
+        Returns:
+            视频URL列表，请求失败或无结果时为空列表；只有请求失败才计为端点失败
+        """
+        start = time.monotonic()
+        urls: List[str] = []
+        healthy = False
+        try:
+            print(f"尝试API: {api_url}", file=sys.stderr)
+            response = self.session.get(api_url, timeout=self.timeout)
+            data = self._parse_response(response)
+            if data is not None:
+                healthy = True
+                urls = self.parse_play_urls(data)
+        except Exception as e:
+            print(f"API {api_url} 调用失败: {e}", file=sys.stderr)
+        self.health.record(endpoint or api_url, healthy, time.monotonic() - start)
+        return urls
+
+    @staticmethod
+    def _parse_response(response: requests.Response) -> Optional[Dict[str, Any]]:
+        """解析API响应体，非200或非空但无法解析时返回None
+        
+        aweme/detail对无效（已删除、私密）视频正常返回空的200响应，这里按不含视频的空结果{}处理；
+        能正常解析的响应即使不含该视频也说明端点本身可用，健康统计只把这里返回None的情况记为失败
+        """
+        if response.status_code != 200:
+            return None
+        if not response.content:
+            return {}
+        try:
+            data = response.json()
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _deadline(self) -> float:
+        """一轮并发请求的整体等待上限(秒)"""
+        return sum(self.timeout) + 1
+
+    def get_video_urls(self, video_id: str, cancel: Optional[threading.Event] = None) -> List[str]:
+        """并发查询所有端点，返回最先得到的有效播放地址
+        
+        Args:
+            video_id: 视频ID
+            cancel: 取消事件，被设置后不再等待未完成的请求
+            
+        Returns:
+            视频URL列表，所有端点均失败时为空列表
+        """
+        return self.get_many([video_id], cancel).get(video_id, [])
+
+    def get_many(self, video_ids: List[str], cancel: Optional[threading.Event] = None) -> Dict[str, List[str]]:
+        """并发解析多个视频ID，每个ID取最先返回有效结果的端点
+        
+        端点按健康统计的预期成功耗时排序，熔断中的端点不请求；排在前面的端点足够可靠时，
+        后面的端点推迟到它通常已经返回的时间才发起，该ID已发起的请求全部失败时则立即发起
+        
+        Args:
+            video_ids: 视频ID列表
+            cancel: 取消事件，被设置后取消尚未开始的请求并立即返回已得到的结果
+            
+        Returns:
+            视频ID到URL列表的映射，失败的ID对应空列表
+        """
+        results: Dict[str, List[str]] = {video_id: [] for video_id in video_ids}
+        endpoints = self.health.rank(self.API_ENDPOINTS)
+        if not endpoints:
+            print("所有API端点均处于熔断状态", file=sys.stderr)
+            return results
+        
+        # 每个端点相对本轮开始的发起时间
+        offsets = [0.0]
+        for endpoint in endpoints[:-1]:
+            offsets.append(offsets[-1] + (self.health.hedge_after(endpoint) or 0.0))
+        schedule = {video_id: deque(zip(offsets, endpoints)) for video_id in results}
+        in_flight = {video_id: 0 for video_id in results}
+        futures = {}
+        pending = set()
+        
+        def launch(elapsed: float) -> None:
+            for video_id, queue in schedule.items():
+                if results[video_id]:
+                    queue.clear()
+                while queue and (queue[0][0] <= elapsed or not in_flight[video_id]):
+                    _, endpoint = queue.popleft()
+                    api_url = endpoint.format(video_id=video_id)
+                    future = self.executor.submit(self.fetch_endpoint, api_url, endpoint)
+                    futures[future] = (video_id, api_url)
+                    in_flight[video_id] += 1
+                    pending.add(future)
+        
+        start = time.monotonic()
+        deadline = start + self._deadline()
+        launch(0)
+        while pending and not all(results.values()):
+            now = time.monotonic()
+            remaining = deadline - now
+            if remaining <= 0:
+                print("API请求超过整体等待时间", file=sys.stderr)
+                break
+            if cancel is not None and cancel.is_set():
+                print("API请求已取消", file=sys.stderr)
+                break
+            timeout = remaining
+            upcoming = [queue[0][0] for queue in schedule.values() if queue]
+            if upcoming:
+                timeout = min(timeout, max(0.0, start + min(upcoming) - now))
+            # 有取消事件时分段等待，以便及时响应取消
+            if cancel is not None:
+                timeout = min(timeout, 0.05)
+            done, _ = wait_futures(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            pending.difference_update(done)
+            for future in done:
+                video_id, api_url = futures[future]
+                in_flight[video_id] -= 1
+                if future.cancelled():
+                    continue
+                urls = future.result()
+                if urls and not results[video_id]:
+                    print(f"从API {api_url} 获取到 {len(urls)} 个URL", file=sys.stderr)
+                    results[video_id] = urls
+                    # 该ID已有结果，取消尚未开始的同ID请求
+                    for other, (other_id, _) in futures.items():
+                        if other_id == video_id:
+                            other.cancel()
+            launch(time.monotonic() - start)
+        
+        # 提前返回时不再需要尚未开始的请求
+        for future in pending:
+            future.cancel()
+        return results
+
+    def close(self) -> None:
+        """关闭线程池和连接池"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+class SsrPageExtractor:
+    """无浏览器的页面提取：用HTTP请求视频页面，结构化解析服务端渲染嵌入的JSON数据得到播放地址"""
+
+    # 依次尝试的页面，分享页的数据结构更稳定
+    PAGE_URLS = [
+        "https://www.douyin.com/video/{video_id}",
+        "https://www.iesdouyin.com/share/video/{video_id}/"
+    ]
+
+    # 以<script id="...">包裹的JSON数据（RENDER_DATA为URL编码的JSON）
+    SCRIPT_IDS = ('RENDER_DATA', 'SSR_HYDRATED_DATA', '__NEXT_DATA__')
+
+    # 以JavaScript赋值语句嵌入的JSON数据
+    SCRIPT_ASSIGNMENTS = ('window._ROUTER_DATA', 'window._SSR_HYDRATED_DATA', 'window.__INITIAL_STATE__')
+
+    def __init__(self, session: requests.Session, timeout: Tuple[float, float] = (3.05, 8)):
+        """初始化
+        
+        Args:
+            session: 复用的HTTP会话（连接池）
+            timeout: 页面请求的(连接, 读取)超时(秒)
+        """
+        self.session = session
+        self.timeout = timeout
+        self._decoder = json.JSONDecoder()
+
+    def parse_embedded_json(self, html: str) -> List[Any]:
+        """找出页面中嵌入的JSON数据块并解码
+        
+        只用字符串查找定位数据块边界，再交给JSON解码器，不对整页做正则回溯匹配
+        
+        Args:
+            html: 页面HTML
+            
+        Returns:
+            解码成功的JSON对象列表
+        """
+        blobs = []
+        
+        for script_id in self.SCRIPT_IDS:
+            marker = f'id="{script_id}"'
+            index = html.find(marker)
+            if index < 0:
+                continue
+            start = html.find('>', index) + 1
+            end = html.find('</script>', start)
+            if start <= 0 or end < 0:
+                continue
+            text = html[start:end].strip()
+            if text.startswith('%7B') or text.startswith('%5B'):
+                text = unquote(text)
+            try:
+                blobs.append(json.loads(text))
+            except ValueError as e:
+                print(f"解析页面数据{script_id}失败: {e}", file=sys.stderr)
+        
+        for assignment in self.SCRIPT_ASSIGNMENTS:
+            index = html.find(assignment)
+            if index < 0:
+                continue
+            start = html.find('=', index + len(assignment)) + 1
+            if start <= 0:
+                continue
+            # 跳过空白后从第一个字符开始解码，raw_decode会在JSON结束处停下
+            while start < len(html) and html[start].isspace():
+                start += 1
+            try:
+                blobs.append(self._decoder.raw_decode(html, start)[0])
+            except ValueError as e:
+                print(f"解析页面数据{assignment}失败: {e}", file=sys.stderr)
+        
+        return blobs
+
+    @staticmethod
+    def find_play_urls(data: Any) -> List[str]:
+        """在解码后的页面数据中查找播放地址
+        
+        支持接口结构 play_addr.url_list 以及网页结构 playAddr[].src / playAddr.urlList
+        
+        Args:
+            data: 页面JSON数据
+            
+        Returns:
+            播放地址列表（按出现顺序）
+        """
+        urls = []
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                for key in ('play_addr', 'playAddr', 'playApi'):
+                    value = node.get(key)
+                    if isinstance(value, dict):
+                        urls.extend(value.get('url_list') or value.get('urlList') or [])
+                    elif isinstance(value, list):
+                        urls.extend(item.get('src') for item in value if isinstance(item, dict) and item.get('src'))
+                    elif isinstance(value, str) and value:
+                        urls.append(value)
+                # 逆序入栈以保持文档顺序
+                stack.extend(reversed(list(node.values())))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+        
+        normalized = []
+        for url in urls:
+            if not isinstance(url, str):
+                continue
+            if url.startswith('//'):
+                url = 'https:' + url
+            normalized.append(url)
+        return normalized
+
+    def extract_urls(self, html: str) -> List[str]:
+        """从页面HTML中提取视频URL"""
+        urls = []
+        for blob in self.parse_embedded_json(html):
+            urls.extend(url for url in self.find_play_urls(blob) if VideoUrlClassifier.is_video_url(url))
+        return urls
+
+    def get_video_urls(self, video_id: str) -> List[str]:
+        """请求视频页面并解析播放地址
+        
+        Args:
+            video_id: 视频ID
+            
+        Returns:
+            视频URL列表，失败时为空列表
+        """
+        for page in self.PAGE_URLS:
+            page_url = page.format(video_id=video_id)
+            try:
+                print(f"尝试页面数据: {page_url}", file=sys.stderr)
+                response = self.session.get(page_url, timeout=self.timeout)
+                if response.status_code != 200:
+                    continue
+                urls = self.extract_urls(response.text)
+                if urls:
+                    print(f"从页面数据获取到 {len(urls)} 个URL", file=sys.stderr)
+                    return VideoUrlClassifier.filter_urls(urls)
+            except Exception as e:
+                print(f"页面数据 {page_url} 获取失败: {e}", file=sys.stderr)
+        return []
+
+
+class VideoUrlClassifier:
+    """视频URL分类与排序：URL用单个预编译正则匹配所有特征，性能日志先做原始字符串预筛再解析JSON"""
+
+    # 视频URL特征，与原先逐个子串判断的列表一致
+    VIDEO_INDICATORS = [
+        'douyinvod.com',
+        '/tos/',
+        'aweme.snssdk.com',
+        '.mp4',
+        'mime_type=video_mp4',
+        'play_addr',
+        'video_id='
+    ]
+    VIDEO_URL_PATTERN = re.compile('|'.join(re.escape(indicator) for indicator in VIDEO_INDICATORS))
+
+    # 性能日志中包含请求URL的事件
+    NETWORK_METHODS = ('Network.requestWillBeSent', 'Network.responseReceived')
+
+    @classmethod
+    def is_video_url(cls, url: str) -> bool:
+        """判断URL是否为视频URL"""
+        return cls.VIDEO_URL_PATTERN.search(url) is not None
+
+    @staticmethod
+    def rank(url: str) -> int:
+        """排序规则：首选包含douyinvod.com的URL，然后是mp4，再是aweme.snssdk.com，最后是其他"""
+        if 'douyinvod.com' in url:
+            return 0
+        if '.mp4' in url:
+            return 1
+        if 'aweme.snssdk.com' in url:
+            return 2
+        return 3
+
+    @classmethod
+    def filter_urls(cls, video_urls: List[str]) -> List[str]:
+        """O(n)保序去重后按优先级稳定排序"""
+        return sorted(dict.fromkeys(video_urls), key=cls.rank)
+
+    @classmethod
+    def urls_from_performance_logs(cls, logs: List[Dict[str, Any]]) -> List[str]:
+        """从性能日志条目中提取视频URL
+        
+        Args:
+            logs: driver.get_log('performance')返回的日志条目
+            
+        Returns:
+            视频URL列表（未去重）
+        """
+        return [url for _, url in cls._scan_performance_logs(logs)]
+
+    @classmethod
+    def urls_by_webview(cls, logs: List[Dict[str, Any]]) -> Dict[Optional[str], List[str]]:
+        """从性能日志条目中提取视频URL，按事件所属的标签页(DevTools target)分组
+        
+        多个标签页共用同一份性能日志，ChromeDriver在每条日志中记录产生事件的target ID(webview字段)
+        
+        Args:
+            logs: driver.get_log('performance')返回的日志条目
+            
+        Returns:
+            target ID到视频URL列表（未去重）的映射
+        """
+        grouped: Dict[Optional[str], List[str]] = {}
+        for webview, url in cls._scan_performance_logs(logs):
+            grouped.setdefault(webview, []).append(url)
+        return grouped
+
+    @classmethod
+    def _scan_performance_logs(cls, logs: List[Dict[str, Any]]) -> Iterator[Tuple[Optional[str], str]]:
+        """逐条筛选性能日志，产出(所属target ID, 视频URL)
+        
+        绝大多数事件与视频无关，先在原始字符串上预筛，只有可能命中的条目才做json.loads
+        """
+        search = cls.VIDEO_URL_PATTERN.search
+        for log in logs:
+            try:
+                raw = log['message']
+                # 原始字符串预筛：先排除非请求类事件，再排除不含任何视频特征的请求
+                # （长日志上逐个子串查找比正则交替匹配更快，正则只用于解析出的短URL）
+                if not any(method in raw for method in cls.NETWORK_METHODS):
+                    continue
+                if not any(indicator in raw for indicator in cls.VIDEO_INDICATORS):
+                    continue
+                
+                message = json.loads(raw)
+                log_entry = message['message']
+                method = log_entry.get('method')
+                
+                # 获取URL
+                if method == 'Network.responseReceived':
+                    url = log_entry['params']['response']['url']
+                elif method == 'Network.requestWillBeSent':
+                    url = log_entry['params']['request']['url']
+                else:
+                    continue
+                
+                # 筛选视频URL
+                if search(url) is not None:
+                    yield message.get('webview'), url
+            except (KeyError, TypeError, ValueError):
+                continue
+
+
+class ExtractionTracer:
+    """提取过程的分阶段计时：每个阶段记录为一个span，可输出为JSON事件，并汇总为分位数统计（可导出Prometheus文本格式）"""
+
+    # 汇总统计只保留每个指标最近的样本数
+    MAX_SAMPLES = 2048
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, stream: Optional[TextIO] = None, profile_threshold: Optional[float] = None,
+                 profile_dir: Optional[str] = None, owns_stream: bool = False):
+        """初始化追踪器
+        
+        Args:
+            stream: 输出JSON事件的流（每行一个事件），为None时只汇总统计不输出事件
+            profile_threshold: 慢请求阈值(秒)，设置后对每次提取启用cProfile和tracemalloc，
+                只保存超过阈值的请求的分析结果
+            profile_dir: 慢请求分析结果的保存目录
+            owns_stream: 流是否由追踪器打开，为True时close()会关闭它
+        """
+        self.stream = stream
+        self.owns_stream = owns_stream
+        self.profile_threshold = profile_threshold
+        self.profile_dir = profile_dir or os.path.join(os.path.expanduser('~'), '.cache', 'tiktok_extractor', 'profiles')
+        self._metrics: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # tracemalloc是进程级的，cProfile同一时间也只能有一个在运行；并发处理请求时同一时间只分析一个请求
+        self._profile_lock = threading.Lock()
+
+    def _stack(self) -> List[str]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @property
+    def trace_id(self) -> Optional[str]:
+        """当前线程正在进行的提取的追踪ID"""
+        return getattr(self._local, 'trace_id', None)
+
+    @contextmanager
+    def attach(self, trace_id: Optional[str]) -> Iterator[None]:
+        """在其他线程中沿用已有的追踪ID，使该线程记录的阶段归入同一次提取
+        
+        Args:
+            trace_id: 发起线程的追踪ID
+        """
+        previous = getattr(self._local, 'trace_id', None)
+        self._local.trace_id = trace_id
+        try:
+            yield
+        finally:
+            self._local.trace_id = previous
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        if not self.stream:
+            return
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            # 关闭后仍在运行的对冲线程的事件直接丢弃
+            if self.stream:
+                self.stream.write(line + "\n")
+                self.stream.flush()
+
+    def close(self) -> None:
+        """停止输出事件，关闭由追踪器打开的事件文件"""
+        with self._lock:
+            if self.stream and self.owns_stream:
+                self.stream.close()
+            self.stream = None
+
+    def observe(self, metric: str, label: str, value: str, seconds: float) -> None:
+        """记录一个耗时样本
+        
+        Args:
+            metric: 指标名
+            label: 标签名
+            value: 标签值
+            seconds: 耗时(秒)
+        """
+        key = (metric, label, value)
+        with self._lock:
+            entry = self._metrics.get(key)
+            if entry is None:
+                entry = self._metrics[key] = {"count": 0, "sum": 0.0, "samples": deque(maxlen=self.MAX_SAMPLES)}
+            entry["count"] += 1
+            entry["sum"] += seconds
+            entry["samples"].append(seconds)
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """记录一个阶段的耗时
+        
+        Args:
+            name: 阶段名
+            **attrs: 附加到事件上的属性，也可以在with块内修改返回的字典
+        """
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attrs
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            self.observe('extractor_stage_seconds', 'stage', name, duration)
+            event = {
+                "event": "span",
+                "trace_id": self.trace_id,
+                "name": name,
+                "parent": parent,
+                "duration_ms": round(duration * 1000, 3)
+            }
+            if attrs:
+                event["attrs"] = attrs
+            if error:
+                event["error"] = error
+            self._emit(event)
+
+    @contextmanager
+    def trace(self, url: str) -> Iterator[Dict[str, Any]]:
+        """追踪一次完整的提取，with块内应把最终结果写入返回字典的result键
+        
+        设置了慢请求阈值时对提取进行性能分析；多个提取并发进行时只分析其中一个，其余只计时
+        
+        Args:
+            url: 视频URL
+        """
+        self._local.trace_id = uuid.uuid4().hex[:16]
+        context: Dict[str, Any] = {"result": None}
+        
+        profiler = None
+        started_tracemalloc = False
+        if self.profile_threshold is not None and self._profile_lock.acquire(blocking=False):
+            try:
+                profiler = cProfile.Profile()
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    started_tracemalloc = True
+                profiler.enable()
+            except Exception as e:
+                print(f"启动性能分析失败: {e}", file=sys.stderr)
+                profiler = None
+                if started_tracemalloc:
+                    tracemalloc.stop()
+                    started_tracemalloc = False
+                self._profile_lock.release()
+        
+        start = time.perf_counter()
+        try:
+            yield context
+        finally:
+            duration = time.perf_counter() - start
+            if profiler:
+                profiler.disable()
+            
+            result = context.get("result") or {}
+            if result.get("coalesced"):
+                source = "coalesced"
+            else:
+                source = result.get("source") or ("cache" if result.get("cached") else "none")
+            self.observe('extractor_extraction_seconds', 'source', source, duration)
+            self._emit({
+                "event": "extraction",
+                "trace_id": self.trace_id,
+                "url": url,
+                "video_id": result.get("id"),
+                "success": bool(result.get("success")),
+                "source": source,
+                "duration_ms": round(duration * 1000, 3)
+            })
+            
+            if profiler:
+                try:
+                    if duration >= self.profile_threshold:
+                        self._save_profile(profiler, result.get("id"), duration)
+                finally:
+                    if started_tracemalloc:
+                        tracemalloc.stop()
+                    self._profile_lock.release()
+            self._local.trace_id = None
+
+    def _save_profile(self, profiler: cProfile.Profile, video_id: Optional[str], duration: float) -> None:
+        """保存慢请求的cProfile结果和tracemalloc内存分配统计"""
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            base = os.path.join(self.profile_dir, f"slow_{video_id or 'unknown'}_{self.trace_id}")
+            profiler.dump_stats(base + '.prof')
+            
+            snapshot = tracemalloc.take_snapshot()
+            with open(base + '.mem.txt', 'w', encoding='utf-8') as f:
+                f.write(f"duration: {duration:.3f}s\n")
+                for stat in snapshot.statistics('lineno')[:30]:
+                    f.write(f"{stat}\n")
+            
+            print(f"慢请求({duration:.2f}秒)分析结果已保存: {base}.prof", file=sys.stderr)
+            self._emit({"event": "profile", "trace_id": self.trace_id, "path": base + '.prof'})
+        except Exception as e:
+            print(f"保存慢请求分析结果失败: {e}", file=sys.stderr)
+
+    @staticmethod
+    def _quantile(samples: List[float], q: float) -> float:
+        index = min(len(samples) - 1, max(0, int(round(q * len(samples) + 0.5)) - 1))
+        return samples[index]
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """按指标和标签汇总的count/p50/p95/p99"""
+        with self._lock:
+            items = [(key, entry["count"], entry["sum"], sorted(entry["samples"]))
+                     for key, entry in self._metrics.items()]
+        
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (metric, _, value), count, total, samples in items:
+            stats = {"count": count, "sum": round(total, 6)}
+            for q in self.QUANTILES:
+                stats[f"p{int(q * 100)}"] = round(self._quantile(samples, q), 6) if samples else None
+            result.setdefault(metric, {})[value] = stats
+        return result
+
+    def prometheus(self) -> str:
+        """以Prometheus文本格式（summary类型）导出统计"""
+        with self._lock:
+            items = sorted((key, entry["count"], entry["sum"], sorted(entry["samples"]))
+                           for key, entry in self._metrics.items())
+        
+        lines = []
+        declared = set()
+        for (metric, label, value), count, total, samples in items:
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            escaped = value.replace('\\', '\\\\').replace('"', '\\"')
+            for q in self.QUANTILES:
+                if samples:
+                    lines.append(f'{metric}{{{label}="{escaped}",quantile="{q}"}} {self._quantile(samples, q):.6f}')
+            lines.append(f'{metric}_sum{{{label}="{escaped}"}} {total:.6f}')
+            lines.append(f'{metric}_count{{{label}="{escaped}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+# 在页面内执行的提取脚本：读取页面状态对象中的播放地址和媒体元素地址，只把筛选后的候选URL传回，
+# 避免通过WebDriver协议传输完整的page_source。arguments[0]为视频URL特征，arguments[1]为返回数量上限
+PAGE_STATE_SCRIPT = """
+return (function collectPageVideoUrls(indicators, limit) {
+    var urls = [];
+    var seen = {};
+    function isVideoUrl(url) {
+        for (var i = 0; i < indicators.length; i++) {
+            if (url.indexOf(indicators[i]) !== -1) { return true; }
+        }
+        return false;
+    }
+    function add(url) {
+        if (typeof url !== 'string' || !url) { return; }
+        if (url.indexOf('//') === 0) { url = 'https:' + url; }
+        if (!seen[url] && isVideoUrl(url) && urls.length < limit) {
+            seen[url] = true;
+            urls.push(url);
+        }
+    }
+    function walk(root) {
+        var stack = [root];
+        var visited = 0;
+        while (stack.length && visited < 200000) {
+            var node = stack.pop();
+            visited++;
+            if (!node || typeof node !== 'object') { continue; }
+            if (Array.isArray(node)) {
+                for (var i = node.length - 1; i >= 0; i--) { stack.push(node[i]); }
+                continue;
+            }
+            ['play_addr', 'playAddr', 'playApi'].forEach(function(key) {
+                var value = node[key];
+                if (!value) { return; }
+                if (typeof value === 'string') { add(value); }
+                else if (Array.isArray(value)) { value.forEach(function(item) { add(item && item.src); }); }
+                else { (value.url_list || value.urlList || []).forEach(add); }
+            });
+            var keys = Object.keys(node);
+            for (var j = keys.length - 1; j >= 0; j--) { stack.push(node[keys[j]]); }
+        }
+    }
+
+    ['RENDER_DATA', 'SSR_HYDRATED_DATA', '__NEXT_DATA__'].forEach(function(id) {
+        var script = document.getElementById(id);
+        if (!script) { return; }
+        try {
+            var text = script.textContent.trim();
+            if (text.indexOf('%7B') === 0 || text.indexOf('%5B') === 0) { text = decodeURIComponent(text); }
+            walk(JSON.parse(text));
+        } catch (e) {}
+    });
+    ['_ROUTER_DATA', '_SSR_HYDRATED_DATA', '__INITIAL_STATE__'].forEach(function(name) {
+        try { walk(window[name]); } catch (e) {}
+    });
+
+    document.querySelectorAll('video, video source').forEach(function(element) {
+        add(element.currentSrc || element.src);
+    });
+
+    if (!urls.length) {
+        var matches = document.documentElement.outerHTML.match(/https?:\\/\\/[^"'\\s]+\\.mp4[^"'\\s]*/g) || [];
+        matches.forEach(add);
+    }
+    return urls;
+})(arguments[0], arguments[1]);
+"""
 
 class TiktokExtractor:
     """抖音视频提取器：基于最新版本的TikTok_download_v1.py"""
 
-    def __init__(self, headless: bool = True, random_ua: bool = True):
+    # 性能日志中没有视频请求时，在页面内补充查找的方法，按默认优先级排列
+    PAGE_STRATEGIES = ('_get_urls_from_performance_entries', '_get_urls_from_page_state')
+    # 站点拒绝会话时跳转到的登录/验证页面地址特征
+    SESSION_REFUSED_URL_MARKERS = ('/login', 'passport', 'verify', 'captcha')
+    # 站点拒绝会话时页面中出现的验证码元素
+    SESSION_REFUSED_SELECTORS = ('#captcha_container', '#captcha-verify-image', '.captcha_verify_container',
+                                 'iframe[src*="verify"]')
+
+    def __init__(self, headless: bool = True, random_ua: bool = True, keep_alive: bool = False,
+                 use_browser: bool = True, use_cache: bool = True, lean_page: bool = False,
+                 tracer: Optional[ExtractionTracer] = None, use_ssr: bool = True,
+                 hedge_delay: Optional[float] = None, prefetch: Optional[VideoPrefetchCache] = None,
+                 request_rate: Optional[float] = 10, host_concurrency: int = 8,
+                 session_path: Optional[str] = SESSION_PATH, profile_dir: Optional[str] = CHROME_PROFILE_DIR,
+                 coalesce_failure_ttl: float = 5, hedge_workers: int = 4):
         """初始化提取器
         
+        浏览器不会在初始化时启动，只有API方法失败、需要从页面提取时才会启动
+        
         Args:
             headless: 是否使用无头模式运行浏览器
             random_ua: 是否使用随机User-Agent
+            keep_alive: 提取完成后是否保留浏览器（常驻服务模式使用）
+            use_browser: 是否允许在API方法失败时启动浏览器
+            use_cache: 是否使用按视频ID缓存的提取结果
+            lean_page: 精简页面模式，屏蔽与提取无关的资源并只记录网络事件
+            tracer: 分阶段计时追踪器，默认只汇总统计不输出事件
+            use_ssr: API方法失败后、启动浏览器前，是否先尝试用HTTP解析页面嵌入的数据
+            hedge_delay: 对冲执行的延迟(秒)，API方法开始后超过该时间仍无结果时并发启动回退方法，
+                取最先得到视频URL的一方；为None时按顺序依次尝试
+            prefetch: 本地视频缓存，提取成功后在后台预取视频数据
+            request_rate: 每个主机每秒请求数的上限（遇到限流时自动降低），为None时不限速
+            host_concurrency: 每个主机同时进行的请求数上限
+            session_path: 站点会话Cookie的保存路径，为None时只在本进程内复用
+            profile_dir: 复用的Chrome用户数据目录，为None时每次启动使用临时目录
+            coalesce_failure_ttl: 同一视频的并发请求合并为一次提取，失败结果在该时间(秒)内继续共享
+            hedge_workers: 对冲执行时API方法和回退方法各自的线程数，应不少于同时进行的提取数
         """
         self.headers = self._get_headers(random_ua)
+        self.tracer = tracer or ExtractionTracer()
+        # API、短链接、页面数据请求和浏览器页面加载都经过同一个调度器
+        self.scheduler = RequestScheduler(max_rate=request_rate, max_concurrency=host_concurrency,
+                                          tracer=self.tracer)
+        self.api_client = DouyinApiClient(self.headers, scheduler=self.scheduler)
+        # 浏览器预热得到的站点Cookie也用于HTTP请求
+        self.session_store = SessionStore(session_path)
+        self._session_applied = False
+        self.profile_dir = profile_dir
+        self._profile_lock = None
+        stored_cookies = self.session_store.load()
+        if stored_cookies:
+            SessionStore.apply_to_session(self.api_client.session, stored_cookies)
+        self.short_link_resolver = ShortLinkResolver(self.api_client.session)
+        self.ssr_extractor = SsrPageExtractor(self.api_client.session)
+        # 页面内查找方法的命中率和耗时，决定尝试顺序
+        self.strategy_health = EndpointHealth()
+        self.use_ssr = use_ssr
+        self.prefetch = prefetch
         self.driver = None
         self.headless = headless
-        self._setup_selenium()
+        self.keep_alive = keep_alive
+        self.use_browser = use_browser
+        self.lean_page = lean_page
+        self.hedge_delay = hedge_delay
+        self.hedge_executor = None
+        self.fallback_executor = None
+        if hedge_delay is not None:
+            # 回退方法在等待浏览器锁时占着线程，与API方法分开，避免新请求的API方法排在浏览器工作之后
+            self.hedge_executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix='hedge')
+            self.fallback_executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix='hedge-fallback')
+        # 浏览器同一时间只由一个提取使用，对冲落败的浏览器方法退出前持有该锁
+        self._browser_lock = threading.Lock()
+        # 进行中的前台提取数，后台提前刷新在前台繁忙时让路
+        self._foreground = 0
+        self._foreground_lock = threading.Lock()
+        # 同一视频ID的并发请求等待同一次提取
+        self.inflight = SingleFlight(failure_ttl=coalesce_failure_ttl)
+        self.refresher: Optional[RefreshAheadWorker] = None
+        self.cache = None
+        if use_cache:
+            try:
+                self.cache = ResultCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"结果缓存不可用: {e}", file=sys.stderr)
             
     def _get_headers(self, random_ua: bool = True) -> Dict[str, str]:
         """获取请求头，可选择使用随机User-Agent
@@ -66,9 +2106,55 @@ class TiktokExtractor:
             'upgrade-insecure-requests': '1'
         }
 
+    def _get_driver_path(self, use_cache: bool = True) -> Tuple[str, bool]:
+        """获取chromedriver路径，优先使用磁盘缓存
+        
+        Args:
+            use_cache: 是否使用磁盘缓存，为False时重新安装并更新缓存
+        
+        Returns:
+            (chromedriver可执行文件路径, 是否来自磁盘缓存)
+        """
+        # 显式指定的路径优先
+        env_path = os.environ.get('CHROMEDRIVER_PATH')
+        if env_path:
+            return env_path, False
+        
+        if use_cache:
+            try:
+                with open(DRIVER_PATH_CACHE, 'r', encoding='utf-8') as f:
+                    cached_path = json.load(f).get('path')
+                if cached_path and os.access(cached_path, os.X_OK):
+                    print(f"使用缓存的chromedriver: {cached_path}", file=sys.stderr)
+                    return cached_path, True
+            except (OSError, ValueError):
+                pass
+        else:
+            # 先丢弃缓存，重新安装失败时下次启动也不再使用旧路径
+            try:
+                os.remove(DRIVER_PATH_CACHE)
+            except OSError:
+                pass
+        
+        from webdriver_manager.chrome import ChromeDriverManager
+        driver_path = ChromeDriverManager().install()
+        
+        try:
+            os.makedirs(os.path.dirname(DRIVER_PATH_CACHE), exist_ok=True)
+            with open(DRIVER_PATH_CACHE, 'w', encoding='utf-8') as f:
+                json.dump({'path': driver_path}, f)
+        except OSError as e:
+            print(f"写入chromedriver路径缓存失败: {e}", file=sys.stderr)
+        
+        return driver_path, False
+
     def _setup_selenium(self) -> None:
         """设置Selenium WebDriver，启用网络请求监控并配置反指纹检测"""
         try:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+            from selenium.webdriver.chrome.service import Service
+            
             chrome_options = Options()
             if self.headless:
                 chrome_options.add_argument('--headless')
@@ -86,26 +2172,120 @@ class TiktokExtractor:
             # 设置用户代理
             chrome_options.add_argument(f'user-agent={self.headers["User-Agent"]}')
             
+            # 复用用户数据目录，浏览器缓存和站点Cookie在重启后仍然保留
+            if self.profile_dir and self._lock_profile():
+                chrome_options.add_argument(f'--user-data-dir={self.profile_dir}')
+            
+            # DOMContentLoaded后即返回，由轮询等待视频请求出现，而不是等所有资源加载完
+            chrome_options.page_load_strategy = 'eager'
+            
             # 为新版Selenium设置性能日志
             chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
             
+            if self.lean_page:
+                # 只记录Network域事件，不记录Page域事件和tracing
+                chrome_options.add_experimental_option('perfLoggingPrefs', {
+                    'enableNetwork': True,
+                    'enablePage': False
+                })
+                # 禁止加载图片
+                chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+            
             # 创建Chrome驱动
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(
-                service=service, 
-                options=chrome_options
-            )
+            with self.tracer.span('driver_path'):
+                driver_path, cached = self._get_driver_path()
+            with self.tracer.span('browser_launch'):
+                try:
+                    self.driver = webdriver.Chrome(
+                        service=Service(driver_path), 
+                        options=chrome_options
+                    )
+                except Exception as e:
+                    if not cached:
+                        raise
+                    # Chrome自动更新后缓存的chromedriver版本不再匹配，重新安装后重试一次
+                    print(f"使用缓存的chromedriver启动失败，重新安装: {e}", file=sys.stderr)
+                    driver_path, _ = self._get_driver_path(use_cache=False)
+                    self.driver = webdriver.Chrome(
+                        service=Service(driver_path), 
+                        options=chrome_options
+                    )
             
             # 通过执行JavaScript来绕过Navigator.webdriver检测
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             
+            if self.lean_page:
+                self._apply_lean_page()
+            
             print("Selenium WebDriver 初始化成功", file=sys.stderr)
         except Exception as e:
             print(f"Selenium WebDriver 初始化失败: {e}", file=sys.stderr)
             raise
 
+    def _apply_lean_page(self) -> None:
+        """通过Chrome DevTools Protocol屏蔽与视频提取无关的资源请求"""
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URL_PATTERNS})
+            print(f"精简页面模式已启用，屏蔽 {len(LEAN_BLOCKED_URL_PATTERNS)} 类资源", file=sys.stderr)
+        except Exception as e:
+            print(f"启用精简页面模式失败: {e}", file=sys.stderr)
+
+    def browser_rss(self) -> Optional[int]:
+        """统计chromedriver及其所有子进程（Chrome浏览器、渲染进程等）的常驻内存
+        
+        Returns:
+            RSS字节数，浏览器未启动或无法读取/proc时返回None
+        """
+        if not self.driver:
+            return None
+        try:
+            root_pid = self.driver.service.process.pid
+        except AttributeError:
+            return None
+        
+        # 读取/proc建立父子进程关系，只在Linux上可用
+        children: Dict[int, List[int]] = {}
+        rss_pages: Dict[int, int] = {}
+        try:
+            for entry in os.listdir('/proc'):
+                if not entry.isdigit():
+                    continue
+                try:
+                    with open(f'/proc/{entry}/stat', 'r') as f:
+                        stat = f.read()
+                    with open(f'/proc/{entry}/statm', 'r') as f:
+                        rss_pages[int(entry)] = int(f.read().split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+                # 进程名可能含空格，从最后一个')'之后解析父进程ID
+                ppid = int(stat[stat.rindex(')') + 2:].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+        except OSError:
+            return None
+        
+        total = 0
+        stack = [root_pid]
+        while stack:
+            pid = stack.pop()
+            total += rss_pages.get(pid, 0)
+            stack.extend(children.get(pid, []))
+        return total * os.sysconf('SC_PAGE_SIZE')
+
+    def _ensure_selenium(self) -> None:
+        """确保WebDriver可用：首次需要时启动，浏览器已退出或崩溃时重新启动"""
+        if self.driver:
+            try:
+                # 访问一个轻量属性检测会话是否仍然存活
+                self.driver.current_url
+                return
+            except Exception as e:
+                print(f"WebDriver会话已失效，准备重启: {e}", file=sys.stderr)
+                self._close_selenium()
+        self._setup_selenium()
+
     def _close_selenium(self) -> None:
-        """关闭Selenium WebDriver"""
+        """关闭Selenium WebDriver，释放用户数据目录"""
         if self.driver:
             try:
                 self.driver.quit()
@@ -113,6 +2293,25 @@ class TiktokExtractor:
                 print(f"关闭WebDriver失败: {e}", file=sys.stderr)
             finally:
                 self.driver = None
+                self._session_applied = False
+        if self._profile_lock:
+            self._profile_lock.close()
+            self._profile_lock = None
+
+    def close(self) -> None:
+        """释放浏览器、线程池、连接池、结果缓存的数据库连接和追踪事件文件"""
+        if self.refresher:
+            self.refresher.stop()
+        self._close_selenium()
+        for executor in (self.hedge_executor, self.fallback_executor):
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self.short_link_resolver.close()
+        self.api_client.close()
+        if self.cache:
+            self.cache.close()
+            self.cache = None
+        self.tracer.close()
 
     def extract_video_id(self, url: str) -> Optional[str]:
         """从URL中提取视频ID
@@ -123,76 +2322,214 @@ class TiktokExtractor:
         Returns:
             视频ID或None
         """
+        return self.extract_video_ids([url])[0]
+
+    def extract_video_ids(self, urls: List[str]) -> List[Optional[str]]:
+        """批量提取视频ID，其中的分享短链接一次性并发解析
+        
+        Args:
+            urls: 抖音视频URL列表
+
+        Returns:
+            与输入顺序一致的视频ID列表，无法提取的为None
+        """
         try:
             # 处理分享链接
-            if 'v.douyin.com' in url:
+            short_links = [url for url in urls if 'v.douyin.com' in url]
+            resolved = self.short_link_resolver.resolve_many(short_links) if short_links else {}
+        except Exception as e:
+            print(f"处理短链接跳转失败: {e}", file=sys.stderr)
+            resolved = {}
+        
+        video_ids = []
+        for url in urls:
+            try:
+                video_id = resolved.get(url) or parse_video_id(url)
+                if video_id:
+                    print(f"提取到视频ID: {video_id}", file=sys.stderr)
+                else:
+                    print(f"无法从URL中提取视频ID: {url}", file=sys.stderr)
+                video_ids.append(video_id)
+            except Exception as e:
+                print(f"提取视频ID失败: {e}", file=sys.stderr)
+                video_ids.append(None)
+        
+        return video_ids
+
+    def _ensure_session(self) -> None:
+        """确保浏览器带有站点会话
+        
+        会话存储中有有效会话时通过CDP直接写入Cookie，不需要加载任何页面；
+        会话缺失、过旧或被拒绝时才访问首页预热一次
+        """
+        if not self.driver or self._session_applied:
+            return
+        cookies = self.session_store.load()
+        if cookies:
+            try:
+                self.driver.execute_cdp_cmd('Network.setCookies', {'cookies': SessionStore.to_cdp(cookies)})
+                # 会话文件可能已被其他进程更新，同步给HTTP客户端
+                SessionStore.apply_to_session(self.api_client.session, cookies)
+                self._session_applied = True
+                print(f"复用已保存的会话Cookie: {len(cookies)} 个", file=sys.stderr)
+                return
+            except Exception as e:
+                print(f"写入会话Cookie失败，重新预热: {e}", file=sys.stderr)
+        with self.tracer.span('session_warmup'):
+            self._warm_up_session()
+
+    def _warm_up_session(self) -> None:
+        """访问抖音首页让站点下发会话Cookie，站点未下发的令牌用随机值补上，然后保存并共享给HTTP客户端"""
+        try:
+            # 访问一次抖音首页，最多等待2秒页面就绪
+            with self.scheduler.slot('https://www.douyin.com/'):
+                self.driver.get('https://www.douyin.com/')
+            self._wait_for_ready_state(2)
+            
+            issued = {cookie.get('name') for cookie in self.driver.get_cookies()}
+            for name, length in (('msToken', 120), ('tt_csrf_token', 16)):
+                if name in issued:
+                    continue
                 try:
-                    response = requests.get(url, headers=self.headers, allow_redirects=False)
-                    if 'Location' in response.headers:
-                        url = response.headers['Location']
+                    self.driver.add_cookie({'name': name, 'value': self._generate_random_hex(length),
+                                            'domain': '.douyin.com'})
                 except Exception as e:
-                    print(f"处理短链接跳转失败: {e}", file=sys.stderr)
-            
-            # 检查是否是搜索结果中的视频
-            if 'modal_id=' in url:
-                modal_id_match = re.search(r'modal_id=(\d+)', url)
-                if modal_id_match:
-                    video_id = modal_id_match.group(1)
-                    print(f"从搜索页面提取到视频ID: {video_id}", file=sys.stderr)
-                    return video_id
-            
-            # 尝试多种模式提取ID
-            patterns = [
-                r'/video/(\d+)',
-                r'modal_id=(\d+)'
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    video_id = match.group(1)
-                    print(f"提取到视频ID: {video_id}", file=sys.stderr)
-                    return video_id
+                    print(f"添加Cookie失败 {name}: {e}", file=sys.stderr)
             
-            print(f"无法从URL中提取视频ID: {url}", file=sys.stderr)
-            return None
+            self.session_store.warmups += 1
+            self._session_applied = True
+            self._capture_session()
+            print("会话预热完成", file=sys.stderr)
         except Exception as e:
-            print(f"提取视频ID失败: {e}", file=sys.stderr)
-            return None
+            print(f"会话预热失败: {e}", file=sys.stderr)
 
-    def _setup_cookies(self) -> None:
-        """设置cookies，使用默认值或生成随机值"""
-        if not self.driver:
+    def _capture_session(self) -> None:
+        """保存浏览器当前的站点Cookie（站点会轮换令牌），有变化时同步给HTTP客户端"""
+        try:
+            cookies = [cookie for cookie in self.driver.get_cookies() if 'douyin.com' in cookie.get('domain', '')]
+        except Exception as e:
+            print(f"读取浏览器Cookie失败: {e}", file=sys.stderr)
             return
-            
+        if cookies and self.session_store.save(cookies):
+            SessionStore.apply_to_session(self.api_client.session, cookies)
+
+    def _session_refused(self) -> bool:
+        """当前页面是否有站点拒绝会话的迹象：跳转到登录或验证页面、ttwid被清除、出现验证码
+        
+        已删除、私密或地区限制的视频同样找不到视频URL，但不说明会话失效，只凭没有视频不能判断
+        
+        Returns:
+            是否有会话被拒绝的迹象，无法判断时返回False
+        """
+        try:
+            parsed = urlparse(self.driver.current_url or '')
+            location = f"{parsed.netloc}{parsed.path}".lower()
+            if any(marker in location for marker in self.SESSION_REFUSED_URL_MARKERS):
+                print(f"页面跳转到登录或验证页面: {self.driver.current_url}", file=sys.stderr)
+                return True
+            names = {cookie.get('name') for cookie in self.driver.get_cookies()}
+            missing = [name for name in SessionStore.REQUIRED_COOKIES if name not in names]
+            if missing:
+                print(f"站点已清除会话Cookie: {', '.join(missing)}", file=sys.stderr)
+                return True
+            selector = ', '.join(self.SESSION_REFUSED_SELECTORS)
+            if self.driver.execute_script(f"return !!document.querySelector({json.dumps(selector)});"):
+                print("页面出现验证码", file=sys.stderr)
+                return True
+        except Exception as e:
+            print(f"检查会话状态失败: {e}", file=sys.stderr)
+        return False
+
+    def _reject_session(self) -> None:
+        """站点拒绝了会话，标记会话失效，下次提取前重新预热"""
+        self.session_store.reject()
+        self._session_applied = False
+
+    def _lock_profile(self) -> bool:
+        """锁定Chrome用户数据目录，同一目录同时只能由一个浏览器使用
+        
+        Returns:
+            是否可以使用该目录，被其他进程（如批量模式的其他工作进程）占用时返回False
+        """
+        try:
+            import fcntl
+        except ImportError:
+            return True
+        handle = None
         try:
-            # 先访问一次抖音首页
-            self.driver.get('https://www.douyin.com/')
-            time.sleep(2)
+            os.makedirs(self.profile_dir, exist_ok=True)
+            handle = open(os.path.join(self.profile_dir, '.extractor.lock'), 'w')
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            print(f"Chrome用户数据目录不可用，本次使用临时目录: {e}", file=sys.stderr)
+            if handle:
+                handle.close()
+            return False
+        self._profile_lock = handle
+        return True
+
+    def _wait_for_ready_state(self, timeout: float, poll_interval: float = 0.1) -> bool:
+        """等待页面document.readyState变为complete，timeout为等待上限
+        
+        Args:
+            timeout: 最长等待时间(秒)
+            poll_interval: 轮询间隔(秒)
             
-            # 设置一些基本的cookies以绕过简单的检测
-            default_cookies = [
-                {'name': 'douyin.com', 'value': 'true', 'domain': '.douyin.com'},
-                {'name': 'ttwid', 'value': '1%7CfR_G8yyVW246%7C1684123457%7C', 'domain': '.douyin.com'},
-                {'name': 'msToken', 'value': self._generate_random_hex(120), 'domain': '.douyin.com'},
-                {'name': 'tt_csrf_token', 'value': self._generate_random_hex(16), 'domain': '.douyin.com'},
-            ]
+        Returns:
+            页面是否在超时前就绪
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if self.driver.execute_script("return document.readyState") == 'complete':
+                    return True
+            except Exception:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(poll_interval, remaining))
+
+    def _poll_for_video_urls(self, timeout: float, captured: List[str], poll_interval: float = 0.25,
+                             cancel: Optional[threading.Event] = None) -> bool:
+        """轮询性能日志和<video>元素，一旦出现视频URL立即返回，timeout为等待上限
+        
+        性能日志读取后会被清空，因此读到的URL都会追加到captured中供后续使用
+        
+        Args:
+            timeout: 最长等待时间(秒)
+            captured: 收集到的视频URL
+            poll_interval: 轮询间隔(秒)
+            cancel: 取消事件，被设置后立即停止等待
             
-            for cookie in default_cookies:
+        Returns:
+            是否已找到视频URL
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if cancel is not None and cancel.is_set():
+                return False
+            captured.extend(self._get_urls_from_performance_logs())
+            if not captured:
                 try:
-                    self.driver.add_cookie(cookie)
-                except Exception as e:
-                    print(f"添加Cookie失败 {cookie['name']}: {e}", file=sys.stderr)
-            
-            # 刷新页面应用cookies
-            self.driver.refresh()
-            time.sleep(1)
+                    sources = self.driver.execute_script(
+                        "return Array.from(document.querySelectorAll('video'))"
+                        ".map(function(v) { return v.currentSrc || v.src; }).filter(Boolean);"
+                    ) or []
+                    captured.extend(url for url in sources if self._is_video_url(url))
+                except Exception:
+                    pass
+            if captured:
+                return True
             
-            print("已应用基本Cookie", file=sys.stderr)
-            
-        except Exception as e:
-            print(f"设置cookies失败: {e}", file=sys.stderr)
-    
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if cancel is not None:
+                cancel.wait(min(poll_interval, remaining))
+            else:
+                time.sleep(min(poll_interval, remaining))
+
     def _generate_random_hex(self, length: int) -> str:
         """生成指定长度的随机十六进制字符串
         
@@ -204,69 +2541,120 @@ class TiktokExtractor:
         """
         return ''.join(random.choice('0123456789abcdef') for _ in range(length))
             
-    def extract_video_urls(self, douyin_url: str, wait_time: int = 5) -> List[str]:
+    def _leave_previous_page(self) -> None:
+        """导航前切到空白页并丢弃性能日志中积累的事件"""
+        try:
+            if not self.driver.current_url.startswith(('about:', 'data:')):
+                self.driver.get('about:blank')
+            self.driver.get_log('performance')
+        except Exception as e:
+            print(f"清理上一个页面失败: {e}", file=sys.stderr)
+
+    def extract_video_urls(self, douyin_url: str, wait_time: int = 5, early_exit: bool = True,
+                           cancel: Optional[threading.Event] = None) -> List[str]:
         """提取抖音视频的直链地址
         
         Args:
             douyin_url: 抖音视频页面URL
-            wait_time: 页面加载等待时间(秒)
+            wait_time: 页面加载等待时间(秒)，early_exit模式下为等待上限
+            early_exit: 页面加载过程中一旦捕获到视频URL就立即返回，不再等满固定时间
+            cancel: 取消事件（对冲执行中另一方已成功），被设置后在下一个检查点放弃提取
             
         Returns:
             视频URL列表
         """
-        if not self.driver:
+        if not self.use_browser:
             print("Selenium未启用，无法提取视频URL", file=sys.stderr)
             return []
+        
+        def cancelled() -> bool:
+            if cancel is not None and cancel.is_set():
+                print("页面提取已取消", file=sys.stderr)
+                return True
+            return False
+        
+        if cancelled():
+            return []
+        
+        try:
+            with self.tracer.span('selenium_setup'):
+                self._ensure_selenium()
+        except Exception as e:
+            print(f"浏览器启动失败，无法提取视频URL: {e}", file=sys.stderr)
+            return []
             
         try:
             print(f"正在分析链接: {douyin_url}", file=sys.stderr)
             
             # 处理搜索页面中的视频
-            if 'discover/search' in douyin_url and 'modal_id=' in douyin_url:
-                video_id = self.extract_video_id(douyin_url)
-                if video_id:
-                    direct_url = f"https://www.douyin.com/video/{video_id}"
-                    print(f"从搜索页面转为直接视频页面: {direct_url}", file=sys.stderr)
-                    douyin_url = direct_url
+            douyin_url = self._page_url(douyin_url)
             
             # 设置页面加载超时
             self.driver.set_page_load_timeout(30)
             
+            # 加载页面前带上站点会话，只有会话缺失或被拒绝时才会预热
+            with self.tracer.span('session'):
+                self._ensure_session()
+            
+            # 常驻模式下上一个页面的播放器在轮询结束后仍在请求媒体，这些事件留在性能日志中，
+            # 先离开上一个页面使其停止请求，再丢弃积累的日志，避免把上一个视频的URL当作本次结果
+            self._leave_previous_page()
+            
             # 加载页面
-            self.driver.get(douyin_url)
+            with self.tracer.span('page_load'):
+                with self.scheduler.slot(douyin_url):
+                    self.driver.get(douyin_url)
             print("页面加载中，请稍候...", file=sys.stderr)
+            if cancelled():
+                return []
             
-            # 设置cookie (如果是第一次访问)
-            if '/video/' in douyin_url:
-                self._setup_cookies()
-                
-            # 等待页面加载
-            time.sleep(wait_time)
+            # 已读取的性能日志中的视频URL
+            captured_urls: List[str] = []
             
-            # 尝试滚动页面以加载视频
-            try:
-                # 模拟真实用户行为，随机滚动几次
-                for _ in range(3):
-                    scroll_y = random.randint(100, 500)
-                    self.driver.execute_script(f"window.scrollTo(0, {scroll_y})")
-                    time.sleep(random.uniform(0.5, 1.5))
-            except Exception as e:
-                print(f"页面滚动失败: {e}", file=sys.stderr)
+            # 媒体请求通常在页面加载期间就已发出，此时已找到则跳过后续的等待
+            if early_exit and self._poll_for_video_urls(0, captured_urls, cancel=cancel):
+                print("页面加载期间已捕获视频URL", file=sys.stderr)
+            else:
+                # 等待页面加载
+                with self.tracer.span('page_wait', early_exit=early_exit) as span:
+                    if early_exit:
+                        found = self._poll_for_video_urls(wait_time, captured_urls, cancel=cancel)
+                    else:
+                        time.sleep(wait_time)
+                        found = False
+                    span["found"] = found
+                
+                if cancelled():
+                    return []
+                
+                # 尝试滚动页面以加载视频
+                if not found:
+                    try:
+                        # 模拟真实用户行为，随机滚动几次
+                        with self.tracer.span('scroll'):
+                            for _ in range(3):
+                                scroll_y = random.randint(100, 500)
+                                self.driver.execute_script(f"window.scrollTo(0, {scroll_y})")
+                                delay = random.uniform(0.5, 1.5)
+                                if early_exit:
+                                    if self._poll_for_video_urls(delay, captured_urls, cancel=cancel):
+                                        break
+                                    if cancelled():
+                                        return []
+                                else:
+                                    time.sleep(delay)
+                    except Exception as e:
+                        print(f"页面滚动失败: {e}", file=sys.stderr)
             
             # 收集所有可能的视频URL
-            video_urls = []
-            
-            # 尝试使用多种方法获取视频URL
-            video_urls.extend(self._get_urls_from_performance_logs())
+            video_urls = captured_urls
             
+            # 性能日志中剩余的条目总是读取，仍未找到时再按命中率依次尝试页面内的方法
+            with self.tracer.span('get_urls_from_performance_logs') as span:
+                video_urls.extend(self._get_urls_from_performance_logs())
+                span["found"] = len(video_urls)
             if not video_urls:
-                video_urls.extend(self._get_urls_from_performance_entries())
-            
-            if not video_urls:
-                video_urls.extend(self._get_urls_from_video_elements())
-                
-            if not video_urls:
-                video_urls.extend(self._get_urls_from_network_resources())
+                video_urls.extend(self._run_page_strategies())
             
             # 过滤和处理结果
             filtered_urls = self._filter_video_urls(video_urls)
@@ -275,43 +2663,193 @@ class TiktokExtractor:
                 print(f"找到 {len(filtered_urls)} 个视频URL", file=sys.stderr)
                 for i, url in enumerate(filtered_urls[:3]):  # 只显示前3个
                     print(f"URL {i+1}: {url[:100]}...", file=sys.stderr)
+                self._capture_session()
             else:
                 print("未找到视频URL", file=sys.stderr)
+                if not cancelled() and self._session_refused():
+                    self._reject_session()
+                
+            return filtered_urls
+            
+        except Exception as e:
+            print(f"提取视频URL失败: {e}", file=sys.stderr)
+            return []
+
+    def _page_url(self, douyin_url: str) -> str:
+        """搜索页面中的视频转为直接视频页面，其余URL原样返回"""
+        if 'discover/search' in douyin_url and 'modal_id=' in douyin_url:
+            video_id = self.extract_video_id(douyin_url)
+            if video_id:
+                direct_url = f"https://www.douyin.com/video/{video_id}"
+                print(f"从搜索页面转为直接视频页面: {direct_url}", file=sys.stderr)
+                return direct_url
+        return douyin_url
+
+    def extract_video_urls_many(self, douyin_urls: List[str], wait_time: int = 5,
+                                max_tabs: int = 4) -> List[List[str]]:
+        """在同一个浏览器的多个标签页中并行加载视频页面，分别提取视频URL
+        
+        各标签页共用一份性能日志，按日志中记录的target ID把视频URL归到对应的页面，页面之间的结果不会串用
+        
+        Args:
+            douyin_urls: 抖音视频页面URL列表
+            wait_time: 每批标签页的等待上限(秒)
+            max_tabs: 同时打开的标签页数
+            
+        Returns:
+            与输入顺序一致的视频URL列表
+        """
+        results: List[List[str]] = [[] for _ in douyin_urls]
+        if not douyin_urls:
+            return results
+        if not self.use_browser:
+            print("Selenium未启用，无法提取视频URL", file=sys.stderr)
+            return results
+        
+        try:
+            with self.tracer.span('selenium_setup'):
+                self._ensure_selenium()
+            with self.tracer.span('session'):
+                self._ensure_session()
+            base_handle = self.driver.current_window_handle
+            # 丢弃此前积累的日志，避免混入已关闭标签页的事件
+            self.driver.get_log('performance')
+        except Exception as e:
+            print(f"浏览器启动失败，无法提取视频URL: {e}", file=sys.stderr)
+            return results
+        
+        max_tabs = max(1, max_tabs)
+        refused = False
+        for start in range(0, len(douyin_urls), max_tabs):
+            tabs: Dict[int, Dict[str, str]] = {}
+            try:
+                with self.tracer.span('tabs_open') as span:
+                    for index in range(start, min(start + max_tabs, len(douyin_urls))):
+                        url = self._page_url(douyin_urls[index])
+                        try:
+                            tabs[index] = self._open_tab(url)
+                        except Exception as e:
+                            print(f"打开标签页失败 {url}: {e}", file=sys.stderr)
+                    span["tabs"] = len(tabs)
                 
-            return filtered_urls
+                with self.tracer.span('tabs_wait') as span:
+                    self._poll_tabs(tabs, wait_time, results)
+                    span["found"] = sum(bool(results[index]) for index in tabs)
+                
+                # 性能日志中没有出现视频请求的页面，切换过去用页面内的方法补充
+                for index, tab in tabs.items():
+                    if results[index]:
+                        continue
+                    self.driver.switch_to.window(tab["handle"])
+                    results[index].extend(self._run_page_strategies())
+                    if not results[index] and not refused:
+                        refused = self._session_refused()
+            except Exception as e:
+                print(f"多标签页提取视频URL失败: {e}", file=sys.stderr)
+            finally:
+                self._close_tabs(tabs, base_handle)
+        
+        results = [self._filter_video_urls(urls) for urls in results]
+        print(f"多标签页提取完成: {sum(bool(urls) for urls in results)}/{len(results)} 个页面找到视频URL", file=sys.stderr)
+        if any(results):
+            self._capture_session()
+        elif refused:
+            self._reject_session()
+        return results
+
+    def _open_tab(self, url: str) -> Dict[str, str]:
+        """打开新标签页并开始加载页面，不等待加载完成
+        
+        Args:
+            url: 页面URL
+            
+        Returns:
+            标签页的窗口句柄和DevTools target ID
+        """
+        self.driver.switch_to.new_window('tab')
+        handle = self.driver.current_window_handle
+        if self.lean_page:
+            self._apply_lean_page()
+        try:
+            target_id = self.driver.execute_cdp_cmd('Target.getTargetInfo', {})['targetInfo']['targetId']
+        except Exception:
+            # 新版ChromeDriver的窗口句柄就是target ID
+            target_id = handle
+        # Page.navigate在导航开始后即返回，多个标签页因此同时加载；调度器只控制发起导航的速率
+        with self.scheduler.slot(url):
+            self.driver.execute_cdp_cmd('Page.navigate', {'url': url})
+        return {"handle": handle, "target_id": target_id}
+
+    def _poll_tabs(self, tabs: Dict[int, Dict[str, str]], timeout: float, results: List[List[str]],
+                   poll_interval: float = 0.25) -> None:
+        """轮询共用的性能日志，把视频URL分配到产生事件的标签页，所有标签页都找到或超时后返回
+        
+        Args:
+            tabs: 结果下标到标签页信息的映射
+            timeout: 最长等待时间(秒)
+            results: 各页面收集到的视频URL，原地追加
+            poll_interval: 轮询间隔(秒)
+        """
+        index_by_target = {tab["target_id"]: index for index, tab in tabs.items()}
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                logs = self.driver.get_log('performance')
+            except Exception as e:
+                print(f"读取性能日志失败: {e}", file=sys.stderr)
+                return
+            for target_id, urls in VideoUrlClassifier.urls_by_webview(logs).items():
+                index = index_by_target.get(target_id)
+                if index is not None:
+                    results[index].extend(urls)
+            if all(results[index] for index in tabs):
+                return
             
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(poll_interval, remaining))
+
+    def _close_tabs(self, tabs: Dict[int, Dict[str, str]], base_handle: str) -> None:
+        """关闭标签页并切回原来的标签页"""
+        for tab in tabs.values():
+            try:
+                self.driver.switch_to.window(tab["handle"])
+                self.driver.close()
+            except Exception as e:
+                print(f"关闭标签页失败: {e}", file=sys.stderr)
+        try:
+            self.driver.switch_to.window(base_handle)
         except Exception as e:
-            print(f"提取视频URL失败: {e}", file=sys.stderr)
-            return []
+            print(f"切回原标签页失败: {e}", file=sys.stderr)
+
+    def _run_page_strategies(self) -> List[str]:
+        """在当前页面内按命中率和耗时排序依次尝试PAGE_STRATEGIES，找到视频URL即停止
+        
+        连续未命中的方法在冷却期内跳过；全部处于熔断状态时仍按默认顺序尝试，因为页面已经加载
+        
+        Returns:
+            视频URL列表
+        """
+        names = self.strategy_health.rank(list(self.PAGE_STRATEGIES)) or list(self.PAGE_STRATEGIES)
+        for name in names:
+            with self.tracer.span(name.lstrip('_')) as span:
+                start = time.monotonic()
+                urls = getattr(self, name)()
+                self.strategy_health.record(name, bool(urls), time.monotonic() - start)
+                span["found"] = len(urls)
+            if urls:
+                return urls
+        return []
 
     def _get_urls_from_performance_logs(self) -> List[str]:
         """从浏览器性能日志中获取视频URL"""
-        video_urls = []
         try:
             logs = self.driver.get_log('performance')
-            for log in logs:
-                try:
-                    log_entry = json.loads(log['message'])['message']
-                    
-                    # 过滤网络请求
-                    if ('Network.responseReceived' in log_entry['method'] or 
-                        'Network.requestWillBeSent' in log_entry['method']):
-                        
-                        # 获取URL
-                        if 'Network.responseReceived' in log_entry['method']:
-                            url = log_entry['params']['response']['url']
-                        else:
-                            url = log_entry['params']['request']['url']
-                        
-                        # 筛选视频URL
-                        if self._is_video_url(url):
-                            video_urls.append(url)
-                except:
-                    continue
+            return VideoUrlClassifier.urls_from_performance_logs(logs)
         except Exception as e:
             print(f"从性能日志获取视频URL失败: {e}", file=sys.stderr)
-        
-        return video_urls
+            return []
 
     def _get_urls_from_performance_entries(self) -> List[str]:
         """使用JavaScript从performance entries获取视频URL"""
@@ -335,87 +2873,52 @@ class TiktokExtractor:
         
         return video_urls
 
-    def _get_urls_from_video_elements(self) -> List[str]:
-        """从视频元素直接获取URL"""
-        video_urls = []
-        try:
-            video_elements = self.driver.find_elements(By.TAG_NAME, "video")
-            for video in video_elements:
-                src = video.get_attribute('src')
-                if src and self._is_video_url(src):
-                    video_urls.append(src)
-        except Exception as e:
-            print(f"从视频元素获取URL失败: {e}", file=sys.stderr)
+    def _get_urls_from_page_state(self, limit: int = 50) -> List[str]:
+        """在页面内一次性读取状态对象中的播放地址和媒体元素地址，只传回候选URL列表
         
-        return video_urls
-        
-    def _get_urls_from_network_resources(self) -> List[str]:
-        """从页面资源中提取视频URL"""
-        video_urls = []
+        Args:
+            limit: 最多返回的URL数量
+            
+        Returns:
+            视频URL列表
+        """
         try:
-            # 获取页面HTML
-            page_source = self.driver.page_source
-            
-            # 在页面源码中查找视频URL模式
-            # 尝试提取JSON数据中的视频URL
-            json_pattern = r'"play_addr":.*?"url_list":\s*\[(.*?)\]'
-            json_matches = re.findall(json_pattern, page_source)
-            
-            for match in json_matches:
-                # 从JSON字符串中提取URL
-                url_matches = re.findall(r'"(https?:[^"]+)"', match)
-                for url in url_matches:
-                    if self._is_video_url(url):
-                        video_urls.append(url)
-            
-            # 直接查找视频URL
-            url_pattern = r'(https?://[^"\'\s]+\.mp4[^"\'\s]*)'
-            url_matches = re.findall(url_pattern, page_source)
-            
-            for url in url_matches:
-                if self._is_video_url(url):
-                    video_urls.append(url)
-                    
+            urls = self.driver.execute_script(PAGE_STATE_SCRIPT, VideoUrlClassifier.VIDEO_INDICATORS, limit)
+            return [url for url in urls or [] if isinstance(url, str)]
         except Exception as e:
-            print(f"从网络资源获取视频URL失败: {e}", file=sys.stderr)
-        
-        return video_urls
+            print(f"从页面状态获取视频URL失败: {e}", file=sys.stderr)
+            return []
 
     def _is_video_url(self, url: str) -> bool:
         """判断URL是否为视频URL"""
-        video_indicators = [
-            'douyinvod.com',
-            '/tos/',
-            'aweme.snssdk.com',
-            '.mp4',
-            'mime_type=video_mp4',
-            'play_addr',
-            'video_id='
-        ]
-        
-        return any(indicator in url for indicator in video_indicators)
+        return VideoUrlClassifier.is_video_url(url)
 
     def _filter_video_urls(self, video_urls: List[str]) -> List[str]:
         """过滤重复URL并按优先级排序"""
-        filtered_urls = []
-        for url in video_urls:
-            if url not in filtered_urls:
-                filtered_urls.append(url)
+        return VideoUrlClassifier.filter_urls(video_urls)
+
+    def get_video_url_api(self, video_id: str, cancel: Optional[threading.Event] = None) -> List[str]:
+        """使用API获取视频URL，多个端点并发请求，取最先返回的有效结果
         
-        # 排序规则：首选包含douyinvod.com的URL，然后是mp4，最后是其他
-        def sort_key(url):
-            if 'douyinvod.com' in url:
-                return 0
-            if '.mp4' in url:
-                return 1
-            if 'aweme.snssdk.com' in url:
-                return 2
-            return 3
+        Args:
+            video_id: 视频ID
+            cancel: 取消事件，被设置后不再等待未完成的请求
             
-        return sorted(filtered_urls, key=sort_key)
+        Returns:
+            视频URL列表
+        """
+        try:
+            urls = self.api_client.get_video_urls(video_id, cancel)
+            if not urls:
+                print("所有API调用失败", file=sys.stderr)
+            return urls
+            
+        except Exception as e:
+            print(f"API方法获取视频URL失败: {e}", file=sys.stderr)
+            return []
 
-    def get_video_url_api(self, video_id: str) -> List[str]:
-        """使用API获取视频URL
+    def get_video_url_ssr(self, video_id: str) -> List[str]:
+        """不启动浏览器，通过HTTP请求视频页面并解析其中嵌入的数据获取视频URL
         
         Args:
             video_id: 视频ID
@@ -424,59 +2927,364 @@ class TiktokExtractor:
             视频URL列表
         """
         try:
-            # 尝试多个可能的API端点
-            api_endpoints = [
-                f"https://www.douyin.com/aweme/v1/web/aweme/detail/?aweme_id={video_id}",
-                f"https://www.iesdouyin.com/web/api/v2/aweme/iteminfo/?item_ids={video_id}"
-            ]
+            return self.ssr_extractor.get_video_urls(video_id)
+        except Exception as e:
+            print(f"页面数据方法获取视频URL失败: {e}", file=sys.stderr)
+            return []
+
+    def get_video_urls_api_many(self, video_ids: List[str]) -> Dict[str, List[str]]:
+        """使用API获取多个视频的URL：多个ID合并到批量查询请求中，缺失的再逐个查询
+        
+        Args:
+            video_ids: 视频ID列表
             
-            for api_url in api_endpoints:
-                try:
-                    print(f"尝试API: {api_url}", file=sys.stderr)
-                    response = requests.get(api_url, headers=self.headers)
-                    
-                    if response.status_code != 200:
-                        continue
-                        
-                    data = response.json()
-                    
-                    # 第一种API响应结构
-                    if 'aweme_detail' in data and 'video' in data['aweme_detail']:
-                        video_data = data['aweme_detail']['video']
-                        if 'play_addr' in video_data and 'url_list' in video_data['play_addr']:
-                            urls = video_data['play_addr']['url_list']
-                            print(f"从API1获取到 {len(urls)} 个URL", file=sys.stderr)
-                            return urls
-                    
-                    # 第二种API响应结构
-                    if 'item_list' in data and len(data['item_list']) > 0:
-                        item = data['item_list'][0]
-                        if 'video' in item and 'play_addr' in item['video']:
-                            play_addr = item['video']['play_addr']
-                            if 'url_list' in play_addr and play_addr['url_list']:
-                                urls = play_addr['url_list']
-                                print(f"从API2获取到 {len(urls)} 个URL", file=sys.stderr)
-                                return urls
-                
-                except Exception as e:
-                    print(f"API {api_url} 调用失败: {e}", file=sys.stderr)
+        Returns:
+            视频ID到URL列表的映射，失败的ID对应空列表
+        """
+        try:
+            return self.api_client.resolve_bulk(video_ids)
+        except Exception as e:
+            print(f"API方法批量获取视频URL失败: {e}", file=sys.stderr)
+            return {video_id: [] for video_id in video_ids}
+
+    def _get_cached_result(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """查询结果缓存，缓存不可用时视为未命中"""
+        if not self.cache:
+            return None
+        try:
+            cached = self.cache.get(video_id)
+        except sqlite3.Error as e:
+            print(f"读取结果缓存失败: {e}", file=sys.stderr)
+            return None
+        if cached:
+            print(f"命中结果缓存: {video_id}", file=sys.stderr)
+            cached["cached"] = True
+        return cached
+
+    def _cache_result(self, result: Dict[str, Any]) -> None:
+        """将成功的提取结果写入缓存"""
+        if not self.cache:
+            return
+        try:
+            self.cache.put(result["id"], result)
+        except sqlite3.Error as e:
+            print(f"写入结果缓存失败: {e}", file=sys.stderr)
+
+    @staticmethod
+    def _thumbnail_url(video_id: str) -> str:
+        return f"https://p.ipstatp.com/origin/tos-cn-p-0015/{video_id}~tplv-r00ih89hin-image.jpeg"
+
+    def _fill_success(self, result: Dict[str, Any], urls: List[str], source: str) -> None:
+        """把得到的视频URL写入结果并缓存"""
+        result["success"] = True
+        result["url"] = urls[0]
+        result["source"] = source
+        result["title"] = f"抖音视频 #{result['id']}"
+        result["author"] = "抖音用户"
+        self._cache_result(result)
+        self._start_prefetch(result)
+
+    def _start_prefetch(self, result: Dict[str, Any]) -> None:
+        """在后台预取视频数据到本地缓存，本地缓存服务已启动时在结果中附上本地播放地址
+        
+        本地地址只在本进程有效，因此在写入结果缓存之后才附加
+        """
+        if not self.prefetch:
+            return
+        try:
+            self.prefetch.prefetch(result["id"], result["url"])
+            local_url = self.prefetch.local_url(result["id"])
+            if local_url:
+                result["cached_url"] = local_url
+        except Exception as e:
+            print(f"启动视频预取失败: {e}", file=sys.stderr)
+
+    def refresh_play_url(self, video_id: str) -> Optional[str]:
+        """不启动浏览器重新获取播放地址，供本地视频缓存在签名地址过期时使用
+        
+        Args:
+            video_id: 视频ID
             
-            print("所有API调用失败", file=sys.stderr)
-            return []
+        Returns:
+            新的播放地址，获取失败时返回None
+        """
+        urls = self.get_video_url_api(video_id)
+        if not urls and self.use_ssr:
+            urls = self.get_video_url_ssr(video_id)
+        return urls[0] if urls else None
+
+    def refresh_result(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """不启动浏览器重新解析视频，成功时写入结果缓存，供提前刷新使用
+        
+        Args:
+            video_id: 视频ID
+            
+        Returns:
+            新的提取结果，失败时返回None
+        """
+        with self.tracer.span('refresh_ahead') as span:
+            urls = self.get_video_url_api(video_id)
+            source = "douyin_api"
+            if not urls and self.use_ssr:
+                urls = self.get_video_url_ssr(video_id)
+                source = "douyin_ssr"
+            span["found"] = len(urls)
+        if not urls:
+            return None
+        result = {
+            "success": False,
+            "id": video_id,
+            "url": None,
+            "thumbnail": self._thumbnail_url(video_id),
+            "title": None,
+            "author": None
+        }
+        self._fill_success(result, urls, source)
+        return result
+
+    def foreground_busy(self) -> bool:
+        """是否有前台的完整提取正在进行（缓存命中不计），或有出站请求在调度器中排队"""
+        return self._foreground > 0 or self.scheduler.queue_depth() > 0
+
+    def start_refresh_ahead(self, **options) -> bool:
+        """启动后台提前刷新，刷新结果通过结果缓存提供给前台，因此需要结果缓存可用
+        
+        Args:
+            **options: 传给RefreshAheadWorker的参数
+            
+        Returns:
+            是否已启动
+        """
+        if not self.cache:
+            print("结果缓存不可用，无法启用提前刷新", file=sys.stderr)
+            return False
+        options.setdefault("default_ttl", self.cache.default_ttl)
+        # 必须在结果缓存提前失效之前刷新，留出两个检查间隔
+        floor = self.cache.expiry_margin + 2 * options.get("interval", 5)
+        options["lead_time"] = max(options.get("lead_time", 180), floor)
+        self.refresher = RefreshAheadWorker(self.refresh_result, busy=self.foreground_busy, **options)
+        self.refresher.start()
+        print(f"提前刷新已启用，每分钟最多刷新 {self.refresher.budget_per_minute} 次", file=sys.stderr)
+        return True
+
+    def extract_from_urls(self, urls: List[str], max_tabs: int = 4) -> List[Dict[str, Any]]:
+        """在同一进程、同一个浏览器中批量提取多个URL
+        
+        先批量请求API和页面数据，剩余的URL在同一个浏览器的多个标签页中并行加载，
+        与每个URL各启动一个浏览器相比占用的内存少得多
+        
+        Args:
+            urls: 视频URL列表
+            max_tabs: 同时打开的标签页数
+            
+        Returns:
+            与输入顺序一致、格式与extract_from_url相同的结果列表
+        """
+        results: List[Dict[str, Any]] = []
+        try:
+            with self.tracer.span('extract_video_id'):
+                video_ids = self.extract_video_ids(urls)
             
+            pending: List[int] = []
+            for index, video_id in enumerate(video_ids):
+                result = {
+                    "success": False,
+                    "id": video_id,
+                    "url": None,
+                    "thumbnail": None,
+                    "title": None,
+                    "author": None
+                }
+                results.append(result)
+                if not video_id:
+                    result["error"] = "无法提取视频ID"
+                    continue
+                cached = self._get_cached_result(video_id)
+                if cached:
+                    self._start_prefetch(cached)
+                    results[index] = cached
+                    continue
+                result["thumbnail"] = self._thumbnail_url(video_id)
+                pending.append(index)
+            
+            if pending:
+                with self.tracer.span('api') as span:
+                    api_urls = self.get_video_urls_api_many(list(dict.fromkeys(video_ids[i] for i in pending)))
+                    span["found"] = sum(bool(found) for found in api_urls.values())
+                for index in pending:
+                    if api_urls.get(video_ids[index]):
+                        self._fill_success(results[index], api_urls[video_ids[index]], "douyin_api")
+                pending = [index for index in pending if not results[index]["success"]]
+            
+            if pending and self.use_ssr:
+                for index in pending:
+                    with self.tracer.span('ssr') as span:
+                        ssr_urls = self.get_video_url_ssr(video_ids[index])
+                        span["found"] = len(ssr_urls)
+                    if ssr_urls:
+                        self._fill_success(results[index], ssr_urls, "douyin_ssr")
+                pending = [index for index in pending if not results[index]["success"]]
+            
+            if pending:
+                with self.tracer.span('browser', tabs=max_tabs) as span:
+                    page_urls = self.extract_video_urls_many([urls[index] for index in pending], wait_time=5,
+                                                             max_tabs=max_tabs)
+                    span["found"] = sum(bool(found) for found in page_urls)
+                for index, found in zip(pending, page_urls):
+                    if found:
+                        self._fill_success(results[index], found, "douyin_page")
+                    else:
+                        results[index]["error"] = "无法获取视频URL"
+            
+            return results
         except Exception as e:
-            print(f"API方法获取视频URL失败: {e}", file=sys.stderr)
-            return []
+            print(f"批量提取视频失败: {e}", file=sys.stderr)
+            for result in results:
+                if not result["success"]:
+                    result.setdefault("error", str(e))
+            results.extend(_failed_result(str(e)) for _ in urls[len(results):])
+            return results
+        finally:
+            if not self.keep_alive:
+                self._close_selenium()
+
+    def _run_api_tier(self, video_id: str,
+                      cancel: Optional[threading.Event] = None) -> Tuple[List[str], Optional[str]]:
+        """API层：并发请求API端点
+        
+        Args:
+            video_id: 视频ID
+            cancel: 取消事件
+            
+        Returns:
+            (视频URL列表, 结果来源)
+        """
+        with self.tracer.span('api') as span:
+            api_urls = self.get_video_url_api(video_id, cancel)
+            span["found"] = len(api_urls)
+        if api_urls:
+            print(f"API成功获取视频URL: {api_urls[0][:100]}...", file=sys.stderr)
+        return api_urls, "douyin_api"
+
+    def _run_fallback_tiers(self, video_id: str, url: str,
+                            cancel: Optional[threading.Event] = None) -> Tuple[List[str], Optional[str]]:
+        """回退层：先不启动浏览器解析页面数据，仍然失败时用浏览器从页面提取
+        
+        Args:
+            video_id: 视频ID
+            url: 原始视频URL
+            cancel: 取消事件
+            
+        Returns:
+            (视频URL列表, 结果来源)，均失败时来源为None
+        """
+        if self.use_ssr:
+            with self.tracer.span('ssr') as span:
+                ssr_urls = self.get_video_url_ssr(video_id)
+                span["found"] = len(ssr_urls)
+            if ssr_urls:
+                print(f"页面数据成功获取视频URL: {ssr_urls[0][:100]}...", file=sys.stderr)
+                return ssr_urls, "douyin_ssr"
+        
+        if cancel is not None and cancel.is_set():
+            return [], None
+        
+        print(f"尝试从页面提取视频URL", file=sys.stderr)
+        
+        # 使用Selenium访问页面获取视频URL
+        with self._browser_lock:
+            try:
+                with self.tracer.span('browser') as span:
+                    page_urls = self.extract_video_urls(url, wait_time=5, cancel=cancel)
+                    span["found"] = len(page_urls)
+            finally:
+                # 对冲落败时发起方已经返回，浏览器由这里关闭
+                if cancel is not None and cancel.is_set() and not self.keep_alive:
+                    self._close_selenium()
+        
+        if page_urls:
+            print(f"页面提取成功获取视频URL: {page_urls[0][:100]}...", file=sys.stderr)
+            return page_urls, "douyin_page"
+        return [], None
+
+    def _run_hedged(self, video_id: str, url: str) -> Tuple[List[str], Optional[str]]:
+        """对冲执行：先启动API层，hedge_delay秒内没有得到结果（或已失败）时并发启动回退层，
+        返回最先得到视频URL的一方，并取消另一方
+        
+        Args:
+            video_id: 视频ID
+            url: 原始视频URL
+            
+        Returns:
+            (视频URL列表, 结果来源)
+        """
+        trace_id = self.tracer.trace_id
+        
+        def run(tier, cancel: threading.Event, *args) -> Tuple[List[str], Optional[str]]:
+            with self.tracer.attach(trace_id):
+                return tier(*args, cancel=cancel)
+        
+        tiers: Dict[Any, Tuple[str, threading.Event]] = {}
+        
+        def start(name: str, executor: ThreadPoolExecutor, tier, *args) -> Any:
+            cancel = threading.Event()
+            future = executor.submit(run, tier, cancel, *args)
+            tiers[future] = (name, cancel)
+            return future
+        
+        with self.tracer.span('hedge', delay=self.hedge_delay) as span:
+            pending = {start('api', self.hedge_executor, self._run_api_tier, video_id)}
+            fallback_started = False
+            winner: Tuple[List[str], Optional[str]] = ([], None)
+            try:
+                while pending:
+                    done, pending = wait_futures(pending, timeout=None if fallback_started else self.hedge_delay,
+                                                 return_when=FIRST_COMPLETED)
+                    for future in done:
+                        urls, source = future.result()
+                        if urls and not winner[0]:
+                            winner = (urls, source)
+                            span["winner"] = tiers[future][0]
+                    if winner[0]:
+                        break
+                    if not fallback_started:
+                        # API层超过对冲延迟仍无结果，启动回退层与其竞争
+                        fallback_started = True
+                        pending.add(start('fallback', self.fallback_executor, self._run_fallback_tiers, video_id, url))
+            finally:
+                for future in pending:
+                    name, cancel = tiers[future]
+                    print(f"取消对冲落败的{name}方法", file=sys.stderr)
+                    cancel.set()
+            span["fallback_started"] = fallback_started
+        return winner
 
-    def extract_from_url(self, url: str) -> Dict[str, Any]:
+    def extract_from_url(self, url: str, skip_api: bool = False) -> Dict[str, Any]:
         """从URL提取视频信息
         
         Args:
             url: 视频URL
+            skip_api: 跳过API方法直接使用回退方法（调用方已经用API查询过该视频且失败）
             
         Returns:
             包含视频信息的字典
         """
+        try:
+            with self.tracer.trace(url) as trace:
+                trace["result"] = self._extract_from_url(url, skip_api)
+            if self.refresher and trace["result"].get("success"):
+                self.refresher.record(trace["result"])
+            return trace["result"]
+        finally:
+            # 常驻模式下保留浏览器供后续请求复用；对冲落败的浏览器方法仍在退出时由其自行关闭
+            if not self.keep_alive and self._browser_lock.acquire(blocking=False):
+                try:
+                    self._close_selenium()
+                finally:
+                    self._browser_lock.release()
+
+    def _extract_from_url(self, url: str, skip_api: bool = False) -> Dict[str, Any]:
+        """extract_from_url的实现，各阶段分别计时"""
         result = {
             "success": False,
             "id": None,
@@ -488,42 +3296,61 @@ class TiktokExtractor:
         
         try:
             # 提取视频ID
-            video_id = self.extract_video_id(url)
+            with self.tracer.span('extract_video_id'):
+                video_id = self.extract_video_id(url)
             if not video_id:
                 result["error"] = "无法提取视频ID"
                 return result
             
             result["id"] = video_id
             
-            # 设置缩略图
-            result["thumbnail"] = f"https://p.ipstatp.com/origin/tos-cn-p-0015/{video_id}~tplv-r00ih89hin-image.jpeg"
-            
-            # 尝试API方法获取视频URL
-            api_urls = self.get_video_url_api(video_id)
-            if api_urls:
-                result["success"] = True
-                result["url"] = api_urls[0]
-                result["source"] = "douyin_api"
-                result["title"] = f"抖音视频 #{video_id}"
-                result["author"] = "抖音用户"
-                
-                print(f"API成功获取视频URL: {result['url'][:100]}...", file=sys.stderr)
-                return result
+            # 优先使用未过期的缓存结果
+            with self.tracer.span('cache_lookup') as span:
+                cached = self._get_cached_result(video_id)
+                span["hit"] = bool(cached)
+            if cached:
+                self._start_prefetch(cached)
+                return cached
+            
+            # 同一视频正在提取时等待那次提取，共享其结果（包括失败），不重复启动API请求和浏览器
+            start = time.perf_counter()
+            shared_result, coalesced = self.inflight.do(
+                video_id, lambda: self._extract_video(video_id, url, result, skip_api),
+                failed=lambda extracted: not extracted.get("success"))
+            if not coalesced:
+                return shared_result
+            self.tracer.observe('extractor_coalesce_wait_seconds', 'outcome',
+                                'success' if shared_result.get("success") else 'failure',
+                                time.perf_counter() - start)
+            return dict(shared_result, coalesced=True)
             
-            # 如果API方法失败，尝试从页面提取
-            print(f"API方法失败，尝试从页面提取视频URL", file=sys.stderr)
+        except Exception as e:
+            print(f"提取视频失败: {e}", file=sys.stderr)
+            result["error"] = str(e)
+            return result
+
+    def _extract_video(self, video_id: str, url: str, result: Dict[str, Any],
+                       skip_api: bool = False) -> Dict[str, Any]:
+        """缓存未命中时完整提取一个视频，填充并返回result，skip_api时只使用回退方法"""
+        # 只有完整提取计为前台工作，缓存命中和等待合并的请求不占用上游
+        with self._foreground_lock:
+            self._foreground += 1
+        try:
+            # 设置缩略图
+            result["thumbnail"] = self._thumbnail_url(video_id)
             
-            # 使用Selenium访问页面获取视频URL
-            page_urls = self.extract_video_urls(url, wait_time=5)
+            # 依次尝试API方法和回退方法；启用对冲执行时两者可能并发进行
+            if skip_api:
+                urls, source = self._run_fallback_tiers(video_id, url)
+            elif self.hedge_delay is None:
+                urls, source = self._run_api_tier(video_id)
+                if not urls:
+                    urls, source = self._run_fallback_tiers(video_id, url)
+            else:
+                urls, source = self._run_hedged(video_id, url)
             
-            if page_urls:
-                result["success"] = True
-                result["url"] = page_urls[0]
-                result["source"] = "douyin_page"
-                result["title"] = f"抖音视频 #{video_id}"
-                result["author"] = "抖音用户"
-                
-                print(f"页面提取成功获取视频URL: {result['url'][:100]}...", file=sys.stderr)
+            if urls:
+                self._fill_success(result, urls, source)
                 return result
             
             # 如果仍然失败，返回错误
@@ -535,34 +3362,453 @@ class TiktokExtractor:
             result["error"] = str(e)
             return result
         finally:
-            # 关闭浏览器
-            self._close_selenium()
+            with self._foreground_lock:
+                self._foreground -= 1
+
+def _handle_request_line(extractor: TiktokExtractor, line: str) -> Optional[str]:
+    """处理一行JSON请求，返回一行JSON响应
+    
+    请求格式: {"id": 任意值, "url": "视频URL"}，id通过响应的request_id字段原样回传，
+    便于调用方匹配流水线中的请求（响应中的id字段仍为视频ID）；
+    {"id": 任意值, "cmd": "metrics"} 返回Prometheus文本格式和JSON格式的统计
+    
+    可以在多个线程中并发调用：浏览器由提取器串行使用，同一视频的并发请求合并为一次提取
+    
+    Args:
+        extractor: 常驻的提取器实例
+        line: 原始请求行
+        
+    Returns:
+        JSON响应行，空行返回None
+    """
+    line = line.strip()
+    if not line:
+        return None
+    
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return json.dumps({"request_id": None, "success": False, "error": f"无效的JSON请求: {e}"})
+    
+    if isinstance(request, dict) and request.get("cmd") == "metrics":
+        return json.dumps({
+            "request_id": request.get("id"),
+            "success": True,
+            "metrics": (extractor.tracer.prometheus() + extractor.scheduler.prometheus()
+                        + extractor.inflight.prometheus()),
+            "summary": extractor.tracer.summary(),
+            "endpoints": extractor.api_client.health.stats(),
+            "page_strategies": extractor.strategy_health.stats(),
+            "scheduler": extractor.scheduler.stats(),
+            "refresh_ahead": extractor.refresher.stats() if extractor.refresher else None,
+            "session": extractor.session_store.stats(),
+            "coalescing": extractor.inflight.stats(),
+            "video_cache": extractor.prefetch.stats() if extractor.prefetch else None
+        })
+    
+    if not isinstance(request, dict) or not request.get("url"):
+        request_id = request.get("id") if isinstance(request, dict) else None
+        return json.dumps({"request_id": request_id, "success": False, "error": "请提供视频URL"})
+    
+    result = extractor.extract_from_url(request["url"])
+    
+    result["request_id"] = request.get("id")
+    return json.dumps(result)
+
+
+def _error_response(line: str, error: str) -> str:
+    """处理请求时出现未预期的异常，构造带有原请求id的失败响应"""
+    try:
+        request = json.loads(line)
+    except ValueError:
+        request = None
+    request_id = request.get("id") if isinstance(request, dict) else None
+    return json.dumps({"request_id": request_id, "success": False, "error": error})
+
+
+def serve(extractor: TiktokExtractor, socket_path: Optional[str] = None, workers: int = 8) -> None:
+    """常驻服务模式：复用同一个提取器和浏览器处理按行分隔的JSON请求
+    
+    Args:
+        extractor: 提取器实例（应以keep_alive=True创建）
+        socket_path: Unix socket路径，为None时从stdin读取请求并写入stdout
+        workers: stdin模式下同时处理的请求数，响应按完成顺序写出，由request_id匹配
+    """
+    try:
+        if socket_path is None:
+            print("提取服务已启动，从stdin读取请求", file=sys.stderr)
+            write_lock = threading.Lock()
+            
+            def respond(line: str) -> None:
+                try:
+                    response = _handle_request_line(extractor, line)
+                except Exception as e:
+                    # 调用方按request_id等待响应，出错时也必须回一行
+                    print(f"处理请求失败: {e}", file=sys.stderr)
+                    response = _error_response(line, str(e))
+                if response is not None:
+                    with write_lock:
+                        sys.stdout.write(response + "\n")
+                        sys.stdout.flush()
+            
+            # 请求并发处理，同一视频的请求才能在提取器中合并
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='serve') as executor:
+                for line in sys.stdin:
+                    executor.submit(respond, line)
+            return
+        
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw_line in self.rfile:
+                    line = raw_line.decode('utf-8', 'replace')
+                    try:
+                        response = _handle_request_line(extractor, line)
+                    except Exception as e:
+                        print(f"处理请求失败: {e}", file=sys.stderr)
+                        response = _error_response(line, str(e))
+                    if response is not None:
+                        self.wfile.write((response + "\n").encode('utf-8'))
+                        self.wfile.flush()
+        
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        
+        class ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+        
+        with ThreadingUnixServer(socket_path, RequestHandler) as server:
+            print(f"提取服务已启动，监听Unix socket: {socket_path}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                if os.path.exists(socket_path):
+                    os.unlink(socket_path)
+    finally:
+        extractor.close()
+
+
+def build_tracer(trace: bool = False, trace_file: Optional[str] = None,
+                 profile_slow: Optional[float] = None, profile_dir: Optional[str] = None) -> ExtractionTracer:
+    """根据命令行参数创建追踪器
+    
+    Args:
+        trace: 是否把JSON事件输出到stderr
+        trace_file: 追加写入JSON事件的文件路径，优先于trace
+        profile_slow: 慢请求阈值(秒)，超过时保存cProfile和tracemalloc结果
+        profile_dir: 慢请求分析结果的保存目录
+        
+    Returns:
+        追踪器
+    """
+    stream = None
+    if trace_file:
+        # 行缓冲：进程被直接结束时已写出的事件也都在文件中
+        stream = open(trace_file, 'a', encoding='utf-8', buffering=1)
+    elif trace:
+        stream = sys.stderr
+    return ExtractionTracer(stream=stream, profile_threshold=profile_slow, profile_dir=profile_dir,
+                            owns_stream=bool(trace_file))
+
+
+def _batch_worker(conn, extractor_options: Dict[str, Any], tracer_options: Optional[Dict[str, Any]]) -> None:
+    """批量模式工作进程：持有独立的提取器和浏览器，循环处理父进程分派的URL
+    
+    Args:
+        conn: 与父进程通信的管道，接收(index, url, skip_api)，None表示退出
+        extractor_options: 传给TiktokExtractor的参数
+        tracer_options: 传给build_tracer的参数，为None时使用默认追踪器
+    """
+    # 独立进程组，超时时父进程可以连同Chrome子进程一起结束
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    tracer = build_tracer(**tracer_options) if tracer_options else None
+    extractor = TiktokExtractor(keep_alive=True, tracer=tracer, **extractor_options)
+    try:
+        while True:
+            task = conn.recv()
+            if task is None:
+                break
+            index, url, skip_api = task
+            conn.send((index, extractor.extract_from_url(url, skip_api=skip_api)))
+    except EOFError:
+        pass
+    finally:
+        extractor.close()
+
+
+def _kill_worker(process: multiprocessing.Process) -> None:
+    """结束工作进程及其启动的浏览器"""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except OSError:
+        pass
+    process.join(timeout=5)
+
+
+def _failed_result(error: str) -> Dict[str, Any]:
+    """构造与extract_from_url格式一致的失败结果"""
+    return {
+        "success": False,
+        "id": None,
+        "url": None,
+        "thumbnail": None,
+        "title": None,
+        "author": None,
+        "error": error
+    }
+
+
+def extract_batch(urls: List[str], workers: Optional[int] = None, timeout: float = 90,
+                  tracer_options: Optional[Dict[str, Any]] = None, **extractor_options) -> List[Dict[str, Any]]:
+    """使用工作进程池并行提取多个URL
+    
+    父进程先用批量API查询解决尽可能多的URL（N个URL约N/bulk_chunk_size个请求），
+    剩余的URL才分派给工作进程；每个工作进程持有自己的TiktokExtractor和浏览器，同时最多运行workers个提取任务，
+    单个URL超过timeout秒会被终止并记为失败，对应的工作进程会被替换
+    
+    Args:
+        urls: 视频URL列表
+        workers: 工作进程数，默认为CPU核数
+        timeout: 单个URL的超时时间(秒)
+        tracer_options: 传给每个工作进程中build_tracer的参数
+        **extractor_options: 传给每个工作进程中TiktokExtractor的参数
+        
+    Returns:
+        与输入顺序一致的结果列表
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(urls)
+    if not urls:
+        return []
+    
+    resolver = TiktokExtractor(tracer=build_tracer(**tracer_options) if tracer_options else None,
+                               **dict(extractor_options, use_browser=False, use_ssr=False))
+    # 得到了视频ID但未成功的URL已经用批量和逐个API查询过，工作进程中跳过API方法，不再重复请求
+    api_tried = set()
+    try:
+        for index, result in enumerate(resolver.extract_from_urls(urls)):
+            if result.get("success"):
+                results[index] = result
+            elif result.get("id"):
+                api_tried.add(index)
+    finally:
+        # 在启动工作进程之前释放线程池和数据库连接，不带入子进程
+        resolver.close()
+    remaining = [(index, url, index in api_tried) for index, url in enumerate(urls) if results[index] is None]
+    if not remaining:
+        return results
+    
+    worker_count = max(1, min(workers or os.cpu_count() or 1, len(remaining)))
+    print(f"批量提取 {len(urls)} 个URL，API已解决 {len(urls) - len(remaining)} 个，"
+          f"剩余 {len(remaining)} 个，工作进程数: {worker_count}", file=sys.stderr)
+    
+    # 每个工作进程有自己的调度器，按进程数分摊每个主机的速率上限
+    if extractor_options.get("request_rate"):
+        extractor_options = dict(extractor_options, request_rate=extractor_options["request_rate"] / worker_count)
+    
+    def start_worker() -> Dict[str, Any]:
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_batch_worker,
+            args=(child_conn, extractor_options, tracer_options),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return {"process": process, "conn": parent_conn, "task": None, "deadline": None}
+    
+    pending = iter(remaining)
+    workers_state = [start_worker() for _ in range(worker_count)]
+    
+    def dispatch(worker: Dict[str, Any]) -> None:
+        task = next(pending, None)
+        worker["task"] = task
+        if task is None:
+            worker["deadline"] = None
+            return
+        worker["deadline"] = time.monotonic() + timeout
+        worker["conn"].send(task)
+    
+    def replace(worker: Dict[str, Any]) -> Dict[str, Any]:
+        _kill_worker(worker["process"])
+        worker["conn"].close()
+        new_worker = start_worker()
+        workers_state[workers_state.index(worker)] = new_worker
+        return new_worker
+    
+    try:
+        for worker in workers_state:
+            dispatch(worker)
+        
+        while any(worker["task"] is not None for worker in workers_state):
+            busy = [worker for worker in workers_state if worker["task"] is not None]
+            next_deadline = min(worker["deadline"] for worker in busy)
+            ready = wait_connections([worker["conn"] for worker in busy],
+                                     timeout=max(0, next_deadline - time.monotonic()))
+            
+            for worker in busy:
+                index, url, _ = worker["task"]
+                if worker["conn"] in ready:
+                    try:
+                        result_index, result = worker["conn"].recv()
+                        results[result_index] = result
+                    except (EOFError, OSError):
+                        print(f"工作进程异常退出: {url}", file=sys.stderr)
+                        results[index] = _failed_result("工作进程异常退出")
+                        worker = replace(worker)
+                    dispatch(worker)
+                elif time.monotonic() >= worker["deadline"]:
+                    print(f"提取超时({timeout}秒): {url}", file=sys.stderr)
+                    results[index] = _failed_result(f"提取超时({timeout}秒)")
+                    dispatch(replace(worker))
+    finally:
+        for worker in workers_state:
+            try:
+                worker["conn"].send(None)
+            except OSError:
+                pass
+        for worker in workers_state:
+            worker["process"].join(timeout=10)
+            if worker["process"].is_alive():
+                _kill_worker(worker["process"])
+    
+    return results
+
 
 def main():
     """主函数"""
-    if len(sys.argv) < 2:
-        print(json.dumps({"success": False, "error": "请提供视频URL"}))
+    parser = argparse.ArgumentParser(description='抖音视频提取脚本')
+    parser.add_argument('urls', nargs='*', metavar='url', help='视频URL（批量模式下可传入多个）')
+    parser.add_argument('--no-headless', dest='headless', action='store_false', help='显示浏览器窗口')
+    parser.add_argument('--no-random-ua', dest='random_ua', action='store_false', help='使用固定User-Agent')
+    parser.add_argument('--no-browser', dest='use_browser', action='store_false', help='仅使用API方法，不启动浏览器')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', help='不使用结果缓存')
+    parser.add_argument('--cache-stats', action='store_true', help='输出结果缓存统计后退出')
+    parser.add_argument('--no-ssr', dest='use_ssr', action='store_false', help='不尝试无浏览器的页面数据解析')
+    parser.add_argument('--chrome-profile-dir', default=CHROME_PROFILE_DIR, help='复用的Chrome用户数据目录')
+    parser.add_argument('--no-chrome-profile', action='store_true', help='每次启动浏览器都使用临时用户数据目录')
+    parser.add_argument('--lean-page', action='store_true', help='精简页面模式，通过CDP屏蔽图片、字体、样式表和统计脚本')
+    parser.add_argument('--hedge-delay', type=float, metavar='SECONDS',
+                        help='对冲执行：API方法超过该时间仍无结果时并发启动回退方法，取最先成功的一方')
+    parser.add_argument('--rate', type=float, default=10,
+                        help='每个主机每秒请求数的上限，遇到429/403/空响应时自动降低（0表示不限速）')
+    parser.add_argument('--host-concurrency', type=int, default=8, help='每个主机同时进行的请求数上限')
+    parser.add_argument('--trace', action='store_true', help='将各阶段计时以JSON事件输出到stderr')
+    parser.add_argument('--trace-file', help='将各阶段计时以JSON事件追加写入文件')
+    parser.add_argument('--profile-slow', type=float, metavar='SECONDS', help='对超过该耗时的请求保存cProfile和tracemalloc结果')
+    parser.add_argument('--profile-dir', help='慢请求分析结果的保存目录')
+    parser.add_argument('--metrics', action='store_true', help='单次提取结束后将统计以Prometheus文本格式输出到stderr')
+    parser.add_argument('--serve', action='store_true', help='常驻服务模式，按行读取JSON请求')
+    parser.add_argument('--socket', dest='socket_path', help='常驻服务模式下监听的Unix socket路径（默认使用stdin/stdout）')
+    parser.add_argument('--serve-workers', type=int, default=8,
+                        help='常驻服务模式下同时处理的请求数（同一视频的并发请求合并为一次提取）')
+    parser.add_argument('--batch', action='store_true', help='批量模式，未提供URL时从stdin按行读取')
+    parser.add_argument('--workers', type=int, default=None, help='批量模式的工作进程数（默认为CPU核数）')
+    parser.add_argument('--timeout', type=float, default=90, help='批量模式下单个URL的超时时间(秒)')
+    parser.add_argument('--prefetch-mb', type=float, default=None,
+                        help='常驻服务模式下，提取成功后在后台预取视频的前若干MB到本地缓存（0表示整个文件）')
+    parser.add_argument('--prefetch-max-mb', type=float, default=1024, help='本地视频缓存的容量上限(MB)')
+    parser.add_argument('--prefetch-dir', default=VIDEO_CACHE_DIR, help='本地视频缓存目录')
+    parser.add_argument('--prefetch-port', type=int, default=None,
+                        help='在该端口提供本地视频缓存的HTTP Range服务，结果中附带cached_url')
+    parser.add_argument('--refresh-ahead', action='store_true',
+                        help='常驻服务模式下，在热门视频的播放地址过期前于后台重新解析并写入结果缓存')
+    parser.add_argument('--refresh-budget', type=int, default=30, help='提前刷新每分钟最多的次数')
+    parser.add_argument('--refresh-lead', type=float, default=180, help='在播放地址过期前多少秒提前刷新')
+    parser.add_argument('--refresh-reserved', type=int, default=None,
+                        help='前台繁忙时每分钟仍可进行的提前刷新次数（从预算中预留，默认为预算的一半）')
+    parser.add_argument('--refresh-min-requests', type=float, default=2,
+                        help='热度（按10分钟半衰期衰减的请求次数）达到该值的视频才提前刷新')
+    parser.add_argument('--tabs', type=int, default=None,
+                        help='批量模式下改为在同一个浏览器中用多个标签页并行提取，指定同时打开的标签页数')
+    args = parser.parse_args()
+    
+    headless = args.headless
+    random_ua = args.random_ua
+    extractor_options = {
+        "headless": headless,
+        "random_ua": random_ua,
+        "use_browser": args.use_browser,
+        "use_cache": args.use_cache,
+        "lean_page": args.lean_page,
+        "use_ssr": args.use_ssr,
+        "hedge_delay": args.hedge_delay,
+        "request_rate": args.rate or None,
+        "host_concurrency": args.host_concurrency,
+        "profile_dir": None if args.no_chrome_profile else args.chrome_profile_dir
+    }
+    tracer_options = {
+        "trace": args.trace,
+        "trace_file": args.trace_file,
+        "profile_slow": args.profile_slow,
+        "profile_dir": args.profile_dir
+    }
+    
+    if args.cache_stats:
+        cache = ResultCache()
+        print(json.dumps(cache.stats()))
+        cache.close()
+        return
+    
+    if args.serve:
+        print(f"参数: headless={headless}, random_ua={random_ua}", file=sys.stderr)
+        prefetch = None
+        if args.prefetch_mb is not None:
+            prefetch = VideoPrefetchCache(directory=args.prefetch_dir,
+                                          max_bytes=int(args.prefetch_max_mb * (1 << 20)),
+                                          prefetch_bytes=int(args.prefetch_mb * (1 << 20)) or None)
+        extractor = TiktokExtractor(keep_alive=True, tracer=build_tracer(**tracer_options), prefetch=prefetch,
+                                    hedge_workers=args.serve_workers, **extractor_options)
+        if prefetch:
+            prefetch.resolver = extractor.refresh_play_url
+            if args.prefetch_port is not None:
+                VideoCacheServer(prefetch, port=args.prefetch_port).start()
+        if args.refresh_ahead:
+            extractor.start_refresh_ahead(budget_per_minute=args.refresh_budget, lead_time=args.refresh_lead,
+                                          min_requests=args.refresh_min_requests,
+                                          reserved_per_minute=args.refresh_reserved)
+        serve(extractor, args.socket_path, workers=args.serve_workers)
         return
     
-    url = sys.argv[1]
+    if args.batch:
+        urls = args.urls or [line.strip() for line in sys.stdin if line.strip()]
+        if args.tabs:
+            extractor = TiktokExtractor(tracer=build_tracer(**tracer_options), **extractor_options)
+            try:
+                print(json.dumps(extractor.extract_from_urls(urls, max_tabs=args.tabs)))
+            finally:
+                extractor.close()
+            return
+        results = extract_batch(urls, workers=args.workers, timeout=args.timeout,
+                                tracer_options=tracer_options, **extractor_options)
+        print(json.dumps(results))
+        return
     
-    # 解析命令行参数
-    headless = True
-    if len(sys.argv) > 2 and sys.argv[2] == '--no-headless':
-        headless = False
+    if not args.urls:
+        print(json.dumps({"success": False, "error": "请提供视频URL"}))
+        return
     
-    random_ua = True
-    if len(sys.argv) > 3 and sys.argv[3] == '--no-random-ua':
-        random_ua = False
+    url = args.urls[0]
     
     print(f"开始提取视频: {url}", file=sys.stderr)
     print(f"参数: headless={headless}, random_ua={random_ua}", file=sys.stderr)
     
-    extractor = TiktokExtractor(headless=headless, random_ua=random_ua)
+    extractor = TiktokExtractor(tracer=build_tracer(**tracer_options), **extractor_options)
     result = extractor.extract_from_url(url)
     
-    # 输出JSON结果
+    if args.metrics:
+        print(extractor.tracer.prometheus(), file=sys.stderr)
+    
+    # 输出JSON结果。对冲落败的浏览器方法仍可能在启动Chrome或加载页面，进程要等它关闭浏览器后才退出，
+    # 因此立即刷新输出，调用方读到这一行即可返回，不必等待进程退出
     print(json.dumps(result))
+    sys.stdout.flush()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
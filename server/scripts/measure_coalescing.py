@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# measure_coalescing.py - 对比有无单次执行合并时，同一视频的突发并发请求对上游的请求数、成功数和延迟
+
+import argparse
+import json
+import threading
+import time
+from typing import Dict, Any
+
+from bench_extractor import FakeApiServer, make_extractor, load_fixtures, quiet, VIDEO_ID
+from extract_tiktok import SingleFlight
+
+
+class NoCoalescing(SingleFlight):
+    """对照组：每个请求都独立执行"""
+
+    def do(self, key, work, failed=None):
+        with self._lock:
+            self.leaders += 1
+        return work(), False
+
+
+def burst(server: FakeApiServer, fixtures: Dict[str, Any], coalesce: bool, mode: str,
+          clients: int, rounds: int) -> Dict[str, Any]:
+    """每轮由clients个线程同时请求同一个视频
+
+    Args:
+        server: 本地API服务（应设置latency）
+        fixtures: 录制数据
+        coalesce: 是否合并同一视频的并发请求
+        mode: 上游模式，'ok'时提取成功，'fail'时所有方法失败
+        clients: 每轮的并发请求数
+        rounds: 轮数，每轮请求不同的视频
+
+    Returns:
+        统计结果
+    """
+    extractor = make_extractor(fixtures, server)
+    # 失败场景不回退到模拟浏览器，使所有方法都失败
+    extractor.use_browser = mode == 'ok'
+    if not coalesce:
+        extractor.inflight = NoCoalescing()
+    server.mode = mode
+    server.requests = 0
+
+    latencies = []
+    successes = 0
+    lock = threading.Lock()
+    start = time.perf_counter()
+    for index in range(rounds):
+        url = f'https://www.douyin.com/video/{int(VIDEO_ID) + index}'
+        barrier = threading.Barrier(clients)
+
+        def client():
+            nonlocal successes
+            barrier.wait()
+            begin = time.perf_counter()
+            result = extractor.extract_from_url(url)
+            with lock:
+                latencies.append(time.perf_counter() - begin)
+                successes += bool(result.get("success"))
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    server.mode = 'ok'
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "coalesce": coalesce,
+        "requests": len(latencies),
+        "succeeded": successes,
+        "upstream_requests": server.requests,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+        "seconds": round(elapsed, 2),
+        "coalescing": extractor.inflight.stats()
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='对比有无单次执行合并时同一视频的突发并发请求')
+    parser.add_argument('--clients', type=int, default=50, help='每轮同时请求同一视频的客户端数')
+    parser.add_argument('--rounds', type=int, default=5, help='轮数，每轮请求不同的视频')
+    parser.add_argument('--api-latency', type=float, default=0.1, help='模拟的上游响应延迟(秒)')
+    parser.add_argument('--verbose', action='store_true', help='显示提取器日志')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    results = []
+    with FakeApiServer(fixtures) as server, quiet(not args.verbose):
+        server.latency = args.api_latency
+        for mode in ('ok', 'fail'):
+            for coalesce in (False, True):
+                results.append(burst(server, fixtures, coalesce, mode, args.clients, args.rounds))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# measure_lean_page.py - 对比精简页面模式开启/关闭时的页面加载时间和Chrome内存
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import List, Dict, Any
+
+from extract_tiktok import TiktokExtractor
+
+
+def measure(urls: List[str], lean_page: bool, repeat: int, headless: bool) -> Dict[str, Any]:
+    """使用同一个浏览器依次加载URL，记录每次的加载耗时和浏览器RSS
+
+    Args:
+        urls: 视频页面URL列表
+        lean_page: 是否启用精简页面模式
+        repeat: 每个URL重复加载的次数
+        headless: 是否使用无头模式运行浏览器
+
+    Returns:
+        汇总统计
+    """
+    extractor = TiktokExtractor(headless=headless, keep_alive=True, use_cache=False, lean_page=lean_page)
+    extract_times = []
+    dom_ready_times = []
+    rss_samples = []
+    found = 0
+
+    try:
+        for _ in range(repeat):
+            for url in urls:
+                start = time.perf_counter()
+                video_urls = extractor.extract_video_urls(url)
+                extract_times.append(time.perf_counter() - start)
+                found += bool(video_urls)
+
+                try:
+                    dom_ready = extractor.driver.execute_script(
+                        "var t = window.performance.timing;"
+                        "return t.domContentLoadedEventEnd - t.navigationStart;"
+                    )
+                    if dom_ready and dom_ready > 0:
+                        dom_ready_times.append(dom_ready / 1000)
+                except Exception as e:
+                    print(f"读取页面加载时间失败: {e}", file=sys.stderr)
+
+                rss = extractor.browser_rss()
+                if rss is not None:
+                    rss_samples.append(rss)
+    finally:
+        extractor._close_selenium()
+
+    def summary(values: List[float]) -> Dict[str, Any]:
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "median": statistics.median(values),
+            "max": max(values)
+        }
+
+    return {
+        "lean_page": lean_page,
+        "found": found,
+        "extract_seconds": summary(extract_times),
+        "dom_ready_seconds": summary(dom_ready_times),
+        "browser_rss_mb": summary([rss / 1024 / 1024 for rss in rss_samples])
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='对比精简页面模式开启/关闭时的页面加载时间和Chrome内存')
+    parser.add_argument('urls', nargs='+', metavar='url', help='视频页面URL')
+    parser.add_argument('--repeat', type=int, default=3, help='每个URL重复加载的次数')
+    parser.add_argument('--no-headless', dest='headless', action='store_false', help='显示浏览器窗口')
+    args = parser.parse_args()
+
+    results = [measure(args.urls, lean_page, args.repeat, args.headless) for lean_page in (False, True)]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# measure_refresh_ahead.py - 对比有无提前刷新时，热门视频在签名地址反复过期的情况下前台请求需要完整提取的次数和延迟
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, Any
+
+from bench_extractor import FakeApiServer, make_extractor, load_fixtures, quiet, VIDEO_ID
+from extract_tiktok import ResultCache
+
+
+def run_workload(server: FakeApiServer, fixtures: Dict[str, Any], refresh_ahead: bool, duration: float,
+                 videos: int, request_interval: float, seed: int, clients: int = 1) -> Dict[str, Any]:
+    """按Zipf分布反复请求一组视频，统计命中缓存的比例和前台延迟
+
+    Args:
+        server: 本地API服务（应设置latency和expires_in）
+        fixtures: 录制数据
+        refresh_ahead: 是否启用提前刷新
+        duration: 运行时间(秒)
+        videos: 视频数
+        request_interval: 前台请求间隔(秒)
+        seed: 随机种子，两种模式使用相同的请求序列
+        clients: 并发的前台客户端数，大于1时几乎总有完整提取在进行
+
+    Returns:
+        统计结果
+    """
+    video_ids = [str(int(VIDEO_ID) + index) for index in range(videos)]
+    weights = [1 / (rank + 1) for rank in range(videos)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        extractor = make_extractor(fixtures, server)
+        extractor.cache = ResultCache(path=os.path.join(directory, 'results.sqlite3'), expiry_margin=1)
+        if refresh_ahead:
+            extractor.start_refresh_ahead(budget_per_minute=120, lead_time=3, min_requests=2, interval=0.5)
+
+        latencies = []
+        cold = 0
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def client(index: int) -> None:
+            nonlocal cold
+            rng = random.Random(seed + index)
+            while time.monotonic() < deadline:
+                video_id = rng.choices(video_ids, weights)[0]
+                start = time.perf_counter()
+                result = extractor.extract_from_url(f'https://www.douyin.com/video/{video_id}')
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                    if not result.get("cached"):
+                        cold += 1
+                time.sleep(request_interval)
+
+        threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        refresher_stats = extractor.refresher.stats() if extractor.refresher else None
+        if extractor.refresher:
+            extractor.refresher.stop()
+        extractor.cache.close()
+
+    latencies.sort()
+    return {
+        "mode": "refresh_ahead" if refresh_ahead else "baseline",
+        "requests": len(latencies),
+        "cold_extractions": cold,
+        "upstream_requests": server.requests,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+        "refresher": refresher_stats
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='对比有无提前刷新时热门视频的前台延迟')
+    parser.add_argument('--duration', type=float, default=30, help='每种模式的运行时间(秒)')
+    parser.add_argument('--videos', type=int, default=20, help='视频数（按Zipf分布请求）')
+    parser.add_argument('--interval', type=float, default=0.05, help='前台请求间隔(秒)')
+    parser.add_argument('--clients', type=int, default=1, help='并发的前台客户端数')
+    parser.add_argument('--expires-in', type=float, default=10, help='模拟的签名地址有效期(秒)')
+    parser.add_argument('--api-latency', type=float, default=0.15, help='模拟的上游响应延迟(秒)，即完整提取的代价')
+    parser.add_argument('--verbose', action='store_true', help='显示提取器日志')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    results = []
+    with FakeApiServer(fixtures) as server, quiet(not args.verbose):
+        server.latency = args.api_latency
+        server.expires_in = args.expires_in
+        for refresh_ahead in (False, True):
+            server.requests = 0
+            results.append(run_workload(server, fixtures, refresh_ahead, args.duration, args.videos,
+                                        args.interval, seed=1, clients=args.clients))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# measure_scheduler.py - 对比有无请求调度器时，对限流的本地上游批量解析视频ID的成功数、请求数和429次数
+
+import argparse
+import json
+import time
+from typing import List, Dict, Any, Optional
+
+from bench_extractor import FakeApiServer, make_extractor, load_fixtures, quiet, BULK_VIDEO_IDS
+from extract_tiktok import DouyinApiClient
+
+
+def measure(server: FakeApiServer, fixtures: Dict[str, Any], mode: str, request_rate: Optional[float],
+            batches: int, upstream_rate: float) -> Dict[str, Any]:
+    """用get_many连续解析多批视频ID
+
+    Args:
+        server: 本地API服务
+        fixtures: 录制数据
+        mode: 结果中的名称，为'no_scheduler'时API客户端不挂载调度器
+        request_rate: 调度器每秒请求数上限，为None时只限制并发并在限流时退避
+        batches: 批数，每批40个视频ID
+        upstream_rate: 上游每秒允许的请求数
+
+    Returns:
+        统计结果
+    """
+    extractor = make_extractor(fixtures, server, request_rate=request_rate)
+    if mode == 'no_scheduler':
+        client = DouyinApiClient(extractor.headers)
+        client.API_ENDPOINTS = extractor.api_client.API_ENDPOINTS
+        extractor.api_client = client
+
+    server.reset_rate_limit(upstream_rate)
+    server.requests = 0
+    server.throttled = 0
+    resolved = 0
+    total = 0
+    start = time.perf_counter()
+    for batch in range(batches):
+        video_ids = [str(int(video_id) + batch * 1000) for video_id in BULK_VIDEO_IDS]
+        results = extractor.api_client.get_many(video_ids)
+        resolved += sum(bool(urls) for urls in results.values())
+        total += len(video_ids)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "resolved": f"{resolved}/{total}",
+        "requests": server.requests,
+        "throttled_429": server.throttled,
+        "seconds": round(elapsed, 2),
+        "scheduler": extractor.scheduler.stats() if mode != 'no_scheduler' else None
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='对比有无请求调度器时对限流上游的批量解析效果')
+    parser.add_argument('--batches', type=int, default=5, help='批数，每批40个视频ID')
+    parser.add_argument('--upstream-rate', type=float, default=20, help='模拟上游每秒允许的请求数')
+    parser.add_argument('--rate', type=float, default=40, help='调度器每秒请求数上限（高于上游，由自适应降速收敛）')
+    parser.add_argument('--verbose', action='store_true', help='显示提取器日志')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    results: List[Dict[str, Any]] = []
+    with FakeApiServer(fixtures) as server, quiet(not args.verbose):
+        for mode, rate in (('no_scheduler', None), ('backoff_only', None), ('scheduled', args.rate)):
+            results.append(measure(server, fixtures, mode, rate, args.batches, args.upstream_rate))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
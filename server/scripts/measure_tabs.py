@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# measure_tabs.py - 对比同一浏览器多标签页与每个URL各一个浏览器时，每个并发提取占用的Chrome内存
+
+import argparse
+import json
+import sys
+import threading
+import time
+from typing import List, Dict, Any, Callable
+
+from extract_tiktok import TiktokExtractor
+
+
+def sample_peak_rss(read_rss: Callable[[], int], stop: threading.Event, peak: List[int],
+                    interval: float = 0.2) -> None:
+    """在stop被设置前周期性读取RSS，记录峰值
+
+    Args:
+        read_rss: 返回当前RSS字节数的函数
+        stop: 停止采样的事件
+        peak: 单元素列表，保存峰值
+        interval: 采样间隔(秒)
+    """
+    while not stop.is_set():
+        try:
+            peak[0] = max(peak[0], read_rss())
+        except Exception as e:
+            print(f"读取浏览器内存失败: {e}", file=sys.stderr)
+        stop.wait(interval)
+
+
+def measure_separate(urls: List[str], headless: bool) -> Dict[str, Any]:
+    """每个URL使用独立的提取器和浏览器，同时提取"""
+    extractors = [TiktokExtractor(headless=headless, keep_alive=True, use_cache=False) for _ in urls]
+    found = [False] * len(urls)
+
+    def run(index: int) -> None:
+        found[index] = bool(extractors[index].extract_video_urls(urls[index]))
+
+    stop = threading.Event()
+    peak = [0]
+    sampler = threading.Thread(
+        target=sample_peak_rss,
+        args=(lambda: sum(extractor.browser_rss() or 0 for extractor in extractors), stop, peak)
+    )
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(len(urls))]
+
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        elapsed = time.perf_counter() - start
+        stop.set()
+        sampler.join()
+        for extractor in extractors:
+            extractor._close_selenium()
+
+    return summarize("browser_per_url", urls, found, elapsed, peak[0])
+
+
+def measure_tabs(urls: List[str], headless: bool) -> Dict[str, Any]:
+    """所有URL在同一个浏览器的不同标签页中同时加载"""
+    extractor = TiktokExtractor(headless=headless, keep_alive=True, use_cache=False)
+    stop = threading.Event()
+    peak = [0]
+    sampler = threading.Thread(target=sample_peak_rss, args=(lambda: extractor.browser_rss() or 0, stop, peak))
+
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        found = [bool(video_urls) for video_urls in extractor.extract_video_urls_many(urls, max_tabs=len(urls))]
+    finally:
+        elapsed = time.perf_counter() - start
+        stop.set()
+        sampler.join()
+        extractor._close_selenium()
+
+    return summarize("tabs", urls, found, elapsed, peak[0])
+
+
+def summarize(mode: str, urls: List[str], found: List[bool], elapsed: float, peak_rss: int) -> Dict[str, Any]:
+    """汇总一次对比的结果"""
+    peak_mb = peak_rss / 1024 / 1024
+    return {
+        "mode": mode,
+        "concurrent": len(urls),
+        "found": sum(found),
+        "seconds": round(elapsed, 2),
+        "peak_rss_mb": round(peak_mb, 1),
+        "rss_mb_per_extraction": round(peak_mb / len(urls), 1) if urls else None
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='对比同一浏览器多标签页与每个URL各一个浏览器的内存占用')
+    parser.add_argument('urls', nargs='+', metavar='url', help='视频页面URL，数量即并发提取数')
+    parser.add_argument('--no-headless', dest='headless', action='store_false', help='显示浏览器窗口')
+    args = parser.parse_args()
+
+    results = [measure_separate(args.urls, args.headless), measure_tabs(args.urls, args.headless)]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
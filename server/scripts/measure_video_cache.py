@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# measure_video_cache.py - 用本地HTTP服务模拟视频CDN，验证预取缓存的Range响应并对比首字节时间
+
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import requests
+
+from video_cache import VideoPrefetchCache, VideoCacheServer, parse_range_header
+
+
+def make_sample_mp4(size: int, seed: int = 0) -> bytes:
+    """生成指定大小的示例MP4：ftyp盒 + 填充随机数据的mdat盒"""
+    ftyp = b'isom' + struct.pack('>I', 512) + b'isomiso2avc1mp41'
+    ftyp = struct.pack('>I', 8 + len(ftyp)) + b'ftyp' + ftyp
+    payload = random.Random(seed).randbytes(max(0, size - len(ftyp) - 8))
+    return ftyp + struct.pack('>I', 8 + len(payload)) + b'mdat' + payload
+
+
+class OriginServer:
+    """模拟视频CDN：支持单区间Range请求，响应带有内容的ETag，每个请求先等待latency秒"""
+
+    def __init__(self, data: bytes, latency: float = 0.0):
+        self.data = data
+        self.etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                size = len(server.data)
+                try:
+                    requested = parse_range_header(self.headers.get('Range'), size)
+                except ValueError:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{size}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                start, stop = requested or (0, size)
+                self.send_response(206 if requested else 200)
+                self.send_header('Content-Type', 'video/mp4')
+                self.send_header('ETag', server.etag)
+                self.send_header('Content-Length', str(stop - start))
+                if requested:
+                    self.send_header('Content-Range', f'bytes {start}-{stop - 1}/{size}')
+                self.end_headers()
+                self.wfile.write(server.data[start:stop])
+                server.bytes_sent += stop - start
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/video/tos/sample.mp4'
+
+    def __enter__(self) -> 'OriginServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def first_byte_seconds(session: requests.Session, url: str, byte_range: Optional[Tuple[int, int]]) -> float:
+    """请求一个区间，返回收到首个数据块的耗时(秒)，并读完响应体"""
+    headers = {'Range': f'bytes={byte_range[0]}-{byte_range[1] - 1}'} if byte_range else {}
+    start = time.perf_counter()
+    with session.get(url, headers=headers, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        chunks = response.iter_content(64 << 10)
+        next(chunks, None)
+        elapsed = time.perf_counter() - start
+        for _ in chunks:
+            pass
+    return elapsed
+
+
+def check_ranges(session: requests.Session, url: str, data: bytes, count: int, rng: random.Random) -> int:
+    """请求随机区间并与原始数据逐字节比较，返回不一致的数量"""
+    size = len(data)
+    mismatches = 0
+    headers_list = [{}, {'Range': f'bytes=-{rng.randint(1, 4096)}'}, {'Range': f'bytes={size - 10}-'}]
+    for _ in range(count):
+        start = rng.randrange(size)
+        stop = min(size, start + rng.randint(1, 3 << 20))
+        headers_list.append({'Range': f'bytes={start}-{stop - 1}'})
+    for headers in headers_list:
+        response = session.get(url, headers=headers, timeout=30)
+        requested = parse_range_header(headers.get('Range'), size)
+        expected = data[slice(*requested)] if requested else data
+        if response.content != expected:
+            mismatches += 1
+            print(f"内容不一致: {headers} -> HTTP {response.status_code}", file=sys.stderr)
+    return mismatches
+
+
+def check_rendition_switch(directory: str, data: bytes, session: requests.Session) -> bool:
+    """同一视频先缓存了A文件的开头，再换成另一种清晰度B的地址（大小和ETag都不同），
+    通过本地服务完整读取的内容应全部来自B，而不是A的开头拼接B的其余部分"""
+    other = make_sample_mp4(len(data) // 2 + 1000, seed=1)
+    with OriginServer(data) as first, OriginServer(other) as second:
+        cache = VideoPrefetchCache(directory=directory, max_bytes=len(data) * 4)
+        server = VideoCacheServer(cache).start()
+        try:
+            video_id = '7100000000000000000'
+            entry = cache.register(video_id, first.url)
+            cache.ensure_range(entry, 0, 400)
+            cache.register(video_id, second.url)
+            try:
+                content = session.get(cache.local_url(video_id), timeout=30).content
+            except requests.RequestException as e:
+                # 声明的长度与实际数据不符时连接中途断开
+                print(f"读取换了地址的视频失败: {e}", file=sys.stderr)
+                return False
+        finally:
+            server.close()
+            cache.close()
+    return content == other
+
+
+def run(size: int, prefetch_bytes: Optional[int], latency: float, repeat: int,
+        sample: Optional[str]) -> Dict[str, Any]:
+    """运行验证和对比
+
+    Args:
+        size: 生成的示例视频大小(字节)，提供sample时忽略
+        prefetch_bytes: 预取字节数，为None时预取整个文件
+        latency: 模拟CDN的单请求延迟(秒)
+        repeat: 首字节时间的测量次数
+        sample: 示例MP4文件路径
+
+    Returns:
+        汇总结果
+    """
+    if sample:
+        with open(sample, 'rb') as f:
+            data = f.read()
+    else:
+        data = make_sample_mp4(size)
+
+    session = requests.Session()
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory, OriginServer(data, latency) as origin:
+        cache = VideoPrefetchCache(directory=directory, prefetch_bytes=prefetch_bytes, max_bytes=len(data) * 2)
+        server = VideoCacheServer(cache).start()
+        try:
+            video_id = '7344275866215664911'
+            cache.prefetch(video_id, origin.url)
+            deadline = time.monotonic() + 30
+            while cache.stats()["prefetching"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            prefetched = cache.get(video_id).stored
+            local_url = cache.local_url(video_id)
+
+            head = (0, min(len(data), 256 << 10))
+            origin_ttfb = [first_byte_seconds(session, origin.url, head) for _ in range(repeat)]
+            cache_ttfb = [first_byte_seconds(session, local_url, head) for _ in range(repeat)]
+
+            mismatches = check_ranges(session, local_url, data, 20, rng)
+            rendition_switch_ok = check_rendition_switch(os.path.join(directory, 'switch'), data, session)
+
+            # 容量上限小于单个视频时，新视频写入后旧视频被淘汰
+            cache.max_bytes = 1
+            cache.prefetch('7000000000000000000', origin.url)
+            deadline = time.monotonic() + 30
+            while cache.stats()["prefetching"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            evicted = cache.get(video_id) is None
+
+            stats = cache.stats()
+        finally:
+            server.close()
+            cache.close()
+
+        return {
+            "video_bytes": len(data),
+            "prefetched_bytes": prefetched,
+            "origin_requests": origin.requests,
+            "origin_bytes": origin.bytes_sent,
+            "first_byte_ms": {
+                "origin": round(statistics.median(origin_ttfb) * 1000, 2),
+                "cache": round(statistics.median(cache_ttfb) * 1000, 2)
+            },
+            "range_mismatches": mismatches,
+            "rendition_switch_ok": rendition_switch_ok,
+            "lru_evicted": evicted,
+            "cache": stats
+        }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='验证本地视频预取缓存并对比首字节时间')
+    parser.add_argument('--sample', help='示例MP4文件（默认生成随机内容的示例文件）')
+    parser.add_argument('--size-mb', type=float, default=8, help='生成的示例视频大小(MB)')
+    parser.add_argument('--prefetch-mb', type=float, default=2, help='预取大小(MB)，0表示整个文件')
+    parser.add_argument('--latency', type=float, default=0.05, help='模拟CDN的单请求延迟(秒)')
+    parser.add_argument('--repeat', type=int, default=5, help='首字节时间的测量次数')
+    args = parser.parse_args()
+
+    result = run(int(args.size_mb * (1 << 20)), int(args.prefetch_mb * (1 << 20)) or None,
+                 args.latency, args.repeat, args.sample)
+    print(json.dumps(result, indent=2))
+    if result["range_mismatches"] or not result["rendition_switch_ok"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
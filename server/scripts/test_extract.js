@@ -6,7 +6,7 @@ const path = require('path');
 const testUrl = 'https://www.douyin.com/discover/search/%E4%B8%AD%E4%BF%A1%E9%93%B6%E8%A1%8C%E4%BF%A1%E7%94%A8%E5%8D%A1?aid=a72dd233-9221-4b77-a0ce-c998d41d8e35&modal_id=7344275866215664911&type=general';
 
 // Python脚本路径
-const pythonScriptPath = path.join(__dirname, 'extract_video.py');
+const pythonScriptPath = path.join(__dirname, 'extract_tiktok.py');
 
 console.log(`测试Python视频提取，URL: ${testUrl}`);
 console.log(`使用脚本: ${pythonScriptPath}`);
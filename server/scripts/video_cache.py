@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+# video_cache.py - 播放地址的本地预取缓存：分段下载视频存到磁盘，并通过HTTP Range请求对外提供
+
+import http.server
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Tuple, Callable, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 本地视频缓存目录
+VIDEO_CACHE_DIR = os.environ.get(
+    'EXTRACTOR_VIDEO_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'tiktok_extractor', 'videos')
+)
+
+# 抖音视频CDN校验Referer，缺少时返回403
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/122.0.0.0 Safari/537.36',
+    'Referer': 'https://www.douyin.com/'
+}
+
+RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)$')
+CONTENT_RANGE_PATTERN = re.compile(r'bytes\s+(?:(\d+)-(\d+)|\*)/(\d+|\*)')
+VIDEO_ID_PATTERN = re.compile(r'[\w-]+')
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """解析客户端的Range请求头，只支持单个区间
+
+    Args:
+        header: Range请求头
+        size: 文件总大小
+
+    Returns:
+        左闭右开的字节区间；没有Range头或格式不支持（按RFC 7233可以忽略）时返回None
+
+    Raises:
+        ValueError: 区间无法满足
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        # 后缀区间：bytes=-N 表示最后N个字节
+        if not last or int(last) == 0:
+            raise ValueError(header)
+        return max(0, size - int(last)), size
+    start = int(first)
+    stop = min(int(last) + 1, size) if last else size
+    if start >= size or stop <= start:
+        raise ValueError(header)
+    return start, stop
+
+
+class CachedVideo:
+    """一个视频的缓存状态：上游播放地址、文件总大小、ETag和已缓存的字节区间"""
+
+    def __init__(self, video_id: str, url: str, size: Optional[int] = None, content_type: str = 'video/mp4',
+                 ranges: Optional[List[List[int]]] = None, last_access: float = 0.0, etag: Optional[str] = None):
+        self.video_id = video_id
+        self.url = url
+        self.size = size
+        self.content_type = content_type
+        self.etag = etag
+        # 已缓存的数据因上游换了文件被丢弃时加一，正在进行的读取据此提前结束
+        self.generation = 0
+        # 换了播放地址后，确认新地址与已缓存的数据是同一个文件之前不提供已缓存的数据
+        self.verified = True
+        # 已缓存的左闭右开区间，有序且互不相邻；更新时整体替换，读取无需加锁
+        self.ranges: List[List[int]] = ranges or []
+        self.last_access = last_access
+        # 同一视频同一时间只有一个线程从上游获取数据
+        self.lock = threading.Lock()
+        # 正在读取该视频的请求数，大于0时不会被淘汰
+        self.readers = 0
+
+    @property
+    def stored(self) -> int:
+        """已缓存的字节数"""
+        return sum(stop - start for start, stop in self.ranges)
+
+    def add_range(self, start: int, stop: int) -> None:
+        """标记区间已缓存，与已有区间合并"""
+        merged = []
+        for a, b in sorted(self.ranges + [[start, stop]]):
+            if merged and a <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+        self.ranges = merged
+
+    def missing(self, start: int, stop: int) -> List[Tuple[int, int]]:
+        """[start, stop)中尚未缓存的区间"""
+        gaps = []
+        pos = start
+        for a, b in self.ranges:
+            if b <= pos:
+                continue
+            if a >= stop:
+                break
+            if a > pos:
+                gaps.append((pos, a))
+            pos = max(pos, b)
+        if pos < stop:
+            gaps.append((pos, stop))
+        return gaps
+
+
+class VideoPrefetchCache:
+    """按视频ID缓存视频数据：提取成功后在后台分段预取开头部分（或整个文件），
+    数据写入稀疏文件，已缓存区间和上游地址记录在SQLite索引中，总大小超过上限时按LRU淘汰整个视频"""
+
+    def __init__(self, directory: str = VIDEO_CACHE_DIR, max_bytes: int = 1 << 30,
+                 prefetch_bytes: Optional[int] = 2 << 20, chunk_size: int = 256 << 10,
+                 segment_size: int = 1 << 20, headers: Optional[Dict[str, str]] = None,
+                 timeout: Tuple[float, float] = (3.05, 15), max_workers: int = 2,
+                 resolver: Optional[Callable[[str], Optional[str]]] = None):
+        """初始化缓存
+
+        Args:
+            directory: 缓存目录
+            max_bytes: 缓存总大小上限(字节)
+            prefetch_bytes: 提取成功后预取的字节数，为None时预取整个文件
+            chunk_size: 流式读写的块大小(字节)
+            segment_size: 一次上游Range请求的最大字节数，分段之间释放锁，按需读取可以插队
+            headers: 请求上游使用的请求头
+            timeout: 上游请求的(连接超时, 读取超时)
+            max_workers: 后台预取线程数
+            resolver: 上游地址过期(403/410)时根据视频ID重新获取播放地址的函数
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.prefetch_bytes = prefetch_bytes
+        self.chunk_size = chunk_size
+        self.segment_size = max(segment_size, chunk_size)
+        self.timeout = timeout
+        self.resolver = resolver
+        # 由VideoCacheServer启动后设置，用于生成本地播放地址
+        self.base_url: Optional[str] = None
+        self.hit_bytes = 0
+        self.fetched_bytes = 0
+        self._lock = threading.Lock()
+        self._prefetching = set()
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers + 8, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='video-prefetch')
+
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, 'index.sqlite3'), timeout=5,
+                                    check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS videos ('
+            'video_id TEXT PRIMARY KEY, url TEXT NOT NULL, size INTEGER, content_type TEXT NOT NULL, '
+            'ranges TEXT NOT NULL, last_access REAL NOT NULL, etag TEXT)'
+        )
+        # 旧版本创建的索引没有etag列
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(videos)')}
+        if 'etag' not in columns:
+            self.conn.execute('ALTER TABLE videos ADD COLUMN etag TEXT')
+
+        self.entries: Dict[str, CachedVideo] = {}
+        for video_id, url, size, content_type, ranges, last_access, etag in self.conn.execute(
+                'SELECT video_id, url, size, content_type, ranges, last_access, etag FROM videos'):
+            entry = CachedVideo(video_id, url, size, content_type, json.loads(ranges), last_access, etag)
+            # 数据文件丢失（被手动清理）时索引作废
+            if not os.path.exists(self._path(video_id)):
+                entry.ranges = []
+            self.entries[video_id] = entry
+
+    def _path(self, video_id: str) -> str:
+        if not VIDEO_ID_PATTERN.fullmatch(video_id):
+            raise ValueError(f"无效的视频ID: {video_id}")
+        return os.path.join(self.directory, f'{video_id}.mp4')
+
+    def _save(self, entry: CachedVideo) -> None:
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO videos (video_id, url, size, content_type, ranges, last_access, etag) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (entry.video_id, entry.url, entry.size, entry.content_type, json.dumps(entry.ranges),
+                 entry.last_access, entry.etag)
+            )
+
+    def get(self, video_id: str) -> Optional[CachedVideo]:
+        """查询视频的缓存状态，未登记时返回None"""
+        return self.entries.get(video_id)
+
+    def register(self, video_id: str, url: str) -> CachedVideo:
+        """登记（或更新）视频的上游播放地址，同一视频换了签名地址时保留已缓存的数据，
+        新地址对应的文件与已缓存的不同时（总大小或ETag不同），在下一次从上游获取时丢弃已缓存的数据
+
+        Args:
+            video_id: 视频ID
+            url: 播放地址
+
+        Returns:
+            视频的缓存状态
+        """
+        self._path(video_id)
+        with self._lock:
+            entry = self.entries.get(video_id)
+            if entry is None:
+                entry = CachedVideo(video_id, url)
+                self.entries[video_id] = entry
+            if entry.url != url and entry.ranges:
+                entry.verified = False
+            entry.url = url
+            entry.last_access = time.time()
+        self._save(entry)
+        return entry
+
+    def local_url(self, video_id: str) -> Optional[str]:
+        """本地HTTP服务上的播放地址，服务未启动时返回None"""
+        return f"{self.base_url}/video/{video_id}" if self.base_url else None
+
+    def prefetch(self, video_id: str, url: str) -> None:
+        """登记播放地址，并在后台预取视频开头（或整个文件）中尚未缓存的部分
+
+        Args:
+            video_id: 视频ID
+            url: 播放地址
+        """
+        entry = self.register(video_id, url)
+        if entry.size is not None and entry.verified:
+            target = entry.size if self.prefetch_bytes is None else min(self.prefetch_bytes, entry.size)
+            if not entry.missing(0, target):
+                return
+        with self._lock:
+            if video_id in self._prefetching:
+                return
+            self._prefetching.add(video_id)
+        self.executor.submit(self._prefetch, entry)
+
+    def _prefetch(self, entry: CachedVideo) -> None:
+        start = time.perf_counter()
+        try:
+            self.verify(entry)
+            if self.prefetch_bytes is None:
+                # 总大小未知时先取第一个分段，从响应的Content-Range得到总大小
+                ok = self.ensure_range(entry, 0, self.segment_size)
+                if ok and entry.size is not None:
+                    ok = self.ensure_range(entry, 0, entry.size)
+            else:
+                ok = self.ensure_range(entry, 0, self.prefetch_bytes)
+            if ok:
+                print(f"预取视频完成: {entry.video_id}，已缓存 {entry.stored} 字节，"
+                      f"耗时 {time.perf_counter() - start:.2f} 秒", file=sys.stderr)
+        except Exception as e:
+            print(f"预取视频失败 {entry.video_id}: {e}", file=sys.stderr)
+        finally:
+            with self._lock:
+                self._prefetching.discard(entry.video_id)
+
+    def ensure_range(self, entry: CachedVideo, start: int, stop: int) -> bool:
+        """确保[start, stop)已缓存，缺失的部分按分段从上游获取
+
+        Args:
+            entry: 视频的缓存状态
+            start: 起始字节
+            stop: 结束字节（不含），超出文件总大小的部分忽略
+
+        Returns:
+            区间是否已全部缓存
+        """
+        pos = start
+        while True:
+            if entry.size is not None:
+                stop = min(stop, entry.size)
+            if pos >= stop:
+                break
+            segment_stop = min(stop, pos + self.segment_size)
+            with entry.lock:
+                # 等锁期间其他线程可能已经取回了这一段
+                for gap_start, gap_stop in entry.missing(pos, segment_stop):
+                    if not self._fetch(entry, gap_start, gap_stop):
+                        return False
+            pos = segment_stop
+        self._evict()
+        return True
+
+    def _fetch(self, entry: CachedVideo, start: int, stop: int) -> bool:
+        """用一个Range请求从上游流式获取[start, stop)并写入数据文件，调用方需持有entry.lock"""
+        for attempt in range(2):
+            try:
+                response = self.session.get(entry.url, headers={'Range': f'bytes={start}-{stop - 1}'},
+                                            stream=True, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"请求视频数据失败 {entry.video_id}: {e}", file=sys.stderr)
+                return False
+
+            with response:
+                status = response.status_code
+                if status in (403, 410) and attempt == 0 and self.resolver:
+                    # 签名地址过期，重新获取播放地址后再试一次
+                    fresh_url = self.resolver(entry.video_id)
+                    if fresh_url and fresh_url != entry.url:
+                        print(f"播放地址已失效，使用重新获取的地址: {entry.video_id}", file=sys.stderr)
+                        entry.url = fresh_url
+                        self._save(entry)
+                        continue
+
+                content_range = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+                total = None
+                if content_range and content_range.group(3) != '*':
+                    total = int(content_range.group(3))
+                elif status == 200 and response.headers.get('Content-Length', '').isdigit():
+                    total = int(response.headers['Content-Length'])
+                self._check_identity(entry, total, response.headers.get('ETag') if status in (200, 206) else None)
+                if total is not None:
+                    entry.size = total
+
+                if status == 416:
+                    # 请求的起点已超出文件末尾
+                    self._save(entry)
+                    return entry.size is not None
+                if status == 206 and content_range and content_range.group(1) is not None:
+                    offset = int(content_range.group(1))
+                elif status == 200:
+                    # 上游不支持Range时从头读取，开头的数据同样写入缓存
+                    offset = 0
+                else:
+                    print(f"请求视频数据失败 {entry.video_id}: HTTP {status}", file=sys.stderr)
+                    return False
+
+                content_type = response.headers.get('Content-Type')
+                if content_type:
+                    entry.content_type = content_type
+                return self._write_stream(entry, response, offset, stop)
+        return False
+
+    def verify(self, entry: CachedVideo) -> None:
+        """换了播放地址后用一个字节的Range请求确认新地址的文件总大小和ETag，不同时丢弃已缓存的数据"""
+        if entry.verified:
+            return
+        with entry.lock:
+            if entry.verified:
+                return
+            try:
+                response = self.session.get(entry.url, headers={'Range': 'bytes=0-0'}, stream=True,
+                                            timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"确认视频地址失败 {entry.video_id}: {e}", file=sys.stderr)
+                return
+            with response:
+                if response.status_code == 206:
+                    content_range = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+                    total = int(content_range.group(3)) if content_range and content_range.group(3) != '*' else None
+                elif response.status_code == 200 and response.headers.get('Content-Length', '').isdigit():
+                    total = int(response.headers['Content-Length'])
+                else:
+                    # 地址失效等情况留给实际获取数据时处理，届时同样会比较总大小和ETag
+                    return
+                self._check_identity(entry, total, response.headers.get('ETag'))
+                if total is not None:
+                    entry.size = total
+                entry.verified = True
+            self._save(entry)
+
+    def _check_identity(self, entry: CachedVideo, size: Optional[int], etag: Optional[str]) -> None:
+        """上游返回的文件与已缓存的数据不是同一个时（同一视频换成了另一种清晰度的地址，总大小或ETag不同），
+        丢弃已缓存的区间并清空数据文件，避免一个响应拼接自两个文件，调用方需持有entry.lock"""
+        changed = (size is not None and entry.size is not None and size != entry.size) or \
+                  bool(etag and entry.etag and etag != entry.etag)
+        if etag or changed:
+            entry.etag = etag
+        if not changed:
+            return
+        print(f"上游文件已变化，丢弃已缓存的数据: {entry.video_id}", file=sys.stderr)
+        entry.ranges = []
+        entry.generation += 1
+        entry.size = size
+        try:
+            os.truncate(self._path(entry.video_id), 0)
+        except FileNotFoundError:
+            pass
+        self._save(entry)
+
+    def _write_stream(self, entry: CachedVideo, response: requests.Response, offset: int, stop: int) -> bool:
+        """把响应体按块写入数据文件的对应位置，每写完一块就标记为已缓存，供并发的读取立即使用"""
+        path = self._path(entry.video_id)
+        try:
+            with open(path, 'r+b' if os.path.exists(path) else 'w+b') as f:
+                f.seek(offset)
+                for chunk in response.iter_content(self.chunk_size):
+                    if offset >= stop:
+                        break
+                    chunk = chunk[:stop - offset]
+                    f.write(chunk)
+                    f.flush()
+                    entry.add_range(offset, offset + len(chunk))
+                    offset += len(chunk)
+                    self.fetched_bytes += len(chunk)
+        except (OSError, requests.RequestException) as e:
+            print(f"写入视频缓存失败 {entry.video_id}: {e}", file=sys.stderr)
+            return False
+        finally:
+            self._save(entry)
+
+        end = stop if entry.size is None else min(stop, entry.size)
+        return offset >= end
+
+    def read(self, entry: CachedVideo, start: int, stop: int) -> Iterator[bytes]:
+        """按块读取[start, stop)，已缓存的部分直接读本地文件，缺失的部分按需从上游获取
+
+        Args:
+            entry: 视频的缓存状态
+            start: 起始字节
+            stop: 结束字节（不含）
+
+        Returns:
+            数据块迭代器，上游获取失败时提前结束
+        """
+        with self._lock:
+            entry.readers += 1
+            entry.last_access = time.time()
+        self.verify(entry)
+        generation = entry.generation
+        try:
+            pos = start
+            with open(self._path(entry.video_id), 'a+b') as f:
+                while pos < stop:
+                    chunk_stop = min(stop, pos + self.chunk_size)
+                    if entry.missing(pos, chunk_stop):
+                        # 按需获取时一次取一个分段，减少顺序播放时的上游请求次数
+                        if not self.ensure_range(entry, pos, min(stop, pos + self.segment_size)):
+                            print(f"读取视频数据失败 {entry.video_id}: {pos}-{stop}", file=sys.stderr)
+                            return
+                    else:
+                        self.hit_bytes += chunk_stop - pos
+                    if entry.generation != generation:
+                        # 已发出的数据属于上游换掉之前的文件，不能再接着发新文件的数据
+                        print(f"上游文件已变化，中止读取 {entry.video_id}: {pos}-{stop}", file=sys.stderr)
+                        return
+                    f.seek(pos)
+                    data = f.read(chunk_stop - pos)
+                    if not data:
+                        return
+                    yield data
+                    pos += len(data)
+        finally:
+            self._save(entry)
+            with self._lock:
+                entry.readers -= 1
+
+    def _evict(self) -> None:
+        """总大小超过上限时，按最近访问时间淘汰整个视频（正在读取或预取的除外）"""
+        with self._lock:
+            total = sum(entry.stored for entry in self.entries.values())
+            if total <= self.max_bytes:
+                return
+            candidates = sorted(self.entries.values(), key=lambda entry: entry.last_access)
+            evicted = []
+            for entry in candidates:
+                if total <= self.max_bytes:
+                    break
+                if entry.readers or entry.video_id in self._prefetching or not entry.lock.acquire(blocking=False):
+                    continue
+                try:
+                    try:
+                        os.remove(self._path(entry.video_id))
+                    except FileNotFoundError:
+                        pass
+                    total -= entry.stored
+                    del self.entries[entry.video_id]
+                    evicted.append(entry.video_id)
+                finally:
+                    entry.lock.release()
+            self.conn.executemany('DELETE FROM videos WHERE video_id = ?', [(video_id,) for video_id in evicted])
+        if evicted:
+            print(f"视频缓存超出上限，淘汰 {len(evicted)} 个视频", file=sys.stderr)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计：条目数、已缓存字节数，以及本进程从本地提供和从上游获取的字节数"""
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "stored_bytes": sum(entry.stored for entry in self.entries.values()),
+                "max_bytes": self.max_bytes,
+                "hit_bytes": self.hit_bytes,
+                "fetched_bytes": self.fetched_bytes,
+                "prefetching": len(self._prefetching)
+            }
+
+    def close(self) -> None:
+        """停止后台预取并关闭索引数据库"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+        with self._lock:
+            self.conn.close()
+
+
+class VideoCacheServer:
+    """通过HTTP提供缓存的视频（GET/HEAD /video/<视频ID>），支持单区间Range请求，未缓存的区间按需从上游获取"""
+
+    def __init__(self, cache: VideoPrefetchCache, host: str = '127.0.0.1', port: int = 0):
+        """初始化服务
+
+        Args:
+            cache: 视频缓存
+            host: 监听地址
+            port: 监听端口，0表示随机端口
+        """
+        self.cache = cache
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和首个数据块分开写出，不关闭Nagle会叠加约40ms的延迟确认
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self._respond(head=True)
+
+            def do_GET(self):
+                self._respond(head=False)
+
+            def _send_empty(self, status: int, headers: Optional[Dict[str, str]] = None) -> None:
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def _respond(self, head: bool) -> None:
+                match = re.fullmatch(r'/video/([\w-]+)', self.path.split('?', 1)[0])
+                entry = cache.get(match.group(1)) if match else None
+                if entry is None:
+                    self._send_empty(404)
+                    return
+
+                cache.verify(entry)
+                if entry.size is None:
+                    cache.ensure_range(entry, 0, cache.chunk_size)
+                if entry.size is None:
+                    self._send_empty(502)
+                    return
+
+                try:
+                    requested = parse_range_header(self.headers.get('Range'), entry.size)
+                except ValueError:
+                    self._send_empty(416, {'Content-Range': f'bytes */{entry.size}'})
+                    return
+                start, stop = requested or (0, entry.size)
+
+                self.send_response(206 if requested else 200)
+                self.send_header('Content-Type', entry.content_type)
+                self.send_header('Content-Length', str(stop - start))
+                self.send_header('Accept-Ranges', 'bytes')
+                if requested:
+                    self.send_header('Content-Range', f'bytes {start}-{stop - 1}/{entry.size}')
+                self.end_headers()
+                if head:
+                    return
+
+                sent = 0
+                try:
+                    for data in cache.read(entry, start, stop):
+                        self.wfile.write(data)
+                        sent += len(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                    return
+                if sent < stop - start:
+                    # 已声明的长度无法满足，只能断开连接
+                    self.close_connection = True
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'VideoCacheServer':
+        """在后台线程中启动服务，并让缓存生成指向本服务的播放地址"""
+        self.thread.start()
+        self.cache.base_url = self.base_url
+        print(f"本地视频缓存服务已启动: {self.base_url}", file=sys.stderr)
+        return self
+
+    def close(self) -> None:
+        """停止服务"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.cache.base_url = None
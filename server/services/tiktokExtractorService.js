@@ -2,6 +2,7 @@
 const { spawn } = require('child_process');
 const path = require('path');
 const fs = require('fs');
+const readline = require('readline');
 
 /**
  * 抖音视频提取服务 - 基于最新版TikTok_download_v1.py
@@ -12,6 +13,49 @@ class TiktokExtractorService {
         this.pythonScriptPath = path.join(__dirname, '../scripts/extract_tiktok.py');
         this.pythonPath = process.env.PYTHON_PATH || 'python3'; // 可以通过环境变量配置Python路径
 
+        // 常驻提取进程（--serve模式），避免每次请求都重新启动Python和Chrome
+        this.useDaemon = process.env.EXTRACTOR_DAEMON !== 'false';
+        this.daemon = null;
+        this.pendingRequests = new Map();
+        this.nextRequestId = 1;
+        // 单个请求等待常驻进程响应的上限（毫秒），超时后按失败处理
+        this.daemonTimeoutMs = Number(process.env.EXTRACTOR_DAEMON_TIMEOUT_MS) || 120000;
+
+        // 进行中的提取（视频ID -> Promise），同一视频的并发请求共享一次提取，包括其失败
+        this.inFlight = new Map();
+        this.coalesceStats = { leaders: 0, coalesced: 0 };
+
+        // 所有运行模式共用的提取器参数
+        this.extractorArgs = [];
+        if (process.env.EXTRACTOR_HEDGE_DELAY) {
+            // API方法超过该时间(秒)仍无结果时并发启动回退方法
+            this.extractorArgs.push('--hedge-delay', process.env.EXTRACTOR_HEDGE_DELAY);
+        }
+        if (process.env.EXTRACTOR_RATE) {
+            // 每个主机每秒请求数的上限，0表示不限速
+            this.extractorArgs.push('--rate', process.env.EXTRACTOR_RATE);
+        }
+        if (process.env.EXTRACTOR_HOST_CONCURRENCY) {
+            this.extractorArgs.push('--host-concurrency', process.env.EXTRACTOR_HOST_CONCURRENCY);
+        }
+
+        // 常驻进程的本地视频预取缓存：提取成功后预取视频开头，通过本地Range服务提供
+        this.daemonArgs = [];
+        this.prefetchPort = process.env.EXTRACTOR_PREFETCH_PORT || null;
+        if (process.env.EXTRACTOR_PREFETCH_MB) {
+            this.daemonArgs.push('--prefetch-mb', process.env.EXTRACTOR_PREFETCH_MB);
+            if (this.prefetchPort) {
+                this.daemonArgs.push('--prefetch-port', this.prefetchPort);
+            }
+        }
+        // 热门视频的播放地址过期前在后台提前刷新
+        if (process.env.EXTRACTOR_REFRESH_AHEAD === 'true') {
+            this.daemonArgs.push('--refresh-ahead');
+            if (process.env.EXTRACTOR_REFRESH_BUDGET) {
+                this.daemonArgs.push('--refresh-budget', process.env.EXTRACTOR_REFRESH_BUDGET);
+            }
+        }
+
         // 硬编码的抖音视频映射（备用方案）
         this.fallbackVideos = [
             {
@@ -114,37 +158,8 @@ class TiktokExtractorService {
             }
 
             // 调用Python脚本提取视频
-            const result = await this.runPythonExtractor(url);
-
-            if (result && result.success && result.url) {
-                console.log(`Python脚本成功提取视频URL: ${result.url.substring(0, 100)}...`);
-
-                // 创建视频信息对象
-                return {
-                    id: result.id,
-                    url: result.url,
-                    thumbnail: result.thumbnail || "https://p.ipstatp.com/origin/tos-cn-p-0015/fallback~tplv-r00ih89hin-image.jpeg",
-                    title: result.title || `抖音视频 #${result.id}`,
-                    author: result.author || "抖音用户",
-                    source: "douyin"
-                };
-            } else {
-                console.log(`Python脚本提取失败: ${result?.error || '未知错误'}`);
-
-                // 如果脚本提取失败但有视频ID，尝试返回备用视频
-                if (result && result.id) {
-                    const fallbackVideo = this.fallbackVideos.find(v => v.id === result.id);
-                    if (fallbackVideo) {
-                        console.log(`使用ID ${result.id} 的备用视频`);
-                        return fallbackVideo;
-                    }
-                }
-
-                // 如果没有找到对应的备用视频，随机返回一个
-                console.log('使用随机备用视频');
-                const randomIndex = Math.floor(Math.random() * this.fallbackVideos.length);
-                return this.fallbackVideos[randomIndex];
-            }
+            const result = await this.runCoalesced(videoId, url);
+            return this.toVideoInfo(result);
         } catch (error) {
             console.error(`视频提取失败: ${error.message}`);
             // 如果脚本执行失败，随机返回一个备用视频
@@ -153,22 +168,266 @@ class TiktokExtractorService {
         }
     }
 
+    /**
+     * 将Python脚本的提取结果转换为视频信息对象，失败时使用备用视频
+     * @param {Object} result - 提取结果
+     * @returns {Object} - 视频信息对象
+     */
+    toVideoInfo(result) {
+        if (result && result.success && result.url) {
+            console.log(`Python脚本成功提取视频URL: ${result.url.substring(0, 100)}...`);
+
+            // 创建视频信息对象
+            const videoInfo = {
+                id: result.id,
+                url: result.url,
+                thumbnail: result.thumbnail || "https://p.ipstatp.com/origin/tos-cn-p-0015/fallback~tplv-r00ih89hin-image.jpeg",
+                title: result.title || `抖音视频 #${result.id}`,
+                author: result.author || "抖音用户",
+                source: "douyin"
+            };
+            // 本地缓存中有该视频时，提供经由本服务转发的播放地址
+            if (result.cached_url) {
+                videoInfo.streamUrl = `/api/tiktok/stream/${result.id}`;
+            }
+            return videoInfo;
+        } else {
+            console.log(`Python脚本提取失败: ${result?.error || '未知错误'}`);
+
+            // 如果脚本提取失败但有视频ID，尝试返回备用视频
+            if (result && result.id) {
+                const fallbackVideo = this.fallbackVideos.find(v => v.id === result.id);
+                if (fallbackVideo) {
+                    console.log(`使用ID ${result.id} 的备用视频`);
+                    return fallbackVideo;
+                }
+            }
+
+            // 如果没有找到对应的备用视频，随机返回一个
+            console.log('使用随机备用视频');
+            const randomIndex = Math.floor(Math.random() * this.fallbackVideos.length);
+            return this.fallbackVideos[randomIndex];
+        }
+    }
+
+    /**
+     * 同一视频ID同时只运行一次提取，期间到达的请求等待这一次的结果（成功或失败）
+     * @param {string|null} videoId - 视频ID，无法在本地解析（如短链接）时按URL合并
+     * @param {string} url - 视频URL
+     * @returns {Promise<Object>} - 提取结果
+     */
+    runCoalesced(videoId, url) {
+        const key = videoId || url;
+        const pending = this.inFlight.get(key);
+        if (pending) {
+            this.coalesceStats.coalesced++;
+            console.log(`视频 ${key} 正在提取，等待同一次提取的结果`);
+            return pending;
+        }
+
+        this.coalesceStats.leaders++;
+        const promise = this.runPythonExtractor(url).finally(() => {
+            this.inFlight.delete(key);
+        });
+        this.inFlight.set(key, promise);
+        return promise;
+    }
+
     /**
      * 运行Python提取器脚本
      * @param {string} url - 视频URL
      * @returns {Promise<Object>} - 提取结果
      */
     runPythonExtractor(url) {
+        if (this.useDaemon) {
+            return this.runDaemonExtractor(url);
+        }
+        return this.runOneShotExtractor(url);
+    }
+
+    /**
+     * 启动（或复用）常驻的Python提取进程
+     * @returns {ChildProcess} - 常驻进程
+     */
+    ensureDaemon() {
+        if (this.daemon) {
+            return this.daemon;
+        }
+
+        console.log(`启动常驻Python提取进程: ${this.pythonScriptPath}`);
+        const daemon = spawn(this.pythonPath, [this.pythonScriptPath, '--serve', ...this.extractorArgs, ...this.daemonArgs]);
+
+        // 每行一个JSON响应，通过request_id匹配等待中的请求
+        const lines = readline.createInterface({ input: daemon.stdout });
+        lines.on('line', (line) => {
+            let response;
+            try {
+                response = JSON.parse(line);
+            } catch (error) {
+                console.error(`解析常驻进程输出失败: ${error}, 输出内容: ${line}`);
+                return;
+            }
+
+            const pending = this.pendingRequests.get(response.request_id);
+            if (!pending) {
+                console.error(`收到未知请求的响应: ${response.request_id}`);
+                return;
+            }
+            this.pendingRequests.delete(response.request_id);
+            clearTimeout(pending.timer);
+            pending.resolve(response);
+        });
+
+        daemon.stderr.on('data', (data) => {
+            console.log(`Python常驻进程输出(stderr): ${data}`);
+        });
+
+        const failPending = (error) => {
+            if (this.daemon === daemon) {
+                this.daemon = null;
+            }
+            for (const pending of this.pendingRequests.values()) {
+                clearTimeout(pending.timer);
+                pending.reject(error);
+            }
+            this.pendingRequests.clear();
+        };
+
+        daemon.on('close', (code) => {
+            console.log(`Python常驻进程退出，退出码: ${code}`);
+            failPending(new Error(`常驻进程退出，退出码 ${code}`));
+        });
+
+        daemon.on('error', (error) => {
+            console.error(`启动Python常驻进程失败: ${error.message}`);
+            failPending(error);
+        });
+
+        this.daemon = daemon;
+        return daemon;
+    }
+
+    /**
+     * 通过常驻进程提取视频，请求按行流水线发送
+     * @param {string} url - 视频URL
+     * @returns {Promise<Object>} - 提取结果
+     */
+    runDaemonExtractor(url) {
+        return this.sendDaemonRequest({ url });
+    }
+
+    /**
+     * 向常驻进程发送一行JSON请求并等待对应的响应
+     * @param {Object} payload - 请求内容（自动添加id）
+     * @returns {Promise<Object>} - 响应
+     */
+    sendDaemonRequest(payload) {
+        return new Promise((resolve, reject) => {
+            const daemon = this.ensureDaemon();
+            const requestId = this.nextRequestId++;
+
+            const timer = setTimeout(() => {
+                if (this.pendingRequests.delete(requestId)) {
+                    reject(new Error(`常驻进程响应超时(${this.daemonTimeoutMs}毫秒)`));
+                }
+            }, this.daemonTimeoutMs);
+
+            this.pendingRequests.set(requestId, { resolve, reject, timer });
+            daemon.stdin.write(JSON.stringify({ id: requestId, ...payload }) + '\n', (error) => {
+                if (error && this.pendingRequests.has(requestId)) {
+                    this.pendingRequests.delete(requestId);
+                    clearTimeout(timer);
+                    reject(error);
+                }
+            });
+        });
+    }
+
+    /**
+     * 获取提取统计（Prometheus文本格式）：常驻进程的分阶段耗时，以及本服务合并的并发请求数
+     * @returns {Promise<string>} - 统计文本
+     */
+    async getMetrics() {
+        const coalesceMetrics = [
+            '# TYPE extractor_service_extractions_total counter',
+            `extractor_service_extractions_total ${this.coalesceStats.leaders}`,
+            '# TYPE extractor_service_coalesced_total counter',
+            `extractor_service_coalesced_total ${this.coalesceStats.coalesced}`,
+            '# TYPE extractor_service_in_flight gauge',
+            `extractor_service_in_flight ${this.inFlight.size}`
+        ].join('\n') + '\n';
+        if (!this.useDaemon) {
+            return coalesceMetrics;
+        }
+        const response = await this.sendDaemonRequest({ cmd: 'metrics' });
+        return (response.metrics || '') + coalesceMetrics;
+    }
+
+    /**
+     * 获取本地视频缓存服务上的播放地址
+     * @param {string} videoId - 视频ID
+     * @returns {string|null} - 本地播放地址，未启用本地缓存服务时为null
+     */
+    getStreamUrl(videoId) {
+        if (!this.useDaemon || !this.daemonArgs.includes('--prefetch-port')) {
+            return null;
+        }
+        return `http://127.0.0.1:${this.prefetchPort}/video/${videoId}`;
+    }
+
+    /**
+     * 为单个URL启动一次性Python进程
+     * @param {string} url - 视频URL
+     * @returns {Promise<Object>} - 提取结果
+     */
+    runOneShotExtractor(url) {
+        return this.runPythonScript([url]);
+    }
+
+    /**
+     * 以批量模式运行Python提取器，多个URL由工作进程池并行处理
+     * @param {string[]} urls - 视频URL数组
+     * @returns {Promise<Array>} - 与输入顺序一致的提取结果数组
+     */
+    runBatchExtractor(urls) {
+        const args = ['--batch'];
+        if (process.env.EXTRACTOR_TABS) {
+            // 在同一个浏览器中用多个标签页并行提取，代替每个工作进程各启动一个浏览器
+            args.push('--tabs', process.env.EXTRACTOR_TABS);
+        } else if (process.env.EXTRACTOR_WORKERS) {
+            args.push('--workers', process.env.EXTRACTOR_WORKERS);
+        }
+        return this.runPythonScript(args.concat(urls));
+    }
+
+    /**
+     * 启动Python脚本并解析其JSON输出
+     * @param {string[]} args - 脚本参数
+     * @returns {Promise<Object|Array>} - 解析后的输出
+     */
+    runPythonScript(args) {
         return new Promise((resolve, reject) => {
             console.log(`运行Python脚本: ${this.pythonScriptPath}`);
 
-            const python = spawn(this.pythonPath, [this.pythonScriptPath, url]);
+            const python = spawn(this.pythonPath, [this.pythonScriptPath, ...this.extractorArgs, ...args]);
 
             let stdout = '';
             let stderr = '';
+            let settled = false;
 
             python.stdout.on('data', (data) => {
                 stdout += data.toString();
+                // 结果是一行JSON，读到完整的一行即返回：对冲落败的浏览器方法可能仍在关闭Chrome，进程稍后才退出
+                const newline = stdout.indexOf('\n');
+                if (!settled && newline !== -1) {
+                    try {
+                        const result = JSON.parse(stdout.slice(0, newline));
+                        settled = true;
+                        resolve(result);
+                    } catch (error) {
+                        // 不是完整的结果行，等进程退出后再解析
+                    }
+                }
             });
 
             python.stderr.on('data', (data) => {
@@ -178,6 +437,9 @@ class TiktokExtractorService {
 
             python.on('close', (code) => {
                 console.log(`Python脚本退出码: ${code}`);
+                if (settled) {
+                    return;
+                }
 
                 if (code !== 0) {
                     console.error(`Python脚本执行失败: ${stderr}`);
@@ -244,14 +506,32 @@ class TiktokExtractorService {
      * @returns {Promise<Array>} - 视频信息数组
      */
     async getMultipleVideos(urls) {
-        const results = [];
+        const results = new Array(urls.length).fill(null);
+        const pending = [];
+
+        // 预定义视频直接返回，其余URL交给批量模式一次性并行提取
+        for (let i = 0; i < urls.length; i++) {
+            const videoId = await this.extractVideoId(urls[i]);
+            const fallbackVideo = videoId && this.fallbackVideos.find(v => v.id === videoId);
+            if (fallbackVideo) {
+                console.log(`使用ID ${videoId} 的预定义视频`);
+                results[i] = fallbackVideo;
+            } else {
+                pending.push(i);
+            }
+        }
 
-        for (const url of urls) {
+        if (pending.length > 0) {
             try {
-                const videoInfo = await this.getVideoInfo(url);
-                results.push(videoInfo);
+                const extracted = await this.runBatchExtractor(pending.map(i => urls[i]));
+                pending.forEach((urlIndex, j) => {
+                    results[urlIndex] = this.toVideoInfo(extracted[j]);
+                });
             } catch (error) {
-                console.error(`处理URL ${url} 失败:`, error);
+                console.error(`批量提取失败: ${error.message}`);
+                pending.forEach((urlIndex) => {
+                    results[urlIndex] = this.toVideoInfo(null);
+                });
             }
         }
 